@@ -0,0 +1,112 @@
+"""对比旧/新帧处理路径每帧的内存分配量
+
+用法（在 src 目录下）：
+    python -m benchmarks.alloc_bench --width 1920 --height 1080 --frames 60
+"""
+import argparse
+import io
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from rtsp.frame_reader import FramePool, read_exact
+from utils.scaler import FrameScaler
+
+
+class SyntheticPipe(io.RawIOBase):
+    """模拟 ffmpeg stdout：无限循环输出同一帧数据，本身不分配内存"""
+
+    def __init__(self, frame_size):
+        self._frame = memoryview(bytes(i % 251 for i in range(frame_size)))
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), len(self._frame) - self._pos)
+        b[:n] = self._frame[self._pos:self._pos + n]
+        self._pos = (self._pos + n) % len(self._frame)
+        return n
+
+
+def legacy_frame(main_pipe, pip_pipe, w, h, pip_w, pip_h):
+    """原 _start_pip_stream 的处理方式"""
+    raw_frame1 = main_pipe.read(w * h * 3)
+    raw_frame2 = pip_pipe.read(pip_w * pip_h * 3)
+    frame1 = np.frombuffer(raw_frame1, np.uint8).reshape((h, w, 3)).copy()
+    frame2 = np.frombuffer(raw_frame2, np.uint8).reshape((pip_h, pip_w, 3))
+    x_offset = w - pip_w - 10
+    y_offset = h - pip_h - 10
+    frame1[y_offset:y_offset+pip_h, x_offset:x_offset+pip_w] = frame2
+    return Image.fromarray(frame1)
+
+
+def make_pooled_frame(w, h, pip_w, pip_h):
+    """缓冲池 + readinto + 复用输出缓冲的处理方式"""
+    main_pool = FramePool((h, w, 3))
+    pip_pool = FramePool((pip_h, pip_w, 3))
+    out_frame = np.empty((h, w, 3), np.uint8)
+    main_scaler = FrameScaler((w, h), (w, h))
+    pip_scaler = FrameScaler((pip_w, pip_h), (pip_w, pip_h))
+    x_offset = w - pip_w - 10
+    y_offset = h - pip_h - 10
+
+    def pooled_frame(main_pipe, pip_pipe):
+        frame1 = main_pool.acquire()
+        frame2 = pip_pool.acquire()
+        with memoryview(frame1).cast('B') as view:
+            read_exact(main_pipe, view)
+        with memoryview(frame2).cast('B') as view:
+            read_exact(pip_pipe, view)
+        main_scaler.scale(frame1, out=out_frame)
+        pip_scaler.scale(frame2, out=out_frame[y_offset:y_offset+pip_h, x_offset:x_offset+pip_w])
+        img = Image.frombuffer('RGB', (w, h), out_frame, 'raw', 'RGB', 0, 1)
+        main_pool.release(frame1)
+        pip_pool.release(frame2)
+        return img
+
+    return pooled_frame, (main_pool, pip_pool)
+
+
+def measure(step, frames):
+    """返回每帧平均峰值分配字节数（tracemalloc 统计 Python/NumPy 分配）"""
+    step()  # 预热：缓冲池首次分配不计入
+    total = 0
+    tracemalloc.start()
+    try:
+        for _ in range(frames):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            step()
+            total += tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return total / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="帧处理路径内存分配对比")
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--frames', type=int, default=60)
+    args = parser.parse_args()
+
+    w, h = args.width, args.height
+    pip_w, pip_h = w // 3, h // 3
+    main_pipe = io.BufferedReader(SyntheticPipe(w * h * 3), buffer_size=w * h * 3)
+    pip_pipe = io.BufferedReader(SyntheticPipe(pip_w * pip_h * 3), buffer_size=pip_w * pip_h * 3)
+
+    legacy = measure(lambda: legacy_frame(main_pipe, pip_pipe, w, h, pip_w, pip_h), args.frames)
+    pooled_frame, pools = make_pooled_frame(w, h, pip_w, pip_h)
+    pooled = measure(lambda: pooled_frame(main_pipe, pip_pipe), args.frames)
+
+    print(f"分辨率 {w}x{h}，画中画 {pip_w}x{pip_h}，{args.frames} 帧")
+    print(f"旧路径每帧分配: {legacy / 1024:.1f} KiB")
+    print(f"新路径每帧分配: {pooled / 1024:.1f} KiB")
+    print(f"缓冲池累计分配: {sum(p.allocated_bytes for p in pools) / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""对比两种画中画合成方式的 CPU 占用和帧率
+
+python 模式：两个 ffmpeg 进程各自解码缩放，Python 中用 NumPy 叠加；
+ffmpeg 模式：一个 ffmpeg 进程在 filter_complex 中完成缩放和叠加；
+process 模式：解码和合成在子进程中完成，经共享内存帧总线取合成帧（本进程只把合成帧
+复制出共享内存，不再合成）。
+两路输入都用 lavfi testsrc 模拟，按实时速率产生。报告的进程数为实际启动的 ffmpeg 进程
+和 Python 工作进程数，主进程耗时为每帧在本进程中的合成（process 模式为取帧复制）耗时。
+
+用法（在 src 目录下）：
+    python -m benchmarks.composite_bench --width 1280 --height 720 --seconds 10
+"""
+import argparse
+import os
+import time
+
+from benchmarks.harness import summarize
+from rtsp.frame_bus import BusPipeline
+from rtsp.frame_reader import FramePool
+from rtsp.stream_handler import StreamHandler
+from utils.compositor import PipCompositor
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+LAVFI_INPUT_ARGS = ['-re', '-f', 'lavfi']
+
+
+def testsrc(width, height, rate=25):
+    return f'testsrc2=size={width}x{height}:rate={rate}'
+
+
+def children_cpu():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_mode(mode, width, height, fps, seconds):
+    compositor = PipCompositor()
+    pip_w, pip_h = compositor.pip_size(width, height)
+    source_main = testsrc(1920, 1080)
+    source_pip = testsrc(1280, 720)
+    out_pool = FramePool((height, width, 3))
+
+    cpu_children = children_cpu()
+    cpu_self = time.process_time()
+    common = dict(fps=fps, decoder_args=[], input_args=LAVFI_INPUT_ARGS)
+    if mode == 'process':
+        sessions = [BusPipeline(source_main, width, height, pip_url=source_pip,
+                                name='composite', **common)]
+    elif mode == 'ffmpeg':
+        sessions = [StreamHandler(source_main, width, height, name='composite',
+                                  overlay_url=source_pip, **common)]
+    else:
+        sessions = [StreamHandler(source_main, width, height, role='main', **common),
+                    StreamHandler(source_pip, pip_w, pip_h, role='pip', **common)]
+    for session in sessions:
+        session.start_stream()
+
+    if mode == 'process':
+        ffmpeg_procs = 1 + bool(sessions[0].pip_spec)  # 每个解码进程带一个 ffmpeg
+        workers = len(sessions[0].processes)
+    else:
+        ffmpeg_procs, workers = len(sessions), 0
+
+    frames = 0  # 主画面（或已合成画面）的新帧数
+    held = [None] * len(sessions)
+    costs = []  # 本进程每帧的合成（process 模式为取帧复制）耗时
+    start = time.time()
+    while time.time() - start < seconds:
+        fresh = False
+        for i, session in enumerate(sessions):
+            before = time.perf_counter()
+            frame = session.take()
+            if frame is not None and mode == 'process':
+                costs.append(time.perf_counter() - before)
+            if frame is not None:
+                session.release(held[i])
+                held[i] = frame
+                fresh = True
+                if i == 0:
+                    frames += 1
+        if fresh and held[0] is not None and mode != 'process':
+            out = out_pool.acquire()
+            pip_frame = held[1] if len(held) > 1 else None
+            before = time.perf_counter()
+            compositor.compose(held[0], pip_frame, out)
+            costs.append(time.perf_counter() - before)
+            out_pool.release(out)
+        elif not fresh:
+            time.sleep(0.002)
+    wall = time.time() - start
+    cpu_self = time.process_time() - cpu_self
+    for session in sessions:
+        session.stop_stream()
+    cpu_children = children_cpu() - cpu_children
+
+    return {
+        'mode': mode,
+        'fps': frames / wall,
+        'ffmpeg_procs': ffmpeg_procs,
+        'workers': workers,
+        'main_ms': summarize(costs)['avg_ms'] or 0.0,
+        'cpu_python': cpu_self / wall * 100,
+        'cpu_ffmpeg': cpu_children / wall * 100,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="画中画合成方式对比")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--fps', type=int, default=15)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"输出 {args.width}x{args.height} @ {args.fps}fps，每种模式运行 {args.seconds}s，"
+          f"CPU 以单核百分比计（共 {os.cpu_count()} 核）")
+    for mode in ('python', 'ffmpeg', 'process'):
+        r = run_mode(mode, args.width, args.height, args.fps, args.seconds)
+        print(f"{r['mode']:>7}: {r['fps']:5.1f} fps, {r['ffmpeg_procs']} 个 ffmpeg 进程 + "
+              f"{r['workers']} 个工作进程, 主进程每帧 {r['main_ms']:.2f} ms, "
+              f"Python {r['cpu_python']:5.1f}%, 子进程 {r['cpu_ffmpeg']:5.1f}%, "
+              f"合计 {r['cpu_python'] + r['cpu_ffmpeg']:5.1f}%")
+
+
+if __name__ == "__main__":
+    main()
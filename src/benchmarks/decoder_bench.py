@@ -0,0 +1,31 @@
+"""对本机可用的解码后端测速，并保存排序供 DECODER_PREFERENCE = 'auto' 使用
+
+用法（在 src 目录下）：
+    python -m benchmarks.decoder_bench [--clip 本地片段] [--codec h264] [--role pip]
+"""
+import argparse
+
+from rtsp.decoder import benchmark_backends, probe_ffmpeg
+
+
+def main():
+    parser = argparse.ArgumentParser(description="解码后端测速")
+    parser.add_argument('--clip', help="测试片段，默认用 testsrc 生成 10 秒 1080p 片段")
+    parser.add_argument('--codec', choices=['h264', 'hevc'])
+    parser.add_argument('--role', choices=['main', 'pip'], default='main')
+    parser.add_argument('--no-save', action='store_true', help="只测速，不写入缓存")
+    args = parser.parse_args()
+
+    caps = probe_ffmpeg()
+    print(caps.version)
+    print("hwaccels:", ', '.join(sorted(caps.hwaccels)) or '无')
+    results = benchmark_backends(args.clip, args.codec, args.role, save=not args.no_save)
+    for r in results:
+        status = f"{r['seconds']:.2f}s" if r['ok'] else "失败"
+        print(f"{r['backend']:>10}: {status}")
+    if results and results[0]['ok']:
+        print("自动选择:", results[0]['backend'])
+
+
+if __name__ == "__main__":
+    main()
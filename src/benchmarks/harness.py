@@ -0,0 +1,233 @@
+"""无界面基准测试：用本地测试源驱动 解码 -> 合成 -> 渲染 全流程
+
+对每个 (测试源, 分辨率, 路数) 组合运行固定时长，统计：
+    持续帧率、每路 ffmpeg 的 CPU 和内存、Python 进程 CPU 和内存、
+    帧延迟（读帧线程发布到被合成线程取走）、合成与渲染耗时。
+结果追加写入 JSON 文件，便于跟踪热循环的性能回退。
+
+渲染阶段没有 Tk，用 PIL 把画布转换成 Tk PhotoImage 内部使用的 RGBA 格式来近似。
+
+用法（在 src 目录下）：
+    python -m benchmarks.harness --sources lavfi,file,loopback --resolutions 640x360,1280x720 \\
+        --streams 1,2,4 --seconds 10 --out bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.sources import KINDS, RTSPSource, make_source
+from rtsp.decoder import probe_ffmpeg
+from rtsp.frame_reader import FramePool
+from rtsp.stream_handler import StreamHandler
+from utils import config
+from utils.mosaic import MosaicCompositor
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def proc_cpu_seconds(pid):
+    """/proc/<pid>/stat 中的 utime + stime（秒）；非 Linux 返回 None"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def proc_rss_mb(pid='self'):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def grid_for(count):
+    cols = int(np.ceil(np.sqrt(count)))
+    rows = int(np.ceil(count / cols))
+    return rows, cols
+
+
+def summarize(samples):
+    if not samples:
+        return {'avg_ms': None, 'p50_ms': None, 'p95_ms': None, 'max_ms': None}
+    arr = np.asarray(samples) * 1000
+    return {'avg_ms': float(arr.mean()), 'p50_ms': float(np.percentile(arr, 50)),
+            'p95_ms': float(np.percentile(arr, 95)), 'max_ms': float(arr.max())}
+
+
+def run_scenario(kind, width, height, streams, fps, seconds, path=None, warmup=10.0, settle=1.0):
+    """跑一个组合，返回结果字典"""
+    rows, cols = grid_for(streams)
+    compositor = MosaicCompositor(rows, cols)
+    canvas_pool = FramePool((height, width, 3))
+    tile_w, tile_h = compositor.tile_size(width, height)
+    sources = [make_source(kind, width, height, path).start() for _ in range(streams)]
+    handlers = []
+    try:
+        for i, source in enumerate(sources):
+            # 每路按格子尺寸解码，与播放器的多画面模式一致
+            handler = StreamHandler(source.url, tile_w, tile_h, fps=fps, name=f'{kind}{i}',
+                                    role='pip' if streams > 1 else 'main',
+                                    input_args=source.input_args)
+            handler.start_stream()
+            handlers.append(handler)
+
+        # 网络源要先探测若干秒数据才出首帧，随后把积压的帧一次性吐出；
+        # 等所有路出首帧后再稳定 settle 秒才开始计时
+        deadline = time.time() + warmup
+        while time.time() < deadline and any(h.queue.seq == 0 for h in handlers):
+            for h in handlers:
+                if not h.alive:
+                    h.restart()
+            time.sleep(0.05)
+        time.sleep(settle)
+        for h in handlers:
+            h.release(h.take())
+
+        held = [None] * streams
+        seq0 = [h.queue.seq for h in handlers]
+        cpu0 = [proc_cpu_seconds(h.proc.pid) for h in handlers]
+        py_cpu0 = time.process_time()
+        latency, composite, render = [], [], []
+        frames = 0
+        interval = 1.0 / fps
+        start = time.time()
+        while time.time() - start < seconds:
+            tick = time.time()
+            fresh = False
+            for i, handler in enumerate(handlers):
+                published_at = handler.queue.updated_at
+                frame = handler.take()
+                if frame is not None:
+                    # 大小为 1 的队列里取到的就是最近发布的那一帧
+                    latency.append(time.time() - published_at)
+                    handler.release(held[i])
+                    held[i] = frame
+                    fresh = True
+            if fresh:
+                out = canvas_pool.acquire()
+                t0 = time.perf_counter()
+                compositor.compose(held, out)
+                t1 = time.perf_counter()
+                Image.frombuffer('RGB', (width, height), out, 'raw', 'RGB', 0, 1).convert('RGBA')
+                render.append(time.perf_counter() - t1)
+                composite.append(t1 - t0)
+                canvas_pool.release(out)
+                frames += 1
+            elapsed = time.time() - tick
+            if elapsed < interval:
+                time.sleep(interval - elapsed)
+        wall = time.time() - start
+
+        per_stream = []
+        for handler, s0, c0 in zip(handlers, seq0, cpu0):
+            c1 = proc_cpu_seconds(handler.proc.pid)
+            per_stream.append({
+                'fps': (handler.queue.seq - s0) / wall,
+                'cpu_percent': (c1 - c0) / wall * 100 if c0 is not None and c1 is not None
+                else None,
+                'rss_mb': proc_rss_mb(handler.proc.pid),
+                'dropped': handler.dropped,
+                'restarts': handler.restarts,
+            })
+        python_cpu = (time.process_time() - py_cpu0) / wall * 100
+    finally:
+        for handler in handlers:
+            handler.stop_stream()
+        for source in sources:
+            source.stop()
+
+    return {
+        'source': kind,
+        'resolution': f'{width}x{height}',
+        'streams': streams,
+        'target_fps': fps,
+        'seconds': wall,
+        'fps': frames / wall,
+        'stream_fps_min': min(s['fps'] for s in per_stream),
+        'python_cpu_percent': python_cpu,
+        'python_rss_mb': proc_rss_mb(),
+        'per_stream': per_stream,
+        'latency': summarize(latency),
+        'composite': summarize(composite),
+        'render': summarize(render),
+    }
+
+
+def run_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'ffmpeg': probe_ffmpeg().version,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def append_results(path, run):
+    """结果文件是一个 JSON 列表，每次运行追加一项"""
+    runs = []
+    if os.path.exists(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                runs = json.load(f)
+        except ValueError:
+            print(f"{path} 不是有效的 JSON，改为覆盖写入")
+    runs.append(run)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(runs, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="无界面拉流基准测试")
+    parser.add_argument('--sources', default='lavfi,file,loopback',
+                        help=f"逗号分隔，可选 {','.join(KINDS)}")
+    parser.add_argument('--resolutions', default='640x360,1280x720')
+    parser.add_argument('--streams', default='1,2,4')
+    parser.add_argument('--fps', type=int, default=config.DISPLAY_FPS)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--clip', help="file/loopback/rtsp 源使用的视频文件，默认生成测试片段")
+    parser.add_argument('--out', default='bench_results.json')
+    args = parser.parse_args()
+
+    run = dict(run_info(), results=[])
+    for kind in args.sources.split(','):
+        if kind == 'rtsp' and not RTSPSource.available():
+            print("跳过 rtsp：未找到 mediamtx")
+            continue
+        for resolution in args.resolutions.split(','):
+            width, height = map(int, resolution.split('x'))
+            for streams in map(int, args.streams.split(',')):
+                r = run_scenario(kind, width, height, streams, args.fps, args.seconds, args.clip)
+                run['results'].append(r)
+                cpu = [s['cpu_percent'] for s in r['per_stream'] if s['cpu_percent'] is not None]
+                print(f"{kind:>8} {r['resolution']:>9} x{streams}: {r['fps']:5.1f} fps "
+                      f"(最慢一路 {r['stream_fps_min']:5.1f}), "
+                      f"ffmpeg 每路 {np.mean(cpu) if cpu else 0:5.1f}% CPU, "
+                      f"Python {r['python_cpu_percent']:5.1f}% / {r['python_rss_mb'] or 0:.0f} MB, "
+                      f"延迟 p95 {r['latency']['p95_ms'] or 0:5.1f} ms, "
+                      f"合成 {r['composite']['avg_ms'] or 0:.2f} ms, "
+                      f"渲染 {r['render']['avg_ms'] or 0:.2f} ms")
+    append_results(args.out, run)
+    print(f"结果已写入 {args.out}")
+
+
+if __name__ == "__main__":
+    main()
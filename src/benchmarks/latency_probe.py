@@ -0,0 +1,209 @@
+"""端到端延迟测量：测试源把发送时刻编码进画面，播放端解码后与当前时刻比较
+
+测试源模拟摄像机：Python 逐帧生成灰度画面，把当前时刻（毫秒）按位画成黑白方块，
+交给 ffmpeg 用 x264 zerolatency 编码，经回环 TCP 以 flv 推给播放端；
+播放端用 StreamHandler 正常拉流解码，从收到的画面中读出时间戳。
+测得的延迟包括编码、传输、解复用缓冲、解码、帧率转换和读帧线程，
+再加上合成线程的取帧等待（普通模式按 DISPLAY_FPS 轮询，低延迟模式等待新帧）。
+渲染器的 Tk 定时器还会再增加最多一个取帧周期，不在统计范围内。
+测试画面码率很低，低延迟模式 32KB 的探测量要攒很多帧，首帧耗时比真实摄像机偏长。
+
+用法（在 src 目录下）：
+    python -m benchmarks.latency_probe --modes normal,low --seconds 10
+"""
+import argparse
+import socket
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.harness import summarize
+from benchmarks.sources import _stop
+from rtsp.stream_handler import StreamHandler
+from utils import config
+
+ROWS, COLS = 4, 8           # 32 个方块：24 位时间戳 + 8 位校验
+STAMP_MASK = (1 << 24) - 1  # 毫秒时间戳取低 24 位（约 4.6 小时回绕一次）
+
+
+def now_ms():
+    return int(time.time() * 1000) & STAMP_MASK
+
+
+def _checksum(value):
+    return (value ^ (value >> 8) ^ (value >> 16) ^ 0x5a) & 0xff
+
+
+def stamp(frame, value):
+    """把 24 位时间戳和校验位画成 ROWS x COLS 个黑白方块"""
+    word = (value & STAMP_MASK) | (_checksum(value & STAMP_MASK) << 24)
+    blocks = (((word >> np.arange(ROWS * COLS)) & 1) * 255).astype(np.uint8).reshape(ROWS, COLS)
+    h, w = frame.shape
+    bh, bw = h // ROWS, w // COLS
+    frame[:] = 0
+    frame[:bh * ROWS, :bw * COLS] = np.repeat(np.repeat(blocks, bh, axis=0), bw, axis=1)
+
+
+def read_stamp(frame):
+    """从灰度（或 RGB）画面读出时间戳；校验不通过返回 None"""
+    if frame.ndim == 3:
+        frame = frame[..., 0]
+    h, w = frame.shape
+    bh, bw = h // ROWS, w // COLS
+    # 只取每个方块的中心像素，避开编码后模糊的块边缘
+    ys = np.arange(ROWS) * bh + bh // 2
+    xs = np.arange(COLS) * bw + bw // 2
+    centers = frame[ys[:, None], xs[None, :]]
+    bits = (centers.ravel() > 127).astype(np.int64)
+    word = int((bits << np.arange(ROWS * COLS)).sum())
+    value = word & STAMP_MASK
+    if word >> 24 != _checksum(value):
+        return None
+    return value
+
+
+class TimestampSource:
+    """回环 TCP 测试源：每个连接启动一个 x264 编码进程，Python 按实时速率写入带时间戳的画面"""
+
+    def __init__(self, width=640, height=360, fps=25):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.server = None
+        self.url = None
+        self.procs = []
+        self._stop_event = threading.Event()
+
+    def start(self):
+        self.server = socket.socket()
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen()
+        self.url = f'tcp://127.0.0.1:{self.server.getsockname()[1]}'
+        threading.Thread(target=self._accept_loop, name='timestamp-source', daemon=True).start()
+        return self
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            with conn:
+                proc = subprocess.Popen(
+                    ['ffmpeg', '-hide_banner', '-loglevel', 'error',
+                     '-f', 'rawvideo', '-pix_fmt', 'gray', '-s', f'{self.width}x{self.height}',
+                     '-r', str(self.fps), '-i', '-',
+                     '-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'zerolatency',
+                     '-g', str(self.fps), '-pix_fmt', 'yuv420p', '-f', 'flv', 'pipe:1'],
+                    stdin=subprocess.PIPE, stdout=conn.fileno(), stderr=subprocess.DEVNULL)
+            self.procs.append(proc)
+            threading.Thread(target=self._feed, args=(proc,), name='timestamp-feed',
+                             daemon=True).start()
+
+    def _feed(self, proc):
+        frame = np.zeros((self.height, self.width), np.uint8)
+        interval = 1.0 / self.fps
+        due = time.perf_counter()
+        try:
+            while not self._stop_event.is_set() and proc.poll() is None:
+                stamp(frame, now_ms())
+                proc.stdin.write(memoryview(frame).cast('B'))
+                proc.stdin.flush()
+                due += interval
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    due = time.perf_counter()
+        except (BrokenPipeError, OSError, ValueError):
+            pass
+
+    def stop(self):
+        self._stop_event.set()
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        for proc in self.procs:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+            _stop(proc)
+        self.procs = []
+
+
+def measure(mode, width, height, source_fps, seconds, warmup=15.0, settle=1.0):
+    """按指定延迟模式拉流，返回首帧耗时和延迟统计"""
+    source = TimestampSource(width, height, source_fps).start()
+    handler = StreamHandler(source.url, width, height, pix_fmt='gray', fps=config.DISPLAY_FPS,
+                            name=f'latency-{mode}', latency_mode=mode)
+    samples, bad = [], 0
+    try:
+        started = time.time()
+        handler.start_stream()
+        first = handler.read(timeout=warmup)
+        if first is None:
+            return {'mode': mode, 'first_frame_s': None, 'fps': 0.0, 'bad_frames': 0,
+                    'latency': summarize([])}
+        first_frame = time.time() - started
+        handler.release(first)
+        # 丢掉探测期间积压的帧，稳定后再计时
+        deadline = time.time() + settle
+        while time.time() < deadline:
+            handler.release(handler.read(timeout=settle))
+        seq0 = handler.queue.seq
+        interval = 1.0 / config.DISPLAY_FPS
+        start = time.time()
+        while time.time() - start < seconds:
+            tick = time.time()
+            # 模拟播放线程：普通模式按显示帧率轮询，低延迟模式等待新帧
+            if handler.low_latency:
+                handler.wait(interval)
+            frame = handler.take()
+            if frame is not None:
+                value = read_stamp(frame)
+                handler.release(frame)
+                if value is None:
+                    bad += 1
+                else:
+                    samples.append(((now_ms() - value) & STAMP_MASK) / 1000)
+            if not handler.low_latency:
+                elapsed = time.time() - tick
+                if elapsed < interval:
+                    time.sleep(interval - elapsed)
+        wall = time.time() - start
+        fps = (handler.queue.seq - seq0) / wall
+    finally:
+        handler.stop_stream()
+        source.stop()
+    return {'mode': mode, 'first_frame_s': first_frame, 'fps': fps, 'bad_frames': bad,
+            'latency': summarize(samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端延迟测量（普通模式 vs 低延迟模式）")
+    parser.add_argument('--modes', default='normal,low')
+    parser.add_argument('--size', default='640x360')
+    parser.add_argument('--source-fps', type=int, default=25, help="测试源帧率")
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.split('x'))
+    print(f"测试源 {args.size}@{args.source_fps}fps，显示帧率 {config.DISPLAY_FPS}，"
+          f"每种模式测 {args.seconds}s")
+    for mode in args.modes.split(','):
+        r = measure(mode, width, height, args.source_fps, args.seconds)
+        if r['first_frame_s'] is None:
+            print(f"{mode:>6}: 没有收到画面")
+            continue
+        lat = r['latency']
+        print(f"{mode:>6}: 首帧 {r['first_frame_s']:5.2f}s, 接收 {r['fps']:5.1f} fps, "
+              f"延迟 avg {lat['avg_ms'] or 0:6.1f} / p50 {lat['p50_ms'] or 0:6.1f} / "
+              f"p95 {lat['p95_ms'] or 0:6.1f} / max {lat['max_ms'] or 0:6.1f} ms, "
+              f"无法识别 {r['bad_frames']} 帧")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""多画面压测：网格逐级加大，找出在目标帧率下能维持的最大格子数
+
+每个格子都是一路独立的 ffmpeg 软件/硬件解码，输入为循环播放的本地 H.264 片段
+（按实时速率读取），按格子尺寸输出后由 MosaicSession 合成到一幅画布。
+
+用法（在 src 目录下）：
+    python -m benchmarks.mosaic_bench --width 1280 --height 720 --fps 10 --grids 1x1,2x2,3x3,4x4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.composite_bench import children_cpu
+from rtsp.decoder import make_test_clip
+from rtsp.frame_reader import FramePool
+from rtsp.mosaic import MosaicSession
+from utils.mosaic import parse_grid
+
+LOOP_INPUT_ARGS = ['-re', '-stream_loop', '-1']
+
+
+def run_grid(clip, rows, cols, width, height, fps, seconds):
+    session = MosaicSession([clip] * (rows * cols), rows, cols, width, height, fps=fps,
+                            input_args=LOOP_INPUT_ARGS)
+    pool = FramePool((height, width, 3))
+    out = pool.acquire()
+    interval = 1.0 / fps
+
+    cpu_children = children_cpu()
+    cpu_self = time.process_time()
+    session.start()
+    # 等各路出首帧后再开始计时，排除 ffmpeg 启动耗时
+    warmup = time.time() + 3
+    while time.time() < warmup and any(h.queue.seq == 0 for h in session.handlers):
+        time.sleep(0.05)
+    seq0 = [h.queue.seq for h in session.handlers]
+    frames0 = session.frames
+    compose_time = 0.0
+    start = time.time()
+    while time.time() - start < seconds:
+        tick = time.time()
+        session.step(out)
+        compose_time += time.time() - tick
+        elapsed = time.time() - tick
+        if elapsed < interval:
+            time.sleep(interval - elapsed)
+    wall = time.time() - start
+    tile_fps = [(h.queue.seq - s) / wall for h, s in zip(session.handlers, seq0)]
+    mosaic_frames = session.frames - frames0
+    dropped = session.dropped()
+    session.stop()
+    cpu_self = time.process_time() - cpu_self
+    cpu_children = children_cpu() - cpu_children
+
+    return {
+        'tiles': rows * cols,
+        'grid': f'{rows}x{cols}',
+        'tile_size': session.tile_size,
+        'fps': mosaic_frames / wall,
+        'tile_fps_min': min(tile_fps),
+        'dropped': dropped,
+        'compose_ms': compose_time / max(mosaic_frames, 1) * 1000,
+        'cpu_python': cpu_self / wall * 100,
+        'cpu_ffmpeg': cpu_children / wall * 100,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多画面最大路数压测")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--fps', type=int, default=10)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--grids', default='1x1,2x2,3x3,4x4')
+    parser.add_argument('--source-size', default='1280x720', help="测试片段分辨率（模拟摄像机码流）")
+    parser.add_argument('--clip', help="使用已有的视频文件代替生成的测试片段")
+    parser.add_argument('--threshold', type=float, default=0.9,
+                        help="画布和每一路都达到目标帧率的该比例才算维持住")
+    args = parser.parse_args()
+
+    clip = args.clip
+    if clip is None:
+        src_w, src_h = map(int, args.source_size.split('x'))
+        clip = os.path.join(tempfile.gettempdir(), f'mosaic_bench_{args.source_size}.mp4')
+        if not os.path.exists(clip):
+            print("生成测试片段...")
+            make_test_clip(clip, src_w, src_h, seconds=5)
+
+    print(f"画布 {args.width}x{args.height}，目标 {args.fps}fps，每级运行 {args.seconds}s，"
+          f"CPU 以单核百分比计（共 {os.cpu_count()} 核）")
+    best = None
+    for grid in args.grids.split(','):
+        rows, cols = parse_grid(grid)
+        r = run_grid(clip, rows, cols, args.width, args.height, args.fps, args.seconds)
+        ok = r['fps'] >= args.fps * args.threshold and \
+            r['tile_fps_min'] >= args.fps * args.threshold
+        print(f"{r['grid']:>5} ({r['tiles']:2d} 路, 格子 {r['tile_size'][0]}x{r['tile_size'][1]}): "
+              f"画布 {r['fps']:5.1f} fps, 最慢一路 {r['tile_fps_min']:5.1f} fps, "
+              f"合成 {r['compose_ms']:5.2f} ms, 丢帧 {r['dropped']}, "
+              f"Python {r['cpu_python']:5.1f}%, ffmpeg {r['cpu_ffmpeg']:6.1f}%  "
+              f"{'维持' if ok else '未维持'}")
+        if not ok:
+            break
+        best = r
+    if best:
+        print(f"在 {args.fps}fps 下最多维持 {best['tiles']} 路（{best['grid']}）")
+    else:
+        print(f"连最小网格也无法维持 {args.fps}fps")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""本地模拟 ONVIF 摄像机：只实现播放器用到的 SOAP 操作，记录收到的每条 PTZ 命令
+
+设备服务回 GetCapabilities（媒体、PTZ 服务地址都指回本服务），媒体服务回一个带
+PTZ 配置的配置集，PTZ 服务对各种移动命令回空响应。不校验 WS-Security 用户名令牌。
+latency 可模拟摄像机处理一条命令的耗时。
+
+    with MockONVIFCamera() as cam:
+        controller = ONVIFController('127.0.0.1', cam.port, 'admin', 'admin')
+        ...
+        cam.count('ContinuousMove'), cam.count('Stop')
+"""
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENVELOPE = ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<env:Envelope xmlns:env="http://www.w3.org/2003/05/soap-envelope"'
+            ' xmlns:tt="http://www.onvif.org/ver10/schema"'
+            ' xmlns:tds="http://www.onvif.org/ver10/device/wsdl"'
+            ' xmlns:trt="http://www.onvif.org/ver10/media/wsdl"'
+            ' xmlns:tptz="http://www.onvif.org/ver20/ptz/wsdl">'
+            '<env:Body>{}</env:Body></env:Envelope>')
+
+CAPABILITIES = (
+    '<tds:GetCapabilitiesResponse><tds:Capabilities>'
+    '<tt:Media><tt:XAddr>{base}/onvif/media_service</tt:XAddr>'
+    '<tt:StreamingCapabilities><tt:RTPMulticast>false</tt:RTPMulticast>'
+    '<tt:RTP_TCP>true</tt:RTP_TCP><tt:RTP_RTSP_TCP>true</tt:RTP_RTSP_TCP>'
+    '</tt:StreamingCapabilities></tt:Media>'
+    '<tt:PTZ><tt:XAddr>{base}/onvif/ptz_service</tt:XAddr></tt:PTZ>'
+    '</tds:Capabilities></tds:GetCapabilitiesResponse>')
+
+PROFILES = (
+    '<trt:GetProfilesResponse><trt:Profiles token="profile_1" fixed="true">'
+    '<tt:Name>main</tt:Name>'
+    '<tt:PTZConfiguration token="ptz_1"><tt:Name>ptz</tt:Name><tt:UseCount>1</tt:UseCount>'
+    '<tt:NodeToken>node_1</tt:NodeToken></tt:PTZConfiguration>'
+    '</trt:Profiles></trt:GetProfilesResponse>')
+
+PTZ_OPTIONS = (
+    '<tptz:GetConfigurationOptionsResponse><tptz:PTZConfigurationOptions>'
+    '<tt:Spaces/><tt:PTZTimeout><tt:Min>PT1S</tt:Min><tt:Max>PT60S</tt:Max></tt:PTZTimeout>'
+    '</tptz:PTZConfigurationOptions></tptz:GetConfigurationOptionsResponse>')
+
+EMPTY_RESPONSES = ('ContinuousMove', 'Stop', 'RelativeMove', 'AbsoluteMove')
+
+# SOAP Body 里第一个元素的本地名即操作名
+_OPERATION = re.compile(rb'<(?:[\w-]+:)?Body[^>]*>\s*<(?:[\w-]+:)?(\w+)')
+_VELOCITY = re.compile(rb'<(?:[\w-]+:)?(PanTilt|Zoom)\b[^>]*?\bx="([-\d.eE]+)"'
+                       rb'(?:[^>]*?\by="([-\d.eE]+)")?')
+
+
+class MockONVIFCamera:
+    """在回环地址上监听的模拟摄像机；calls 为 (收到时刻, 操作名, 速度或 None) 列表"""
+
+    def __init__(self, port=0, latency=0.0):
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self.base = f'http://127.0.0.1:{self.port}'
+        self._thread = None
+
+    def _handler_class(self):
+        camera = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive，与真实摄像机一样复用连接
+            disable_nagle_algorithm = True  # 头和正文分两次写，不关 Nagle 每条多等 40 ms
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                status, reply = camera.handle(body)
+                data = reply.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/soap+xml; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def handle(self, body):
+        """处理一条 SOAP 请求，返回 (HTTP 状态码, 响应报文)"""
+        match = _OPERATION.search(body)
+        operation = match.group(1).decode() if match else ''
+        velocity = None
+        if operation == 'ContinuousMove':
+            axes = {m.group(1): m.groups()[1:] for m in _VELOCITY.finditer(body)}
+            pan_tilt = axes.get(b'PanTilt', (b'0', b'0'))
+            zoom = axes.get(b'Zoom', (b'0', None))
+            velocity = (float(pan_tilt[0]), float(pan_tilt[1] or 0), float(zoom[0]))
+        with self._lock:
+            self.calls.append((time.perf_counter(), operation, velocity))
+        if self.latency:
+            time.sleep(self.latency)
+        if operation == 'GetCapabilities':
+            return 200, ENVELOPE.format(CAPABILITIES.format(base=self.base))
+        if operation == 'GetProfiles':
+            return 200, ENVELOPE.format(PROFILES)
+        if operation == 'GetConfigurationOptions':
+            return 200, ENVELOPE.format(PTZ_OPTIONS)
+        if operation in EMPTY_RESPONSES:
+            return 200, ENVELOPE.format(f'<tptz:{operation}Response/>')
+        fault = ('<env:Fault><env:Code><env:Value>env:Receiver</env:Value></env:Code>'
+                 f'<env:Reason><env:Text xml:lang="en">{operation} not supported</env:Text>'
+                 '</env:Reason></env:Fault>')
+        return 500, ENVELOPE.format(fault)
+
+    def count(self, operation):
+        with self._lock:
+            return sum(1 for _, name, _ in self.calls if name == operation)
+
+    def since(self, start):
+        """start（perf_counter）之后收到的请求"""
+        with self._lock:
+            return [call for call in self.calls if call[0] >= start]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='onvif-mock', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,106 @@
+"""对比管道像素格式：rgb24 与 yuv420p / nv12 的带宽和 CPU
+
+每种格式用同一个测试源起一个 StreamHandler，按显示帧率取帧并合成到显示缓冲
+（YUV 在这一步转 RGB，rgb24 只缩放），报告：
+    每帧管道字节数和实际读到的总字节数
+    ffmpeg 进程的 CPU（rgb24 需要 swscale 做色彩转换，YUV 只缩放）
+    本进程的 CPU 和显示线程上每帧的合成/转换耗时
+    实际帧率
+结果用来决定 PIPE_PIX_FMTS 的默认顺序。
+
+用法（在 src 目录下）：
+    python -m benchmarks.pixfmt_bench --source file --size 1280x720 --display 1280x720
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.harness import proc_cpu_seconds, summarize
+from benchmarks.sources import KINDS, make_source
+from rtsp.stream_handler import StreamHandler
+from utils.compositor import PipCompositor
+from utils.metrics import registry as metrics
+
+
+def pipe_bytes(name):
+    return metrics.snapshot().get(name, {}).get('counters', {}).get('pipe_bytes', 0)
+
+
+def run_format(source, pix_fmt, decode_size, display_size, fps, seconds, warmup):
+    width, height = decode_size
+    handler = StreamHandler(source.url, width, height, pix_fmt=pix_fmt, fps=fps,
+                            input_args=source.input_args, name=f'pixfmt-{pix_fmt}')
+    compositor = PipCompositor()
+    out = np.empty((display_size[1], display_size[0], 3), np.uint8)
+    handler.start_stream()
+    try:
+        # 等首帧并跳过启动阶段
+        deadline = time.time() + warmup
+        while time.time() < deadline:
+            frame = handler.take()
+            handler.release(frame)
+            time.sleep(0.01)
+        start_bytes = pipe_bytes(handler.name)
+        start_frames = handler.reader.frames
+        ffmpeg_start = proc_cpu_seconds(handler.proc.pid)
+        self_start = time.process_time()
+        start = time.perf_counter()
+        costs = []
+        while time.perf_counter() - start < seconds:
+            frame = handler.take()
+            if frame is None:
+                handler.wait(0.1)
+                continue
+            before = time.perf_counter()
+            compositor.compose(frame, None, out, handler.pix_fmt)
+            costs.append(time.perf_counter() - before)
+            handler.release(frame)
+        elapsed = time.perf_counter() - start
+        ffmpeg_end = proc_cpu_seconds(handler.proc.pid)
+        self_cpu = time.process_time() - self_start
+        frames = handler.reader.frames - start_frames
+        total_bytes = pipe_bytes(handler.name) - start_bytes
+    finally:
+        handler.stop_stream()
+    s = summarize(costs)
+    ffmpeg_cpu = ffmpeg_end - ffmpeg_start if ffmpeg_start is not None else None
+    return {'pix_fmt': handler.pix_fmt, 'frame_bytes': handler.frame_bytes,
+            'mb_per_s': total_bytes / elapsed / 1e6, 'fps': frames / elapsed,
+            'ffmpeg_cpu': ffmpeg_cpu / elapsed if ffmpeg_cpu is not None else None,
+            'self_cpu': self_cpu / elapsed, 'convert_ms': s['avg_ms'], 'convert_p95_ms': s['p95_ms']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="管道像素格式对比")
+    parser.add_argument('--source', choices=KINDS, default='file')
+    parser.add_argument('--path', help="file/loopback 源使用的本地片段")
+    parser.add_argument('--size', default='1280x720', help="解码输出尺寸")
+    parser.add_argument('--display', default=None, help="显示尺寸，默认与解码尺寸相同")
+    parser.add_argument('--fps', type=int, default=25)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--formats', default='rgb24,yuv420p,nv12')
+    args = parser.parse_args()
+    decode_size = tuple(map(int, args.size.split('x')))
+    display_size = tuple(map(int, (args.display or args.size).split('x')))
+
+    results = []
+    with make_source(args.source, *decode_size, path=args.path) as source:
+        for pix_fmt in args.formats.split(','):
+            results.append(run_format(source, pix_fmt, decode_size, display_size, args.fps,
+                                      args.seconds, args.warmup))
+
+    print(f"源 {args.source}，解码 {args.size}，显示 {display_size[0]}x{display_size[1]}，"
+          f"{args.fps}fps，每种格式 {args.seconds:.0f}s")
+    print(f"{'格式':>8} {'KB/帧':>7} {'MB/s':>6} {'fps':>5} {'ffmpeg CPU':>10} "
+          f"{'本进程 CPU':>10} {'合成 ms':>8} {'p95':>6}")
+    for r in results:
+        ffmpeg_cpu = f"{r['ffmpeg_cpu'] * 100:.0f}%" if r['ffmpeg_cpu'] is not None else '-'
+        print(f"{r['pix_fmt']:>8} {r['frame_bytes'] / 1024:>7.0f} {r['mb_per_s']:>6.1f} "
+              f"{r['fps']:>5.1f} {ffmpeg_cpu:>10} {r['self_cpu'] * 100:>9.0f}% "
+              f"{r['convert_ms'] or 0:>8.2f} {r['convert_p95_ms'] or 0:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""回放测速：关键帧索引的建立/加载耗时、跳转到随机位置的出帧延迟、缩略图缓存命中
+
+默认生成一个 GOP 为 1 秒的长测试片段（mp4）；也可以用 --clip 指定已有文件，
+或用 --dir 指定录像目录（多段拼成一条时间轴）。
+
+用法（在 src 目录下）：
+    python -m benchmarks.playback_bench --minutes 10 --seeks 20
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.harness import summarize
+from rtsp.playback import (INDEX_DIR, INDEX_DTYPE, RecordingCatalog, ThumbnailCache,
+                           grab_frame, load_index, playback_input_args)
+from rtsp.stream_handler import StreamHandler
+
+
+def make_long_clip(path, minutes, width=1280, height=720, gop=25):
+    """testsrc2 编码的长片段；固定 GOP，与摄像机录像相近"""
+    subprocess.run(['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+                    '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate=25',
+                    '-t', str(int(minutes * 60)), '-c:v', 'libx264', '-preset', 'ultrafast',
+                    '-g', str(gop), '-pix_fmt', 'yuv420p', path], check=True, timeout=1800)
+    return path
+
+
+def bench_index(paths):
+    """首次建索引（扫描文件）和再次加载（mmap 缓存）的耗时"""
+    for path in paths:
+        shutil.rmtree(os.path.join(os.path.dirname(os.path.abspath(path)), INDEX_DIR),
+                      ignore_errors=True)
+    start = time.perf_counter()
+    for path in paths:
+        load_index(path)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    for path in paths:
+        load_index(path)
+    loaded = time.perf_counter() - start
+    size = sum(os.path.getsize(p) for p in paths)
+    return built, loaded, size
+
+
+def bench_seeks(catalog, count, width, height, rng):
+    """随机跳转：单帧取帧（拖动时间轴）和开始播放（StreamHandler 出首帧）的耗时"""
+    grab, play = [], []
+    for t in rng.uniform(0, catalog.duration, count):
+        path, pts, _ = catalog.seek(t)
+        start = time.perf_counter()
+        if grab_frame(path, pts, width, height) is not None:
+            grab.append(time.perf_counter() - start)
+        handler = StreamHandler(path, width, height, fps=None, name='playback_bench',
+                                input_args=playback_input_args(pts))
+        start = time.perf_counter()
+        handler.start_stream()
+        frame = handler.read(timeout=10)
+        if frame is not None:
+            play.append(time.perf_counter() - start)
+            handler.release(frame)
+        handler.stop_stream()
+    return grab, play
+
+
+def bench_thumbnails(catalog, count):
+    cache = ThumbnailCache()
+    times = np.linspace(0, catalog.duration, count, endpoint=False)
+    passes = []
+    for _ in range(2):
+        start = time.perf_counter()
+        for t in times:
+            path, pts, _ = catalog.seek(t)
+            cache.get(path, pts, 160, 90)
+        passes.append(time.perf_counter() - start)
+    return passes, cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放索引与跳转测速")
+    parser.add_argument('--clip', help="已有的视频文件")
+    parser.add_argument('--dir', help="录像目录")
+    parser.add_argument('--minutes', type=float, default=10, help="生成的测试片段时长")
+    parser.add_argument('--size', default='1280x720', help="回放输出尺寸")
+    parser.add_argument('--seeks', type=int, default=20)
+    parser.add_argument('--thumbnails', type=int, default=10)
+    args = parser.parse_args()
+
+    source = args.dir or args.clip
+    if source is None:
+        source = os.path.join(tempfile.gettempdir(), f'playback_bench_{args.minutes:g}min.mp4')
+        if not os.path.exists(source):
+            print("生成测试片段...")
+            make_long_clip(source, args.minutes)
+    paths = RecordingCatalog(source).paths
+    width, height = map(int, args.size.split('x'))
+
+    built, loaded, size = bench_index(paths)
+    catalog = RecordingCatalog(source)
+    keys = catalog.keyframe_times().size
+    print(f"{len(paths)} 个文件 {size / 2 ** 20:.0f} MB，时长 {catalog.duration:.0f}s，{keys} 个关键帧")
+    print(f"建索引 {built * 1000:.1f} ms，缓存加载 {loaded * 1000:.2f} ms，"
+          f"索引大小 {keys * INDEX_DTYPE.itemsize / 1024:.1f} KB")
+
+    grab, play = bench_seeks(catalog, args.seeks, width, height, np.random.default_rng(0))
+    g, p = summarize(grab), summarize(play)
+    print(f"跳转取帧（{len(grab)} 次）: avg {g['avg_ms'] or 0:.1f} / p95 {g['p95_ms'] or 0:.1f} ms")
+    print(f"跳转播放出首帧（{len(play)} 次）: avg {p['avg_ms'] or 0:.1f} / "
+          f"p95 {p['p95_ms'] or 0:.1f} ms")
+
+    passes, cache = bench_thumbnails(catalog, args.thumbnails)
+    print(f"{args.thumbnails} 张缩略图: 首次 {passes[0] * 1000:.0f} ms，"
+          f"再次 {passes[1] * 1000:.2f} ms（命中 {cache.hits} / 未命中 {cache.misses}）")
+
+
+if __name__ == "__main__":
+    main()
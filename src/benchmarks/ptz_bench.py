@@ -0,0 +1,88 @@
+"""按住持续移动测速：模拟摇杆拖动，统计实际发给摄像机的命令数和跟手延迟
+
+对本地模拟 ONVIF 摄像机（benchmarks.onvif_mock）做若干次按住-拖动-松开：
+拖动期间以 --rate 的频率调用 press() 改变速度，松开后调用 release()。
+报告调用线程上 press()/release() 的耗时、按下到摄像机收到第一条 ContinuousMove、
+松开到收到 Stop 的延迟，以及每次按住发出的 ContinuousMove / Stop 条数。
+
+用法（在 src 目录下）：
+    python -m benchmarks.ptz_bench --holds 5 --hold 2 --rate 60 --latency 0.02
+"""
+import argparse
+import math
+import time
+
+from benchmarks.harness import summarize
+from benchmarks.onvif_mock import MockONVIFCamera
+from ptz.command_queue import PTZCommandQueue
+from ptz.controller import ONVIFController
+
+
+def wait_for(camera, operation, start, timeout=5.0):
+    """start 之后摄像机第一次收到 operation 的时刻；超时返回 None"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        for received, name, _ in camera.since(start):
+            if name == operation:
+                return received
+        time.sleep(0.002)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PTZ 持续移动测速")
+    parser.add_argument('--holds', type=int, default=5, help="按住-松开的次数")
+    parser.add_argument('--hold', type=float, default=2.0, help="每次按住的秒数")
+    parser.add_argument('--rate', type=float, default=60.0, help="拖动时每秒调用 press() 的次数")
+    parser.add_argument('--latency', type=float, default=0.02, help="模拟摄像机处理一条命令的秒数")
+    args = parser.parse_args()
+
+    with MockONVIFCamera(latency=args.latency) as camera:
+        controller = ONVIFController('127.0.0.1', camera.port, 'admin', 'admin')
+        controller.warm_up()
+        controller.soap_log.enabled = False
+        queue = PTZCommandQueue(controller)
+        calls, first_move, stop_delay, moves, stops = [], [], [], [], []
+        events = 0
+        for _ in range(args.holds):
+            start = time.perf_counter()
+            t = 0.0
+            while t < args.hold:
+                # 摇杆画圈：速度连续变化，每次都和上一次不同
+                pan = 0.8 * math.cos(2 * math.pi * t / args.hold)
+                tilt = 0.8 * math.sin(2 * math.pi * t / args.hold)
+                before = time.perf_counter()
+                queue.press(pan, tilt)
+                calls.append(time.perf_counter() - before)
+                events += 1
+                time.sleep(1 / args.rate)
+                t = time.perf_counter() - start
+            released = time.perf_counter()
+            queue.release()
+            calls.append(time.perf_counter() - released)
+            events += 1
+            moved = wait_for(camera, 'ContinuousMove', start)
+            stopped = wait_for(camera, 'Stop', released)
+            if moved is not None:
+                first_move.append(moved - start)
+            if stopped is not None:
+                stop_delay.append(stopped - released)
+            time.sleep(0.3)  # 确认松开之后没有迟到的命令
+            received = [name for _, name, _ in camera.since(start)]
+            moves.append(received.count('ContinuousMove'))
+            stops.append(received.count('Stop'))
+        queue.close()
+
+    print(f"{args.holds} 次按住，每次 {args.hold:.1f}s，拖动 {args.rate:.0f} 次/秒，"
+          f"摄像机处理 {args.latency * 1000:.0f} ms/条")
+    print(f"press()/release() 调用 {events} 次，调用线程耗时 "
+          f"max {summarize(calls)['max_ms'] * 1000:.0f} µs")
+    print(f"实际发出 ContinuousMove {sum(moves)} 条（每次按住 {min(moves)}-{max(moves)} 条），"
+          f"Stop {sum(stops)} 条（每次按住 {min(stops)}-{max(stops)} 条），合并 {queue.merged} 次")
+    for name, samples in (('按下到开始移动', first_move), ('松开到 Stop', stop_delay)):
+        s = summarize(samples)
+        print(f"{name}: avg {s['avg_ms'] or 0:.0f} / max {s['max_ms'] or 0:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""本地测试流源：不依赖真实摄像机，给拉流流水线提供可重复的输入
+
+lavfi     ffmpeg testsrc2 实时生成（不经过解码）
+file      循环播放本地 H.264 片段
+loopback  另起一个 ffmpeg 把片段（不转码）推到回环 TCP 端口，模拟网络流
+rtsp      本机有 mediamtx 时启动一个 RTSP 服务并推流，最接近真实摄像机
+"""
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+from rtsp.decoder import make_test_clip
+from rtsp.ffmpeg_cmd import RTSP_INPUT_ARGS
+
+KINDS = ('lavfi', 'file', 'loopback', 'rtsp')
+
+
+def test_clip(width, height, seconds=5):
+    """取（必要时生成）指定分辨率的 H.264 测试片段"""
+    path = os.path.join(tempfile.gettempdir(), f'bench_clip_{width}x{height}.mp4')
+    if not os.path.exists(path):
+        make_test_clip(path, width, height, seconds=seconds)
+    return path
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_port(port, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(('127.0.0.1', port)) == 0:
+                return True
+        time.sleep(0.05)
+    return False
+
+
+def _stop(proc):
+    if proc is None or proc.poll() is not None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout=2)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+class Source:
+    """测试流源：start() 之后用 url 和 input_args 构造 StreamHandler"""
+    kind = ''
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.url = None
+        self.input_args = RTSP_INPUT_ARGS
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class LavfiSource(Source):
+    kind = 'lavfi'
+
+    def start(self):
+        self.url = f'testsrc2=size={self.width}x{self.height}:rate=25'
+        self.input_args = ['-re', '-f', 'lavfi']
+        return self
+
+
+class FileSource(Source):
+    kind = 'file'
+
+    def __init__(self, width, height, path=None):
+        super().__init__(width, height)
+        self.path = path
+
+    def start(self):
+        self.url = self.path or test_clip(self.width, self.height)
+        self.input_args = ['-re', '-stream_loop', '-1']
+        return self
+
+
+class LoopbackSource(Source):
+    """回环 TCP 源：Python 监听端口，每来一个连接才启动一个推流 ffmpeg 直接写入该连接
+
+    推流进程在连接建立后才开始按实时速率读片段，播放端不会先收到一大段积压数据；
+    播放端重连（会话重启）时会得到一个新的推流进程。
+    默认封装为 flv（逐包写出，适合直播）；也可用 'mpegts'，但部分 ffmpeg 静态构建解复用 TS 会崩溃。
+    """
+    kind = 'loopback'
+
+    def __init__(self, width, height, path=None, container='flv'):
+        super().__init__(width, height)
+        self.path = path
+        self.container = container
+        self.server = None
+        self.procs = []
+
+    def start(self):
+        self.clip = self.path or test_clip(self.width, self.height)
+        self.server = socket.socket()
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen()
+        self.url = f'tcp://127.0.0.1:{self.server.getsockname()[1]}'
+        threading.Thread(target=self._accept_loop, name='loopback-source', daemon=True).start()
+        return self
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            with conn:
+                self.procs.append(subprocess.Popen(
+                    ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-re', '-stream_loop', '-1',
+                     '-i', self.clip, '-c', 'copy', '-f', self.container, 'pipe:1'],
+                    stdin=subprocess.DEVNULL, stdout=conn.fileno(), stderr=subprocess.DEVNULL))
+
+    def stop(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        for proc in self.procs:
+            _stop(proc)
+        self.procs = []
+
+
+class RTSPSource(Source):
+    """用 mediamtx 在本机提供 RTSP 服务，ffmpeg 推流到其中一个路径"""
+    kind = 'rtsp'
+    _server = None
+    _server_port = None
+    _users = 0
+
+    def __init__(self, width, height, path=None):
+        super().__init__(width, height)
+        self.path = path
+        self.proc = None
+
+    @classmethod
+    def available(cls):
+        return shutil.which('mediamtx') is not None
+
+    @classmethod
+    def _start_server(cls):
+        if cls._server is None:
+            port = free_port()
+            config_path = os.path.join(tempfile.gettempdir(), 'bench_mediamtx.yml')
+            with open(config_path, 'w', encoding='utf-8') as f:
+                f.write(f'rtspAddress: 127.0.0.1:{port}\nrtmp: no\nhls: no\nwebrtc: no\nsrt: no\n'
+                        f'paths:\n  all_others:\n')
+            cls._server = subprocess.Popen(['mediamtx', config_path],
+                                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            cls._server_port = port
+            if not _wait_port(port):
+                raise RuntimeError("mediamtx 未能启动")
+        cls._users += 1
+        return cls._server_port
+
+    @classmethod
+    def _release_server(cls):
+        cls._users -= 1
+        if cls._users <= 0 and cls._server is not None:
+            _stop(cls._server)
+            cls._server = None
+
+    def start(self):
+        if not self.available():
+            raise RuntimeError("未找到 mediamtx，无法提供本地 RTSP 源")
+        port = self._start_server()
+        clip = self.path or test_clip(self.width, self.height)
+        self.url = f'rtsp://127.0.0.1:{port}/bench{free_port()}'
+        self.proc = subprocess.Popen(
+            ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-re', '-stream_loop', '-1',
+             '-i', clip, '-c', 'copy', '-f', 'rtsp', '-rtsp_transport', 'tcp', self.url],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(1.0)  # 等推流端完成 ANNOUNCE/RECORD
+        return self
+
+    def stop(self):
+        _stop(self.proc)
+        self.proc = None
+        self._release_server()
+
+
+def make_source(kind, width, height, path=None):
+    if kind == 'lavfi':
+        return LavfiSource(width, height)
+    if kind == 'file':
+        return FileSource(width, height, path)
+    if kind == 'loopback':
+        return LoopbackSource(width, height, path)
+    if kind == 'rtsp':
+        return RTSPSource(width, height, path)
+    raise ValueError(f"未知的测试源: {kind}")
@@ -0,0 +1,100 @@
+"""切换测速：直连冷启动与从预连接池提升的出首帧耗时对比
+
+两路回环 TCP 源模拟两台摄像机（GOP 为 2 秒），在两路之间来回切换：
+    冷启动  每次新建 StreamHandler 直连（协议握手 + 探测 + 等关键帧）
+    预连接  StandbyPool 常驻两路，切换时从缓存的 GOP 开始解码
+回环源每次连接都从片段开头（关键帧）推流，冷启动的数字比真实摄像机乐观。
+
+用法（在 src 目录下）：
+    python -m benchmarks.standby_bench --switches 10
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.harness import proc_cpu_seconds, summarize
+from benchmarks.sources import LoopbackSource
+from rtsp.decoder import _run
+from rtsp.standby import StandbyPool
+from rtsp.stream_handler import StreamHandler
+
+
+def make_clip(width, height, seconds=20, gop=50):
+    path = os.path.join(tempfile.gettempdir(), f'standby_clip_{width}x{height}_g{gop}.mp4')
+    if not os.path.exists(path):
+        _run(['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+              '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate=25',
+              '-t', str(seconds), '-c:v', 'libx264', '-preset', 'ultrafast', '-bf', '0',
+              '-g', str(gop), '-pix_fmt', 'yuv420p', path], timeout=300)
+    return path
+
+
+def first_frame(handler, timeout=15):
+    """启动会话到取到第一帧的秒数；超时返回 None"""
+    start = time.perf_counter()
+    handler.start_stream()
+    frame = handler.read(timeout=timeout)
+    cost = time.perf_counter() - start
+    if frame is None:
+        return None
+    handler.release(frame)
+    return cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预连接切换测速")
+    parser.add_argument('--size', default='1280x720', help="源分辨率")
+    parser.add_argument('--output', default='640x360', help="解码输出尺寸")
+    parser.add_argument('--switches', type=int, default=10)
+    args = parser.parse_args()
+    width, height = map(int, args.size.split('x'))
+    out_w, out_h = map(int, args.output.split('x'))
+    clip = make_clip(width, height)
+
+    sources = [LoopbackSource(width, height, clip).start() for _ in range(2)]
+    try:
+        cold = []
+        for i in range(args.switches):
+            source = sources[i % 2]
+            handler = StreamHandler(source.url, out_w, out_h, name='cold',
+                                    input_args=source.input_args)
+            cost = first_frame(handler)
+            handler.stop_stream()
+            if cost is not None:
+                cold.append(cost)
+
+        pool = StandbyPool(size=2, favourites=[s.url for s in sources],
+                           input_args=sources[0].input_args)
+        pool_started = time.time()
+        standby = [pool.warm(s.url) for s in sources]
+        deadline = time.time() + 15
+        while not all(s.ready for s in standby) and time.time() < deadline:
+            time.sleep(0.1)
+        warm = []
+        for i in range(args.switches):
+            source = sources[i % 2]
+            start = time.perf_counter()
+            handler = pool.open(source.url, out_w, out_h, name='warm')
+            frame = handler.read(timeout=15)
+            if frame is not None:
+                warm.append(time.perf_counter() - start)
+                handler.release(frame)
+            handler.stop_stream()
+            time.sleep(0.5)  # 让预连接缓存新的 GOP，接近真实的切换间隔
+        demux_cpu = sum(proc_cpu_seconds(s.proc.pid) or 0.0 for s in standby)
+        demux_wall = time.time() - pool_started
+        pool.close()
+    finally:
+        for source in sources:
+            source.stop()
+
+    for name, samples in (('冷启动', cold), ('预连接', warm)):
+        s = summarize(samples)
+        print(f"{name}（{len(samples)} 次）: avg {s['avg_ms'] or 0:.0f} / "
+              f"p95 {s['p95_ms'] or 0:.0f} / max {s['max_ms'] or 0:.0f} ms")
+    print(f"两路预连接 ffmpeg（只解复用）CPU 占用 {demux_cpu / demux_wall * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import time
+import tkinter as tk
+from threading import Event, Thread
+from tkinter import ttk, Label
+
+from gui.renderer import PanelRenderer
+from rtsp.frame_reader import FramePool, LatestFrameSlot
+from rtsp.mosaic import MosaicSession, parse_sources
+from utils import config
+from utils.mosaic import parse_grid
+
+
+class MosaicWindow(tk.Toplevel):
+    """多画面窗口：按网格同时显示多路流，每路按格子尺寸解码后合成为一幅画面"""
+
+    GRIDS = ('1x2', '2x2', '3x3', '4x4')
+
+    def __init__(self, master, sources=()):
+        super().__init__(master)
+        self.title("多画面")
+        self.geometry("1280x800")
+        self.configure(bg="#000000")
+        self.grid_var = tk.StringVar(value=config.MOSAIC_GRID)
+        self.status_var = tk.StringVar(value="未播放")
+        self.slot = LatestFrameSlot()
+        self.pool = None
+        self.renderer = None
+        self.session = None
+        self._stop_event = Event()  # 每次播放一个，旧的播放线程只看自己的事件
+        self._alive = True
+        self.panel_size = (1280, 720)
+        self.last_resize_time = 0.0
+        self._create_widgets(sources)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+    def _create_widgets(self, sources):
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Label(toolbar, text="网格:").pack(side=tk.LEFT)
+        ttk.Combobox(toolbar, textvariable=self.grid_var, values=self.GRIDS,
+                     state='readonly', width=5).pack(side=tk.LEFT, padx=(3, 10))
+        ttk.Button(toolbar, text="▶", width=3, command=self.play).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="⏸", width=3, command=self.stop).pack(side=tk.LEFT, padx=2)
+        ttk.Label(toolbar, textvariable=self.status_var).pack(side=tk.RIGHT)
+
+        # 每行一路流，可在主码流后加空格写子码流地址
+        self.sources_text = tk.Text(self, height=4, font=('Consolas', 9))
+        self.sources_text.pack(fill=tk.X, padx=5)
+        self.sources_text.insert('1.0', '\n'.join(
+            ' '.join(s) if isinstance(s, (tuple, list)) else s for s in sources))
+
+        self.panel = Label(self, bg="#000000")
+        self.panel.pack(fill=tk.BOTH, expand=True)
+        self.panel.bind('<Configure>', self.on_resize)
+
+    def on_resize(self, event):
+        self.panel_size = (event.width & ~1, event.height & ~1)
+        self.last_resize_time = time.time()
+
+    def play(self):
+        self.stop()
+        sources = parse_sources(self.sources_text.get('1.0', tk.END))
+        if not sources:
+            self.status_var.set("请填写流地址")
+            return
+        rows, cols = parse_grid(self.grid_var.get())
+        self._stop_event = Event()
+        self.status_var.set("连接中...")
+        self.renderer = PanelRenderer(self.panel, self.slot, fps=config.MOSAIC_FPS,
+                                      release=lambda frame: self.pool.release(frame))
+        self.renderer.start()
+        Thread(target=self._run, args=(sources, rows, cols, self._stop_event),
+               daemon=True).start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.renderer:
+            self.renderer.stop()
+            print("多画面渲染统计:", self.renderer.stats())
+            self.renderer = None
+
+    def close(self):
+        self.stop()
+        self._alive = False
+        self.destroy()
+
+    def _post(self, func, *args):
+        """后台线程把界面更新交给主线程；窗口已关闭时丢弃"""
+        if not self._alive:
+            return
+        try:
+            self.after(0, func, *args)
+        except (tk.TclError, RuntimeError):
+            pass
+
+    def _open(self, sources, rows, cols, stop_event):
+        width, height = self.panel_size
+        session = MosaicSession(sources, rows, cols, width, height,
+                                motion=config.MOTION_DETECTION, on_motion=self._on_motion)
+        session.start()
+        pool = FramePool((height, width, 3))
+        if not stop_event.is_set():
+            # 已被新的一次播放取代时不覆盖新会话的状态
+            self.session = session
+            self.pool = pool
+        return session, pool
+
+    def _on_motion(self, index, event):
+        """某个格子开始/结束运动（检测线程中调用），在状态栏提示"""
+        session = self.session
+        active = session.active_tiles() if session else []
+        text = f"运动: {', '.join(str(i + 1) for i in active)}" if active else "无运动"
+        self._post(self.status_var.set, text)
+
+    def _run(self, sources, rows, cols, stop_event):
+        session = None
+        try:
+            session, pool = self._open(sources, rows, cols, stop_event)
+            self._post(self.status_var.set, f"播放中 {rows}x{cols}，格子 "
+                       f"{session.tile_size[0]}x{session.tile_size[1]}")
+            interval = 1.0 / config.MOSAIC_FPS
+            while not stop_event.is_set():
+                start = time.time()
+                # 窗口尺寸稳定后按新的格子尺寸重建各路解码
+                if (session.width, session.height) != self.panel_size and \
+                        time.time() - self.last_resize_time > config.RESIZE_DEBOUNCE:
+                    session.stop()
+                    session, pool = self._open(sources, rows, cols, stop_event)
+                out = pool.acquire()
+                if session.step(out):
+                    pool.release(self.slot.publish(out))
+                else:
+                    pool.release(out)
+                elapsed = time.time() - start
+                if elapsed < interval:
+                    time.sleep(interval - elapsed)
+        except Exception as e:
+            print(f"多画面异常: {e}")
+            self._post(self.status_var.set, "播放错误")
+        finally:
+            if session:
+                print(f"多画面丢帧数: {session.dropped()}")
+                session.stop()
@@ -0,0 +1,268 @@
+import threading
+import time
+import tkinter as tk
+from threading import Thread
+from tkinter import ttk, Label, filedialog
+
+import numpy as np
+from PIL import Image, ImageTk
+
+from gui.renderer import PanelRenderer
+from rtsp.frame_reader import FramePool, LatestFrameSlot
+from rtsp.playback import RecordingCatalog, ThumbnailCache, grab_frame, playback_input_args
+from rtsp.stream_handler import StreamHandler
+from utils import config
+
+
+def format_position(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class PlaybackWindow(tk.Toplevel):
+    """录像回放窗口：拖动时间轴只解目标位置前最近的关键帧，松开后从该关键帧开始播放"""
+
+    def __init__(self, master, source=None):
+        super().__init__(master)
+        self.title("录像回放")
+        self.geometry("1280x860")
+        self.configure(bg="#000000")
+        self.status_var = tk.StringVar(value="未打开录像")
+        self.position_var = tk.DoubleVar(value=0.0)
+        self.catalog = None
+        self.thumbnails = ThumbnailCache()
+        self.slot = LatestFrameSlot()
+        self.pool = FramePool((720, 1280, 3))
+        self.panel_size = (1280, 720)
+        self.playing = False
+        self.play_token = 0          # 每次开始/跳转播放加一，旧的播放线程据此退出
+        self.play_origin = (0.0, 0.0)  # (开始播放时的时间轴位置, 开始时刻)
+        self._thumb_images = []
+        self._updating_scale = False
+        self._scrub_cond = threading.Condition()
+        self._scrub_target = None
+        self._closed = False
+        self._create_widgets()
+        self.renderer = PanelRenderer(self.panel, self.slot, fps=config.DISPLAY_FPS,
+                                      release=lambda frame: self.pool.release(frame),
+                                      name='playback')
+        self.renderer.start()
+        Thread(target=self._scrub_loop, name='playback-scrub', daemon=True).start()
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self._tick()
+        if source:
+            self.open(source)
+
+    def _create_widgets(self):
+        toolbar = ttk.Frame(self)
+        toolbar.pack(side=tk.TOP, fill=tk.X, padx=5, pady=5)
+        ttk.Button(toolbar, text="目录", width=5,
+                   command=lambda: self.open(filedialog.askdirectory(
+                       initialdir=config.RECORD_DIR))).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="文件", width=5,
+                   command=lambda: self.open(filedialog.askopenfilename(
+                       initialdir=config.RECORD_DIR))).pack(side=tk.LEFT, padx=2)
+        self.play_button = ttk.Button(toolbar, text="▶", width=3, command=self.toggle_play)
+        self.play_button.pack(side=tk.LEFT, padx=(10, 2))
+        ttk.Label(toolbar, textvariable=self.status_var).pack(side=tk.RIGHT)
+
+        # 时间轴和缩略图条在画面下方
+        self.scale = ttk.Scale(self, from_=0.0, to=1.0, variable=self.position_var,
+                               command=self.on_scrub)
+        self.scale.pack(side=tk.BOTTOM, fill=tk.X, padx=5, pady=(0, 5))
+        self.scale.bind('<ButtonRelease-1>', lambda e: self.seek(self.position_var.get()))
+        thumb_h = config.PLAYBACK_THUMBNAIL_WIDTH * 9 // 16
+        self.strip = tk.Canvas(self, height=thumb_h + 4, bg="#1a1a1a", highlightthickness=0)
+        self.strip.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+        self.strip.bind('<Button-1>', self.on_strip_click)
+
+        self.panel = Label(self, bg="#000000")
+        self.panel.pack(fill=tk.BOTH, expand=True)
+        self.panel.bind('<Configure>', self.on_resize)
+
+    def on_resize(self, event):
+        self.panel_size = (max(event.width & ~1, 2), max(event.height & ~1, 2))
+
+    def open(self, source):
+        if not source:
+            return
+        self.stop_playback()
+        self.status_var.set("建立索引...")
+        Thread(target=self._load, args=(source,), daemon=True).start()
+
+    def _load(self, source):
+        try:
+            start = time.perf_counter()
+            catalog = RecordingCatalog(source)
+            cost = time.perf_counter() - start
+        except Exception as e:
+            print("打开录像失败:", e)
+            self.after(0, self.status_var.set, "打开失败")
+            return
+        if not len(catalog):
+            self.after(0, self.status_var.set, "目录中没有录像")
+            return
+        self.after(0, self._loaded, catalog, cost)
+
+    def _loaded(self, catalog, cost):
+        self.catalog = catalog
+        self.thumbnails.clear()
+        self.scale.configure(to=max(catalog.duration, 0.001))
+        keys = catalog.keyframe_times().size
+        self.status_var.set(f"{len(catalog)} 段，{format_position(catalog.duration)}，"
+                            f"{keys} 个关键帧，索引 {cost * 1000:.0f} ms")
+        self.seek(0.0)
+        Thread(target=self._load_thumbnails, args=(catalog,), daemon=True).start()
+
+    def _load_thumbnails(self, catalog):
+        """按时间轴均匀取若干个关键帧生成缩略图，已缓存的直接复用"""
+        width = config.PLAYBACK_THUMBNAIL_WIDTH
+        height = width * 9 // 16
+        for i in range(config.PLAYBACK_THUMBNAILS):
+            if self._closed or catalog is not self.catalog:
+                return
+            t = catalog.duration * i / config.PLAYBACK_THUMBNAILS
+            path, pts, position = catalog.seek(t)
+            frame = self.thumbnails.get(path, pts, width, height)
+            if frame is not None:
+                self.after(0, self._show_thumbnail, catalog, i, position, frame)
+
+    def _show_thumbnail(self, catalog, i, position, frame):
+        if catalog is not self.catalog:
+            return
+        if i == 0:
+            self.strip.delete('all')
+            self._thumb_images = []
+        slot_w = max(self.strip.winfo_width(), 1) / config.PLAYBACK_THUMBNAILS
+        h, w = frame.shape[:2]
+        photo = ImageTk.PhotoImage(Image.frombuffer('RGB', (w, h), frame, 'raw', 'RGB', 0, 1))
+        self._thumb_images.append(photo)
+        self.strip.create_image(int(i * slot_w) + 2, 2, image=photo, anchor='nw')
+
+    def on_strip_click(self, event):
+        if not self.catalog:
+            return
+        slot_w = max(self.strip.winfo_width(), 1) / config.PLAYBACK_THUMBNAILS
+        t = self.catalog.duration * int(event.x // slot_w) / config.PLAYBACK_THUMBNAILS
+        self.seek(t)
+
+    def on_scrub(self, value):
+        """拖动中：只请求显示目标位置的关键帧，由后台线程合并处理"""
+        # 播放中拖动不取帧，松开时从新位置继续播放
+        if self._updating_scale or self.playing or not self.catalog:
+            return
+        with self._scrub_cond:
+            self._scrub_target = float(value)
+            self._scrub_cond.notify()
+
+    def _scrub_loop(self):
+        while not self._closed:
+            with self._scrub_cond:
+                self._scrub_cond.wait_for(lambda: self._scrub_target is not None or self._closed)
+                target, self._scrub_target = self._scrub_target, None
+            if target is None or not self.catalog:
+                continue
+            path, pts, position = self.catalog.seek(target)
+            width, height = self.panel_size
+            start = time.perf_counter()
+            frame = grab_frame(path, pts, width, height)
+            cost = time.perf_counter() - start
+            if frame is not None and not self.playing:
+                self.pool.release(self.slot.publish(frame))
+                self.after(0, self.status_var.set,
+                           f"{self._label(position)}  跳转 {cost * 1000:.0f} ms")
+
+    def seek(self, t):
+        """跳到 t 之前最近的关键帧；正在播放时从那里继续播放，否则只显示该帧"""
+        if not self.catalog:
+            return
+        if self.playing:
+            self.start_playback(t)
+        else:
+            self.on_scrub(t)
+
+    def toggle_play(self):
+        if self.playing:
+            self.stop_playback()
+        elif self.catalog:
+            self.start_playback(self.position_var.get())
+
+    def start_playback(self, t):
+        self.playing = True
+        self.play_token += 1
+        self.play_button.config(text="⏸")
+        Thread(target=self._play, args=(self.play_token, t), daemon=True).start()
+
+    def stop_playback(self):
+        self.playing = False
+        self.play_token += 1
+        self.play_button.config(text="▶")
+
+    def _play(self, token, t):
+        """从 t 之前的关键帧开始按原速播放，一段播完接着播下一段"""
+        catalog = self.catalog
+        while token == self.play_token and t < catalog.duration:
+            path, pts, position = catalog.seek(t)
+            width, height = self.panel_size
+            if self.pool.shape != (height, width, 3):
+                self.pool = FramePool((height, width, 3))
+            handler = StreamHandler(path, width, height, fps=None, name='playback',
+                                    input_args=playback_input_args(pts))
+            self.play_origin = (position, time.time())
+            start = time.perf_counter()
+            first = True
+            try:
+                handler.start_stream()
+                while token == self.play_token:
+                    frame = handler.read(timeout=1.0)
+                    if frame is None:
+                        if not handler.alive:
+                            break
+                        continue
+                    if first:
+                        # 第一帧到达时重新对时，跳转耗时不计入播放位置
+                        self.play_origin = (position, time.time())
+                        self.after(0, self.status_var.set,
+                                   f"{self._label(position)}  跳转 "
+                                   f"{(time.perf_counter() - start) * 1000:.0f} ms")
+                        first = False
+                    out = self.pool.acquire()
+                    np.copyto(out, frame)
+                    handler.release(frame)
+                    self.pool.release(self.slot.publish(out))
+            finally:
+                handler.stop_stream()
+            # 本段播完，接着播下一段
+            seg, _ = catalog.locate(position)
+            if seg + 1 >= len(catalog):
+                break
+            t = float(catalog.starts[seg + 1])
+        if token == self.play_token:
+            self.after(0, self.stop_playback)
+
+    def _label(self, position):
+        wall = self.catalog.wall_time(position) if self.catalog else None
+        if wall is not None:
+            return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(wall))
+        return format_position(position)
+
+    def _tick(self):
+        """播放中每 250ms 把时间轴滑块移到当前位置"""
+        if self._closed:
+            return
+        if self.playing and self.catalog:
+            origin, started = self.play_origin
+            position = min(origin + time.time() - started, self.catalog.duration)
+            self._updating_scale = True
+            self.position_var.set(position)
+            self._updating_scale = False
+        self.after(250, self._tick)
+
+    def close(self):
+        self._closed = True
+        self.stop_playback()
+        with self._scrub_cond:
+            self._scrub_cond.notify()
+        self.renderer.stop()
+        print(f"回放缩略图缓存: 命中 {self.thumbnails.hits} / 未命中 {self.thumbnails.misses}")
+        self.destroy()
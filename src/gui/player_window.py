@@ -1,7 +1,7 @@
 from tkinter import Tk, Frame, Button, Label, StringVar, Entry
-from PIL import Image, ImageTk
-import cv2
-from threading import Thread
+from gui.renderer import PanelRenderer
+from rtsp.stream_handler import StreamHandler
+from utils import config
 
 class PlayerWindow(Frame):
     def __init__(self, master):
@@ -12,13 +12,14 @@ class PlayerWindow(Frame):
         self.stream1_var = StringVar()
         self.stream2_var = StringVar()
         
-        self.create_widgets()
-        
-        self.stream1_thread = None
-        self.stream2_thread = None
+        self.stream1_session = None
+        self.stream2_session = None
         self.panel1 = None
         self.panel2 = None
         self.stop_flag = False
+        self._watch_id = None
+
+        self.create_widgets()
 
     def create_widgets(self):
         frame = Frame(self)
@@ -38,31 +39,63 @@ class PlayerWindow(Frame):
         self.panel2.pack(side="right", padx=10, pady=10)
 
     def play_stream1(self):
-        Thread(target=self.start_stream, args=(self.stream1_var.get(), self.panel1)).start()
+        self.stream1_session = self.start_stream(self.stream1_var.get(), self.panel1, self.stream1_session)
 
     def play_stream2(self):
-        Thread(target=self.start_stream, args=(self.stream2_var.get(), self.panel2)).start()
+        self.stream2_session = self.start_stream(self.stream2_var.get(), self.panel2, self.stream2_session)
 
-    def start_stream(self, stream_url, panel):
+    def start_stream(self, stream_url, panel, previous=None):
+        """拉流交给 StreamHandler，面板由 Tk 定时器从其帧队列取最新帧绘制"""
         if panel is None:
             print("Error: panel is None")
+            return None
+        if previous is not None:
+            self.stop_stream(previous)
+        handler = StreamHandler(stream_url, 640, 360, name=stream_url)  # 你可以根据窗口实际大小调整
+        try:
+            handler.start_stream()
+        except Exception as e:
+            print(f"无法打开流: {stream_url} ({e})")
+            return None
+        renderer = PanelRenderer(panel, handler.queue, release=handler.release)
+        renderer.start()
+        self.stop_flag = False
+        if self._watch_id is None:
+            self._watch_id = self.after(1000, self.watch)
+        return handler, renderer
+
+    def stop_stream(self, stream):
+        handler, renderer = stream
+        renderer.stop()
+        handler.stop_stream()
+
+    def watch(self):
+        """每秒检查一次：流结束或卡住时重连；stop_flag 置位后停掉所有会话"""
+        self._watch_id = None
+        if self.stop_flag:
+            self.stop_all()
             return
-        cap = cv2.VideoCapture(stream_url)
-        if not cap.isOpened():
-            print(f"无法打开流: {stream_url}")
-            return
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            # 缩放到窗口适合的大小
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(frame)
-            img = img.resize((640, 360))  # 你可以根据窗口实际大小调整
-            imgtk = ImageTk.PhotoImage(image=img)
-            panel.imgtk = imgtk
-            panel.config(image=imgtk)
-            panel.update()
-            if self.stop_flag:
-                break
-        cap.release()
\ No newline at end of file
+        for stream in (self.stream1_session, self.stream2_session):
+            if stream is None:
+                continue
+            handler, renderer = stream
+            if handler.stalled(config.STREAM_STALL_TIMEOUT):
+                print(f"流已结束或卡住，重连: {handler.rtsp_url}")
+                handler.restart()
+                renderer.slot = handler.queue  # 重连后帧队列是新建的
+        self._watch_id = self.after(1000, self.watch)
+
+    def stop_all(self):
+        self.stop_flag = True
+        if self._watch_id is not None:
+            self.after_cancel(self._watch_id)
+            self._watch_id = None
+        for stream in (self.stream1_session, self.stream2_session):
+            if stream is not None:
+                self.stop_stream(stream)
+        self.stream1_session = None
+        self.stream2_session = None
+
+    def destroy(self):
+        self.stop_all()
+        super().destroy()
@@ -0,0 +1,102 @@
+import time
+
+from PIL import Image, ImageTk
+
+from utils.metrics import registry as metrics
+
+
+class PanelRenderer:
+    """面板渲染器：由固定频率的 Tk 定时器驱动，每次只取最新一帧
+
+    每个面板只保留一个 PhotoImage，新帧直接 paste 进去；
+    任何时刻最多只有一个待执行的定时回调，不会在事件队列里堆积。
+    """
+
+    def __init__(self, panel, slot, fps=15, release=None, on_frame=None, name='display'):
+        self.panel = panel
+        self.slot = slot
+        self.interval_ms = max(1, int(1000 / fps))
+        self.release = release    # 帧画完后归还缓冲
+        self.on_frame = on_frame  # 每画一帧回调一次（在 Tk 线程中）
+        self.name = name          # 计量时的流名
+        self._photo = None
+        self._size = None
+        self._after_id = None
+        self._due = 0.0
+        # 统计信息
+        self.ticks = 0
+        self.frames = 0
+        self.paint_time = 0.0
+        self.paint_max = 0.0
+        self.late_time = 0.0
+
+    def start(self):
+        if self._after_id is None:
+            self._due = time.perf_counter()
+            self._after_id = self.panel.after(0, self._tick)
+
+    def stop(self):
+        if self._after_id is not None:
+            try:
+                self.panel.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _tick(self):
+        now = time.perf_counter()
+        self.ticks += 1
+        # 定时器实际触发比预期晚多少，反映 Tk 主循环的繁忙程度
+        late = max(0.0, now - self._due)
+        self.late_time += late
+        metrics.observe(self.name, 'tk_late', late)
+        frame = self.slot.take()
+        if frame is not None:
+            try:
+                self._paint(frame)
+            except Exception as e:
+                print("渲染异常:", e)
+            finally:
+                if self.release:
+                    self.release(frame)
+        self._due = time.perf_counter() + self.interval_ms / 1000.0
+        self._after_id = self.panel.after(self.interval_ms, self._tick)
+
+    def _paint(self, frame):
+        start = time.perf_counter()
+        h, w = frame.shape[:2]
+        img = Image.frombuffer('RGB', (w, h), frame, 'raw', 'RGB', 0, 1)
+        if self._photo is None or self._size != (w, h):
+            # 只有尺寸变化时才重建 PhotoImage
+            self._photo = ImageTk.PhotoImage('RGB', (w, h))
+            self._size = (w, h)
+            self.panel.config(image=self._photo)
+            self.panel.imgtk = self._photo
+        pasted = time.perf_counter()
+        self._photo.paste(img)
+        cost = time.perf_counter() - start
+        # paste 即 PIL 图像转换并写入 Tk 图像的耗时
+        metrics.observe(self.name, 'photo', cost - (pasted - start))
+        metrics.mark(self.name)
+        if metrics.enabled:
+            # Tk 在空闲时重绘控件；排在其后的 idle 回调触发时重绘已完成
+            self.panel.after_idle(self._painted, time.perf_counter())
+        self.frames += 1
+        self.paint_time += cost
+        self.paint_max = max(self.paint_max, cost)
+        if self.on_frame:
+            self.on_frame()
+
+    def _painted(self, queued_at):
+        metrics.observe(self.name, 'tk_paint', time.perf_counter() - queued_at)
+
+    def stats(self):
+        """返回渲染统计：帧数、平均/最大绘制耗时、平均定时器延迟（毫秒）"""
+        frames = max(self.frames, 1)
+        ticks = max(self.ticks, 1)
+        return {
+            'frames': self.frames,
+            'paint_ms_avg': self.paint_time / frames * 1000,
+            'paint_ms_max': self.paint_max * 1000,
+            'late_ms_avg': self.late_time / ticks * 1000,
+        }
@@ -1,115 +1,30 @@
+import argparse
+import os
 import tkinter as tk
 from tkinter import ttk, Label
 from threading import Thread
-from PIL import Image, ImageTk
 import time
-import subprocess
-import numpy as np
-from onvif import ONVIFCamera
-from tkinter import simpledialog, messagebox
+from tkinter import simpledialog, messagebox, filedialog
 from tkinter.scrolledtext import ScrolledText
-from zeep import helpers
-from lxml import etree
-from zeep.plugins import HistoryPlugin
-
-class ONVIFController:
-    def __init__(self, ip, port, username, password):
-        self.history = HistoryPlugin()
-        self.cam = ONVIFCamera(ip, port, username, password)
-        self.ptz = self.cam.create_ptz_service()
-        self.media = self.cam.create_media_service()
-        self.imaging = self.cam.create_imaging_service()
-        # 兼容主流onvif-py，插件加到_client.plugins
-        try:
-            self.ptz._client.plugins.append(self.history)
-        except AttributeError:
-            pass
-        try:
-            self.media._client.plugins.append(self.history)
-        except AttributeError:
-            pass
-        try:
-            self.imaging._client.plugins.append(self.history)
-        except AttributeError:
-            pass
-        
-    def get_profiles(self):
-        """获取摄像机配置集"""
-        return self.media.GetProfiles()
-    
-    def absolute_move(self, pan, tilt, zoom, speed=0.5):
-        """绝对移动"""
-        req = self.ptz.create_type('AbsoluteMove')
-        req.ProfileToken = self.get_profiles()[0].token
-        req.Position = {
-            'PanTilt': {'x': pan, 'y': tilt},
-            'Zoom': {'x': zoom}
-        }
-        req.Speed = {
-            'PanTilt': {'x': speed, 'y': speed},
-            'Zoom': {'x': speed}
-        }
-        self.ptz.AbsoluteMove(req)
-    
-    def relative_move(self, pan, tilt, zoom, speed=0.5):
-        """相对移动"""
-        req = self.ptz.create_type('RelativeMove')
-        req.ProfileToken = self.get_profiles()[0].token
-        req.Translation = {
-            'PanTilt': {'x': pan, 'y': tilt},
-            'Zoom': {'x': zoom}
-        }
-        req.Speed = {
-            'PanTilt': {'x': speed, 'y': speed},
-            'Zoom': {'x': speed}
-        }
-        self.ptz.RelativeMove(req)
-    
-    def continuous_move(self, pan, tilt, zoom, timeout=1):
-        """持续移动"""
-        req = self.ptz.create_type('ContinuousMove')
-        req.ProfileToken = self.get_profiles()[0].token
-        req.Velocity = {
-            'PanTilt': {'x': pan, 'y': tilt},
-            'Zoom': {'x': zoom}
-        }
-        self.ptz.ContinuousMove(req)
-        time.sleep(timeout)
-        self.ptz.Stop({'ProfileToken': req.ProfileToken})
-
-    def relative_move_with_log(self, pan, tilt, zoom, speed=0.5):
-        req = self.ptz.create_type('RelativeMove')
-        req.ProfileToken = self.get_profiles()[0].token
-        req.Translation = {
-            'PanTilt': {'x': pan, 'y': tilt},
-            'Zoom': {'x': zoom}
-        }
-        req.Speed = {
-            'PanTilt': {'x': speed, 'y': speed},
-            'Zoom': {'x': speed}
-        }
-        send_content = "未捕获到发送内容"
-        recv_content = "未捕获到返回内容"
-        try:
-            self.ptz.RelativeMove(req)
-            # 捕获最近一次请求和响应
-            if hasattr(self.history, 'last_sent') and self.history.last_sent is not None:
-                try:
-                    send_content = etree.tostring(self.history.last_sent["envelope"], pretty_print=True, encoding='unicode')
-                except Exception:
-                    send_content = "未捕获到发送内容"
-            if hasattr(self.history, 'last_received') and self.history.last_received is not None:
-                try:
-                    recv_content = etree.tostring(self.history.last_received["envelope"], pretty_print=True, encoding='unicode')
-                except Exception:
-                    recv_content = "未捕获到返回内容"
-        except Exception as e:
-            recv_content = f"Error: {e}"
-        print("发送内容：", send_content)
-        print("返回内容：", recv_content)
-        print("history.last_sent:", getattr(self.history, 'last_sent', None))
-        print("history.last_received:", getattr(self.history, 'last_received', None))
-        return send_content, recv_content
+from rtsp.adaptive import LoadMonitor, QualityController
+from rtsp.frame_bus import BusPipeline
+from rtsp.frame_reader import FramePool, LatestFrameSlot
+from rtsp.mosaic import split_source
+from rtsp.motion import MotionTap, draw_regions
+from rtsp.recorder import RecordingTap
+from rtsp.standby import StandbyPool
+from rtsp.stream_handler import StreamHandler
+from utils import config
+from utils.colorspace import DISPLAY_FORMATS
+from utils.compositor import PipCompositor
+from utils.metrics import registry as metrics, serve as serve_metrics
+from gui.renderer import PanelRenderer
+from gui.mosaic_window import MosaicWindow
+from gui.playback_window import PlaybackWindow
+from ptz.command_queue import PTZCommandQueue
+from ptz.session_pool import ONVIFSessionPool, session_key
+from ptz import soap_log
+from service import headless
 
 class PlayerWindow(ttk.Frame):
     def __init__(self, parent):
@@ -127,6 +42,7 @@ class PlayerWindow(ttk.Frame):
         self.stream2_var = tk.StringVar(value="rtsp://172.20.4.99/live/VideoChannel2")
         self.connection_status = tk.StringVar(value="未连接")
         self.stream_status = tk.StringVar(value="未播放")
+        self.low_latency_var = tk.BooleanVar(value=config.LATENCY_MODE == 'low')
 
         # 先创建右侧控制面板，确保它先显示
         self.create_ptz_controls()
@@ -136,10 +52,27 @@ class PlayerWindow(ttk.Frame):
         self.stop_flag = False
         self.panel1.bind("<Configure>", self.on_panel_resize)
         self.need_restart_stream = False
+        self.last_resize_time = 0.0
+        self.render_slot = LatestFrameSlot()  # 合成线程 -> 渲染器
+        self.render_pool = FramePool((self.panel_height, self.panel_width, 3))
+        self.renderer = None
+        self._status_shown = None
+        self.stream_sessions = ()  # 当前 (主画面, 画中画) 会话，便于查看丢帧统计
         self.onvif_controller = None
-        self.send_text = None
-        self.recv_text = None
+        self._ptz_failed = False  # 最近一条 PTZ 命令失败，状态栏显示失败直到下一条成功
+        self.onvif_pool = ONVIFSessionPool()  # 已连接的摄像机会话，切换时直接复用
+        self.onvif_key = None
+        self._camera_keys = []
+        self.ptz_queue = None
+        self.connecting = False  # 后台连接进行中，防止重复点击
+        self.soap_window = None  # SOAP 日志查看窗口
+        self.soap_text = None
         self.right_panel = None  # 保存右侧面板引用
+        self.recorder = None  # 录像旁路，跨会话复用，开始/停止录像不重连
+        self.motion = None  # 主画面运动检测旁路，跨会话复用
+        self._motion_recording = False  # 当前录像是否由运动触发
+        # 预连接池：收藏的流启动即连接，切换过的流保持连接，再切回来几乎立即出帧
+        self.standby = StandbyPool() if config.STANDBY_ENABLED else None
 
     def setup_theme(self):
         """设置 PotPlayer 风格主题"""
@@ -218,11 +151,13 @@ class PlayerWindow(ttk.Frame):
                 font=('Segoe UI', 8)).pack(side=tk.LEFT, padx=(0, 3))
         stream1_entry = ttk.Entry(stream_config_frame, textvariable=self.stream1_var, width=35)
         stream1_entry.pack(side=tk.LEFT, padx=(0, 8))
+        stream1_entry.bind('<Return>', lambda e: self.switch_streams())
         
         tk.Label(stream_config_frame, text="画中画:", bg="#1a1a1a", fg="#a0a0a0", 
                 font=('Segoe UI', 8)).pack(side=tk.LEFT, padx=(0, 3))
         stream2_entry = ttk.Entry(stream_config_frame, textvariable=self.stream2_var, width=25)
         stream2_entry.pack(side=tk.LEFT)
+        stream2_entry.bind('<Return>', lambda e: self.switch_streams())
         
         # 中间：播放控制按钮
         control_frame = tk.Frame(toolbar, bg="#1a1a1a")
@@ -234,6 +169,19 @@ class PlayerWindow(ttk.Frame):
         stop_button = ttk.Button(control_frame, text="⏸", 
                                 command=self.stop_stream, style='Small.TButton', width=3)
         stop_button.pack(side=tk.LEFT, padx=2)
+        mosaic_button = ttk.Button(control_frame, text="田",
+                                  command=self.open_mosaic, style='Small.TButton', width=3)
+        mosaic_button.pack(side=tk.LEFT, padx=2)
+        playback_button = ttk.Button(control_frame, text="回放",
+                                     command=self.open_playback, style='Small.TButton', width=4)
+        playback_button.pack(side=tk.LEFT, padx=2)
+        self.record_button = ttk.Button(control_frame, text="⏺",
+                                        command=self.toggle_recording, style='Small.TButton',
+                                        width=3)
+        self.record_button.pack(side=tk.LEFT, padx=2)
+        # 低延迟模式：切换后重连当前流
+        ttk.Checkbutton(control_frame, text="低延迟", variable=self.low_latency_var,
+                        command=self.toggle_low_latency).pack(side=tk.LEFT, padx=(8, 2))
         
         # 右侧：状态显示
         status_frame = tk.Frame(toolbar, bg="#1a1a1a")
@@ -258,11 +206,93 @@ class PlayerWindow(ttk.Frame):
         placeholder.place(relx=0.5, rely=0.5, anchor='center')
         self.panel1.placeholder = placeholder
 
+        # 统计叠加层：每秒刷新一次，关闭时不计算任何统计
+        self.stats_overlay = tk.Label(video_container, bg="#000000", fg="#00d4aa",
+                                      font=('Consolas', 8), justify=tk.LEFT, anchor='nw')
+        self.stats_after_id = None
+        if self.overlay_var.get():
+            self.toggle_stats_overlay()
+
     def stop_stream(self):
         """停止视频流"""
         self.stop_flag = True
-        self.stream_status.set("已停止")
-        self.status_label.config(fg="#a0a0a0")
+        if self.renderer:
+            self.renderer.stop()
+            print("渲染统计:", self.renderer.stats())
+            self.renderer = None
+        if self.recorder and self.recorder.recording:
+            self.toggle_recording()
+        self.set_stream_status("已停止", "#a0a0a0")
+
+    def latency_mode(self):
+        return 'low' if self.low_latency_var.get() else 'normal'
+
+    def toggle_low_latency(self):
+        """切换延迟模式；正在播放时重连流，渲染器按新模式的频率取帧"""
+        if self.stop_flag or not self.renderer:
+            return
+        self.need_restart_stream = True
+        self.renderer.stop()
+        self.renderer = self._make_renderer()
+        self.renderer.start()
+
+    def _make_renderer(self):
+        # 低延迟模式下提高取帧频率，新帧不必等到下一个显示周期
+        fps = config.LOW_LATENCY_POLL_FPS if self.low_latency_var.get() else config.DISPLAY_FPS
+        return PanelRenderer(self.panel1, self.render_slot, fps=fps,
+                             release=lambda frame: self.render_pool.release(frame),
+                             on_frame=self._on_render_frame)
+
+    def _on_render_frame(self):
+        if self.motion and self.motion.active and config.MOTION_OVERLAY:
+            self.set_stream_status("检测到运动", "#ff6666")
+        else:
+            self.set_stream_status("播放中", "#00d4aa")
+
+    def _on_motion(self, event):
+        """运动事件（在检测线程中调用），切回 Tk 线程处理"""
+        self.after(0, self._handle_motion, event)
+
+    def _handle_motion(self, event):
+        # 运动触发的录像只在运动结束时停止，手动开始的录像不受影响
+        if not config.MOTION_RECORD or self.recorder is None or self.stop_flag:
+            return
+        if event['kind'] == 'start' and not self.recorder.recording:
+            self._motion_recording = True
+            self.toggle_recording()
+        elif event['kind'] == 'end' and self._motion_recording and self.recorder.recording:
+            self._motion_recording = False
+            self.toggle_recording()
+
+    def toggle_recording(self):
+        """开始/停止录像：只切换录像旁路是否写盘，播放会话不受影响"""
+        if self.recorder is None:
+            messagebox.showinfo("录像", "请先开始播放（需开启 RECORD_TAP）")
+            return
+        if self.recorder.recording:
+            self._motion_recording = False
+            self.recorder.stop_recording()
+            self.record_button.config(text="⏺")
+            print("录像已保存:", self.recorder.path)
+        else:
+            self.recorder.start_recording()
+            self.record_button.config(text="⏹")
+
+    def switch_streams(self):
+        """地址栏回车：正在播放时切换到新地址（已预连接的流从缓存的 GOP 立即出帧）"""
+        if self.stop_flag or not self.renderer:
+            self.play_pip()
+            return
+        self.need_restart_stream = True
+
+    def open_mosaic(self):
+        """打开多画面窗口，预填当前的两路流地址"""
+        MosaicWindow(self.parent, [self.stream1_var.get(), self.stream2_var.get()])
+
+    def open_playback(self):
+        """打开录像回放窗口，默认载入录像目录"""
+        source = config.RECORD_DIR if os.path.isdir(config.RECORD_DIR) else None
+        PlaybackWindow(self.parent, source)
 
     def on_panel_resize(self, event):
         try:
@@ -270,125 +300,242 @@ class PlayerWindow(ttk.Frame):
             self.panel_width = event.width
             self.panel_height = int(self.panel_width * 9 / 16)
             self.panel1.config(width=self.panel_width, height=self.panel_height)
-            self.need_restart_stream = True  # 标记需要重启流
+            # 只记录时间，由播放线程在进程内缩放，尺寸稳定且变化较大时才重连
+            self.last_resize_time = time.time()
         except Exception as e:
             print("处理窗口大小调整异常:", e)
 
     def play_pip(self):
         self.stop_flag = False
-        self.stream_status.set("连接中...")
-        self.status_label.config(fg="#ffaa00")
+        self.set_stream_status("连接中...", "#ffaa00")
         # 隐藏占位文本
         if hasattr(self.panel1, 'placeholder'):
             self.panel1.placeholder.destroy()
+        if self.renderer:
+            self.renderer.stop()
+        self.renderer = self._make_renderer()
+        self.renderer.start()
+        if config.RECORD_TAP and self.recorder is None:
+            self.recorder = RecordingTap(name='main')
+            self.recorder.start()
+        if config.MOTION_DETECTION and self.motion is None:
+            self.motion = MotionTap('main', on_event=self._on_motion)
+            self.motion.start()
         Thread(target=self._start_pip_stream, daemon=True).start()
 
     def _start_pip_stream(self):
-        def ffmpeg_stream(url, width, height):
-            cmd = [
-                'ffmpeg', 
-                '-hwaccel', 'cuda',  # 使用NVIDIA硬件加速
-                '-hwaccel_device', '0',
-                '-c:v', 'h264_cuvid',  # NVIDIA解码    
-                '-protocol_whitelist', 'rtsp,udp,rtp,file,http,https,tcp',
-                '-i', url, # 设置输入URL为播放源
-                '-f', 'rawvideo',  # 输出格式为原始视频流
-                '-pix_fmt', 'rgb24',  # 输出格式为RGB24
-                '-s', f'{width}x{height}',  # 输出分辨率
-                '-r', '15', # 帧率
-                '-'
-            ]
-            return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=10**8)
+        # 'ffmpeg' 模式下由一个 ffmpeg 进程完成两路解码和叠加
+        composite_in_ffmpeg = config.COMPOSITE_MODE == 'ffmpeg'
+        # 'process' 模式下解码和合成在子进程中完成，本线程只取共享内存里的合成帧
+        composite_in_process = config.COMPOSITE_MODE == 'process'
+        compositor = PipCompositor()
+
+        # 画中画地址可以写成 '主码流 子码流'
+        has_substream = split_source(self.stream2_var.get())[1] is not None
+
+        def make_quality(mode):
+            """自适应画质：用不上的降级项不参与（ffmpeg 单进程叠加无法单独降画中画帧率，
+            低延迟模式不限输出帧率、降帧不减负载，没有子码流）"""
+            if not config.ADAPTIVE_QUALITY:
+                return QualityController([])
+            return QualityController(
+                [s for s in config.ADAPTIVE_STAGES
+                 if not (s == 'pip_fps' and (composite_in_ffmpeg or mode == 'low'))
+                 and not (s == 'pip_substream' and not has_substream)])
+
+        quality_mode = self.latency_mode()
+        quality = make_quality(quality_mode)
+        monitor = LoadMonitor(1.0 / config.DISPLAY_FPS)
+
+        def pip_url():
+            return quality.pip_url(*split_source(self.stream2_var.get()))
+
+        def open_handler(url, width, height, **kwargs):
+            """单路解码会话：启用预连接池时经池取流"""
+            if self.standby:
+                return self.standby.open(url, width, height, **kwargs)
+            handler = StreamHandler(url, width, height, **kwargs)
+            handler.start_stream()
+            return handler
+
+        def open_main(width, height):
+            """主画面会话；ffmpeg/进程合成模式下一个会话输出已合成的画面"""
+            mode = self.latency_mode()
+            record_url = self.recorder.url if self.recorder else None
+            main_url = split_source(self.stream1_var.get())[0]
+            width, height = quality.main_size(width, height)
+            if composite_in_process:
+                main = BusPipeline(main_url, width, height, pip_url=pip_url(),
+                                   fps=config.DISPLAY_FPS,
+                                   pip_fps=quality.pip_fps(config.DISPLAY_FPS),
+                                   pip_ratio=compositor.pip_ratio, margin=compositor.margin,
+                                   latency_mode=mode, record_url=record_url, name='composite')
+            elif composite_in_ffmpeg:
+                main = StreamHandler(main_url, width, height, fps=config.DISPLAY_FPS,
+                                     name='composite', overlay_url=pip_url(),
+                                     overlay_ratio=compositor.pip_ratio,
+                                     overlay_margin=compositor.margin, latency_mode=mode,
+                                     record_url=record_url, pix_fmt=DISPLAY_FORMATS)
+            else:
+                return open_handler(main_url, width, height, fps=config.DISPLAY_FPS,
+                                    role='main', latency_mode=mode, record_url=record_url,
+                                    pix_fmt=DISPLAY_FORMATS)
+            main.start_stream()
+            return main
+
+        def open_pip(width, height):
+            """单独的画中画会话；ffmpeg/进程合成模式下没有"""
+            if composite_in_ffmpeg or composite_in_process:
+                return None
+            pip_w, pip_h = compositor.pip_size(width, height)
+            return open_handler(pip_url(), pip_w, pip_h, fps=quality.pip_fps(config.DISPLAY_FPS),
+                                role='pip', latency_mode=self.latency_mode(),
+                                pix_fmt=DISPLAY_FORMATS)
 
+        def open_streams(width, height):
+            """返回 (主画面会话, 画中画会话)"""
+            return open_main(width, height), open_pip(width, height)
+
+        def close_session(session):
+            if session:
+                session.stop_stream()
+
+        def needs_new_decode_size(session, width, height):
+            """窗口尺寸稳定后，解码尺寸与显示尺寸相差过大才值得重连"""
+            if time.time() - self.last_resize_time < config.RESIZE_DEBOUNCE:
+                return False
+            width, _ = quality.main_size(width, height)  # 降级时主画面本来就按缩小尺寸解码
+            ratio = max(session.width / max(width, 1), width / max(session.width, 1))
+            return ratio >= config.RESIZE_RESTART_RATIO
+
+        main_session = None
+        pip_session = None
         try:
             w, h = self.panel_width, self.panel_height
-            pip_w, pip_h = w // 3, h // 3
-            proc1 = None
-            proc2 = None
-            
+
             try:
-                proc1 = ffmpeg_stream(self.stream1_var.get(), w, h)
-                proc2 = ffmpeg_stream(self.stream2_var.get(), pip_w, pip_h)
+                main_session, pip_session = open_streams(w, h)
             except Exception as e:
-                self.panel1.after(0, lambda: [self.stream_status.set("连接失败"), 
-                                             self.status_label.config(fg="#ff6666")])
+                self.panel1.after(0, self.set_stream_status, "连接失败", "#ff6666")
                 print(f"启动流失败: {e}")
                 return
-            
-            frame_size1 = w * h * 3
-            frame_size2 = pip_w * pip_h * 3
+            self.stream_sessions = (main_session, pip_session)
 
             error_count = 0  # 新增异常计数
             max_error_count = 10  # 连续异常阈值
+            frame_interval = 1.0 / config.DISPLAY_FPS
+            raw_frame1 = None  # 各路最近一帧，某路无新帧时沿用旧帧
+            raw_frame2 = None
+            next_quality_check = time.time() + config.ADAPTIVE_INTERVAL
 
             while not self.stop_flag:
-                if self.need_restart_stream:
-                    proc1.terminate()
-                    proc2.terminate()
-                    w, h = self.panel_width, self.panel_height
-                    pip_w, pip_h = int(w // 2.3), int(h // 2.3)
-                    proc1 = ffmpeg_stream(self.stream1_var.get(), w, h)
-                    proc2 = ffmpeg_stream(self.stream2_var.get(), pip_w, pip_h)
-                    frame_size1 = w * h * 3
-                    frame_size2 = pip_w * pip_h * 3
+                start_time = time.time()
+                # 显示尺寸随窗口变化，解码尺寸在会话内保持不变
+                w, h = self.panel_width, self.panel_height
+
+                if self.need_restart_stream or needs_new_decode_size(main_session, w, h):
+                    close_session(main_session)
+                    close_session(pip_session)
+                    if self.latency_mode() != quality_mode:
+                        # 切换了延迟模式：可用的降级项随之变化，从原画质重新评估
+                        quality_mode = self.latency_mode()
+                        quality = make_quality(quality_mode)
+                    main_session, pip_session = open_streams(w, h)
+                    self.stream_sessions = (main_session, pip_session)
+                    raw_frame1 = raw_frame2 = None
                     self.need_restart_stream = False
                     error_count = 0
 
-                start_time = time.time()
-                try:
-                    raw_frame1 = proc1.stdout.read(frame_size1)
-                    raw_frame2 = proc2.stdout.read(frame_size2)
-                    # 如果读取超时或数据不完整，直接丢弃
-                    if len(raw_frame1) != frame_size1 or len(raw_frame2) != frame_size2:
+                # 单路卡死只重启该路，不影响另一路
+                if main_session.stalled(config.STREAM_STALL_TIMEOUT):
+                    main_session.restart()
+                    raw_frame1 = None
+                if pip_session and pip_session.stalled(config.STREAM_STALL_TIMEOUT):
+                    pip_session.restart()
+                    raw_frame2 = None
+
+                # 负载过高时逐级降低画质，只重建受影响的那一路，主画面不中断
+                if start_time >= next_quality_check:
+                    next_quality_check = start_time + config.ADAPTIVE_INTERVAL
+                    change = quality.update(monitor.sample((main_session, pip_session),
+                                                           self.renderer))
+                    pip_change = change and quality.changed_stage(change) != 'main_scale'
+                    if pip_change and pip_session:
+                        close_session(pip_session)
+                        pip_session = open_pip(w, h)
+                        raw_frame2 = None
+                    elif pip_change and composite_in_process:
+                        # 只重启画中画解码进程，主画面解码和合成进程不中断
+                        main_session.restart_pip(pip_url(), quality.pip_fps(config.DISPLAY_FPS))
+                    elif change:
+                        close_session(main_session)
+                        main_session = open_main(w, h)
+                        raw_frame1 = None
+                    self.stream_sessions = (main_session, pip_session)
+
+                new_frame1 = main_session.take()
+                new_frame2 = pip_session.take() if pip_session else None
+                # 换入新帧时把旧缓冲还给各自的缓冲池
+                if new_frame1 is not None:
+                    main_session.release(raw_frame1)
+                    raw_frame1 = new_frame1
+                    if self.motion:
+                        # 按检测帧率抽样，不等待分析
+                        self.motion.submit(new_frame1, main_session.pix_fmt)
+                if new_frame2 is not None:
+                    pip_session.release(raw_frame2)
+                    raw_frame2 = new_frame2
+
+                if raw_frame1 is not None and (new_frame1 is not None or new_frame2 is not None):
+                    try:
+                        if self.render_pool.shape != (h, w, 3):
+                            self.render_pool = FramePool((h, w, 3))
+                        out_frame = self.render_pool.acquire()
+                        with metrics.timer('display', 'composite'):
+                            # YUV 管道帧在这里按显示尺寸一并转成 RGB
+                            compositor.compose(raw_frame1, raw_frame2, out_frame,
+                                               main_session.pix_fmt,
+                                               pip_session.pix_fmt if pip_session else 'rgb24')
+                        if self.motion and self.motion.regions and config.MOTION_OVERLAY:
+                            draw_regions(out_frame, self.motion.regions)
+                        # 输出缓冲直接交给渲染器，未被渲染的旧帧回收复用
+                        self.render_pool.release(self.render_slot.publish(out_frame))
+                        error_count = 0
+                    except Exception as e:
+                        print("解码异常:", e)
                         error_count += 1
                         if error_count > max_error_count:
+                            metrics.incr('display', 'error_escalations')
                             self.need_restart_stream = True
-                        continue
-                    frame1 = np.frombuffer(raw_frame1, np.uint8).reshape((h, w, 3)).copy()
-                    frame2 = np.frombuffer(raw_frame2, np.uint8).reshape((pip_h, pip_w, 3))
-                    x_offset = w - pip_w - 10
-                    y_offset = h - pip_h - 10
-                    frame1[y_offset:y_offset+pip_h, x_offset:x_offset+pip_w] = frame2
-                    img = Image.fromarray(frame1)
-                    imgtk = ImageTk.PhotoImage(image=img)
-                    self.panel1.after(0, self._update_panel, imgtk)
-                    error_count = 0
-                except Exception as e:
-                    print("解码异常:", e)
-                    error_count += 1
-                    if error_count > max_error_count:
-                        self.need_restart_stream = True
-                    continue
+
+                # 按显示帧率合成两路最新帧；低延迟模式下主画面一到就合成
                 elapsed = time.time() - start_time
-                # 不要sleep，直接下一帧
+                metrics.observe('display', 'loop', elapsed)
+                monitor.observe_loop(elapsed)
+                if elapsed < frame_interval:
+                    if main_session.low_latency:
+                        main_session.wait(frame_interval - elapsed)
+                    else:
+                        time.sleep(frame_interval - elapsed)
             
         except Exception as e:
             print(f"流处理异常: {e}")
-            self.panel1.after(0, lambda: [self.stream_status.set("播放错误"),
-                                         self.status_label.config(fg="#ff6666")])
+            self.panel1.after(0, self.set_stream_status, "播放错误", "#ff6666")
         finally:
             # 清理资源
-            if proc1:
-                try:
-                    proc1.terminate()
-                    proc1.wait(timeout=2)
-                except:
-                    proc1.kill()
-            if proc2:
-                try:
-                    proc2.terminate()
-                    proc2.wait(timeout=2)
-                except:
-                    proc2.kill()
+            close_session(main_session)
+            close_session(pip_session)
+            self.stream_sessions = ()
             if not self.stop_flag:
-                self.panel1.after(0, lambda: [self.stream_status.set("已停止"),
-                                            self.status_label.config(fg="#a0a0a0")])
+                self.panel1.after(0, self.set_stream_status, "已停止", "#a0a0a0")
 
-    def _update_panel(self, imgtk):
-        self.panel1.imgtk = imgtk
-        self.panel1.config(image=imgtk)
-        self.stream_status.set("播放中")
-        self.status_label.config(fg="#00d4aa")
+    def set_stream_status(self, text, color):
+        """更新播放状态，内容未变化时不触碰 Tk 控件"""
+        if self._status_shown == (text, color):
+            return
+        self._status_shown = (text, color)
+        self.stream_status.set(text)
+        self.status_label.config(fg=color)
 
     def create_ptz_controls(self):
         """创建PTZ控制面板 - PotPlayer 风格"""
@@ -442,6 +589,16 @@ class PlayerWindow(ttk.Frame):
                                 command=self.connect_onvif, style='Connect.TButton')
         connect_btn.pack(fill=tk.X)
         
+        # 已连接的摄像机，选择后立即切换 PTZ 控制对象
+        camera_frame = ttk.Frame(config_frame)
+        camera_frame.pack(fill=tk.X, padx=8, pady=(0, 5))
+        ttk.Label(camera_frame, text="摄像机:", font=('Segoe UI', 8)).pack(side=tk.LEFT)
+        self.camera_var = tk.StringVar()
+        self.camera_combo = ttk.Combobox(camera_frame, textvariable=self.camera_var,
+                                         state='readonly', width=18)
+        self.camera_combo.pack(side=tk.LEFT, padx=(5, 0), fill=tk.X, expand=True)
+        self.camera_combo.bind('<<ComboboxSelected>>', self.switch_camera)
+
         # 连接状态
         status_frame = ttk.Frame(config_frame)
         status_frame.pack(fill=tk.X, padx=8, pady=(0, 8))
@@ -464,6 +621,11 @@ class PlayerWindow(ttk.Frame):
         ttk.Label(step_frame, text="(1-10000)", font=('Segoe UI', 7), 
                  foreground="#888888").pack(side=tk.LEFT, padx=(3, 0))
 
+        # 按住连续移动：按下开始 ContinuousMove，松开发一次 Stop；不勾选时按步长点动
+        self.ptz_hold_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(control_frame, text="按住连续移动",
+                        variable=self.ptz_hold_var).pack(anchor=tk.W, padx=8)
+
         # 方向控制 - PotPlayer 风格（紧凑按钮）
         direction_frame = ttk.Frame(control_frame)
         direction_frame.pack(padx=8, pady=6)
@@ -497,6 +659,10 @@ class PlayerWindow(ttk.Frame):
                              style='Control.TButton', width=3)
         btn_down.grid(row=3, column=1, padx=2, pady=2)
 
+        for button, pan, tilt in ((btn_up, 0, -1), (btn_left, -1, 0),
+                                  (btn_right, 1, 0), (btn_down, 0, 1)):
+            self._bind_hold(button, pan, tilt, 0)
+
         # 变焦控制 - PotPlayer 风格
         zoom_frame = ttk.Frame(control_frame)
         zoom_frame.pack(fill=tk.X, padx=8, pady=(0, 8))
@@ -504,15 +670,108 @@ class PlayerWindow(ttk.Frame):
         
         zoom_btn_frame = ttk.Frame(zoom_frame)
         zoom_btn_frame.pack(fill=tk.X)
-        ttk.Button(zoom_btn_frame, text="+ 放大", 
-                  command=lambda: self.zoom_camera(0.1),
-                  style='Small.TButton').pack(side=tk.LEFT, padx=(0, 3), fill=tk.X, expand=True)
-        ttk.Button(zoom_btn_frame, text="- 缩小", 
-                  command=lambda: self.zoom_camera(-0.1),
-                  style='Small.TButton').pack(side=tk.LEFT, fill=tk.X, expand=True)
+        btn_zoom_in = ttk.Button(zoom_btn_frame, text="+ 放大", 
+                                 command=lambda: self.zoom_camera(0.1),
+                                 style='Small.TButton')
+        btn_zoom_in.pack(side=tk.LEFT, padx=(0, 3), fill=tk.X, expand=True)
+        btn_zoom_out = ttk.Button(zoom_btn_frame, text="- 缩小", 
+                                  command=lambda: self.zoom_camera(-0.1),
+                                  style='Small.TButton')
+        btn_zoom_out.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self._bind_hold(btn_zoom_in, 0, 0, 1)
+        self._bind_hold(btn_zoom_out, 0, 0, -1)
+
+        # 流水线统计：画面叠加和导出
+        stats_frame = ttk.LabelFrame(right_panel, text="统计")
+        stats_frame.pack(fill=tk.X, pady=(0, 5), padx=5)
+        stats_btn_frame = ttk.Frame(stats_frame)
+        stats_btn_frame.pack(fill=tk.X, padx=8, pady=6)
+        self.overlay_var = tk.BooleanVar(value=config.METRICS_OVERLAY)
+        ttk.Checkbutton(stats_btn_frame, text="画面叠加", variable=self.overlay_var,
+                        command=self.toggle_stats_overlay).pack(side=tk.LEFT)
+        ttk.Button(stats_btn_frame, text="导出", command=self.export_metrics,
+                   style='Small.TButton').pack(side=tk.LEFT, padx=(5, 0), fill=tk.X, expand=True)
+
+        # SOAP 日志：只记录原始报文，打开查看或导出时才格式化
+        log_frame = ttk.LabelFrame(right_panel, text="SOAP 日志")
+        log_frame.pack(fill=tk.X, pady=(0, 5), padx=5)
+        log_btn_frame = ttk.Frame(log_frame)
+        log_btn_frame.pack(fill=tk.X, padx=8, pady=6)
+        self.soap_log_var = tk.BooleanVar(value=config.SOAP_LOG_ENABLED)
+        ttk.Checkbutton(log_btn_frame, text="记录", variable=self.soap_log_var,
+                        command=self.toggle_soap_log).pack(side=tk.LEFT)
+        ttk.Button(log_btn_frame, text="查看", command=self.open_soap_log,
+                   style='Small.TButton').pack(side=tk.LEFT, padx=(5, 0), fill=tk.X, expand=True)
 
-    def log_onvif(self, send_content, recv_content):
-        pass
+    def toggle_stats_overlay(self):
+        if self.overlay_var.get():
+            self.stats_overlay.place(x=6, y=6)
+            self.stats_overlay.lift()
+            self._update_stats_overlay()
+        else:
+            if self.stats_after_id is not None:
+                self.after_cancel(self.stats_after_id)
+                self.stats_after_id = None
+            self.stats_overlay.place_forget()
+
+    def _update_stats_overlay(self):
+        self.stats_overlay.config(text=metrics.format_overlay())
+        self.stats_after_id = self.after(1000, self._update_stats_overlay)
+
+    def export_metrics(self):
+        """导出当前统计：.json 为 JSON，其他扩展名为 Prometheus 文本"""
+        path = filedialog.asksaveasfilename(defaultextension='.json',
+                                            filetypes=[("JSON", "*.json"),
+                                                       ("Prometheus 文本", "*.prom")])
+        if path:
+            metrics.export(path)
+
+    def toggle_soap_log(self):
+        if self.onvif_controller:
+            self.onvif_controller.soap_log.enabled = self.soap_log_var.get()
+
+    def open_soap_log(self):
+        """打开 SOAP 日志窗口；窗口已打开时只刷新内容"""
+        if self.soap_window is not None and self.soap_window.winfo_exists():
+            self.soap_window.lift()
+            self.refresh_soap_log()
+            return
+        self.soap_window = tk.Toplevel(self)
+        self.soap_window.title("SOAP 日志")
+        self.soap_window.geometry("720x520")
+        toolbar = ttk.Frame(self.soap_window)
+        toolbar.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Button(toolbar, text="刷新", command=self.refresh_soap_log).pack(side=tk.LEFT)
+        ttk.Button(toolbar, text="清空", command=self.clear_soap_log).pack(side=tk.LEFT, padx=5)
+        ttk.Button(toolbar, text="导出", command=self.export_soap_log).pack(side=tk.LEFT)
+        self.soap_text = ScrolledText(self.soap_window, wrap=tk.NONE, font=('Consolas', 9))
+        self.soap_text.pack(fill=tk.BOTH, expand=True)
+        self.refresh_soap_log()
+
+    def refresh_soap_log(self):
+        if self.soap_window is None or not self.soap_window.winfo_exists():
+            return
+        self.soap_text.delete('1.0', tk.END)
+        if self.onvif_controller is None:
+            self.soap_text.insert(tk.END, "尚未连接摄像机")
+            return
+        entries = self.onvif_controller.soap_log.entries()
+        self.soap_text.insert(tk.END, soap_log.format_entries(entries) or "暂无记录")
+        self.soap_text.see(tk.END)
+
+    def clear_soap_log(self):
+        if self.onvif_controller:
+            self.onvif_controller.soap_log.clear()
+        self.refresh_soap_log()
+
+    def export_soap_log(self):
+        if self.onvif_controller is None:
+            return
+        path = filedialog.asksaveasfilename(parent=self.soap_window, defaultextension='.txt',
+                                            filetypes=[("文本文件", "*.txt")])
+        if path:
+            count = soap_log.export(self.onvif_controller.soap_log, path)
+            messagebox.showinfo("导出", f"已导出 {count} 条记录", parent=self.soap_window)
 
     def get_step(self):
         """获取步长，范围限制在1~10000，并归一化到0~1"""
@@ -524,7 +783,9 @@ class PlayerWindow(ttk.Frame):
             return 0.01
 
     def connect_onvif(self):
-        """连接ONVIF摄像机"""
+        """连接ONVIF摄像机（在后台线程中进行，界面不会卡住）"""
+        if self.connecting:
+            return
         try:
             ip = self.ip_entry.get()
             port = int(self.port_entry.get())
@@ -534,34 +795,126 @@ class PlayerWindow(ttk.Frame):
             # 空值校验
             if not all([ip, port, username, password]):
                 raise ValueError("请填写所有必填项")
-            
-            self.connection_status.set("连接中...")
-            self.status_indicator.config(fg="#ffaa00")
-            self.parent.update()
-                
-            self.onvif_controller = ONVIFController(ip, port, username, password)
-            self.connection_status.set("已连接")
-            self.status_indicator.config(fg="#00d4aa")
-            messagebox.showinfo("成功", "摄像机连接成功！")
         except Exception as e:
+            messagebox.showerror("错误", f"连接失败: {str(e)}")
+            return
+
+        key = session_key(ip, port, username)
+        future = self.onvif_pool.submit(ip, port, username, password,
+                                        progress=lambda text: self.after(
+                                            0, self.connection_status.set, text))
+        if future.done() and future.exception() is None:
+            # 会话池里已有该设备，直接切换
+            self._use_controller(key, future.result())
+            return
+        self.connecting = True
+        self.connection_status.set("连接中...")
+        self.status_indicator.config(fg="#ffaa00")
+        # 回调在连接线程中执行，切回 Tk 线程处理结果
+        future.add_done_callback(lambda f: self.after(0, self._on_connect_done, key, f))
+
+    def _on_connect_done(self, key, future):
+        self.connecting = False
+        error = future.exception()
+        if error is not None:
             self.connection_status.set("连接失败")
             self.status_indicator.config(fg="#ff6666")
-            messagebox.showerror("错误", f"连接失败: {str(e)}")    
+            messagebox.showerror("错误", f"连接失败: {str(error)}")
+            return
+        self._use_controller(key, future.result())
+        messagebox.showinfo("成功", "摄像机连接成功！")
+
+    def _use_controller(self, key, controller):
+        """把 PTZ 面板切换到指定摄像机"""
+        self.onvif_key = key
+        self.onvif_controller = controller
+        controller.soap_log.enabled = self.soap_log_var.get()
+        if self.ptz_queue:
+            self.ptz_queue.close()
+        self.ptz_queue = PTZCommandQueue(controller, on_done=self._on_ptz_done)
+        self._ptz_failed = False
+        self.onvif_pool.touch(key)
+        self.connection_status.set("已连接")
+        self.status_indicator.config(fg="#00d4aa")
+        self._refresh_camera_list()
+
+    def _refresh_camera_list(self):
+        keys = sorted(self.onvif_pool.connected())
+        self.camera_combo['values'] = [f"{ip}:{port}" for ip, port, _ in keys]
+        self._camera_keys = keys
+        if self.onvif_key in keys:
+            self.camera_combo.current(keys.index(self.onvif_key))
+
+    def switch_camera(self, event=None):
+        """从下拉框切换摄像机：会话已在池中，只需换 PTZ 命令队列"""
+        index = self.camera_combo.current()
+        if index < 0 or index >= len(self._camera_keys):
+            return
+        key = self._camera_keys[index]
+        controller = self.onvif_pool.connected().get(key)
+        if controller is None:
+            # 会话已因空闲被释放，需要重新点击连接
+            self.connection_status.set("会话已释放")
+            self._refresh_camera_list()
+            return
+        self._use_controller(key, controller)
 
     def move_camera(self, pan, tilt):
-        """移动摄像机"""
-        if self.onvif_controller:
-            send, recv = self.onvif_controller.relative_move_with_log(pan, tilt, 0)
-            self.log_onvif(send, recv)
+        """移动摄像机（交给后台队列，连续点击会合并成一次移动）"""
+        if self.ptz_queue and not self.ptz_hold_var.get():
+            self.onvif_pool.touch(self.onvif_key)
+            self.ptz_queue.relative_move(pan, tilt, 0)
     
     def zoom_camera(self, zoom):
         """变焦控制"""
-        if self.onvif_controller:
-            send, recv = self.onvif_controller.relative_move_with_log(0, 0, zoom)
-            self.log_onvif(send, recv)
+        if self.ptz_queue and not self.ptz_hold_var.get():
+            self.onvif_pool.touch(self.onvif_key)
+            self.ptz_queue.relative_move(0, 0, zoom)
+
+    def _bind_hold(self, button, pan, tilt, zoom):
+        """按住连续模式下，按钮按下时按方向持续移动，松开时停止"""
+        button.bind('<ButtonPress-1>', lambda e: self.hold_camera(pan, tilt, zoom), add='+')
+        button.bind('<ButtonRelease-1>', lambda e: self.release_camera(), add='+')
+
+    def hold_camera(self, pan, tilt, zoom):
+        if self.ptz_queue and self.ptz_hold_var.get():
+            self.onvif_pool.touch(self.onvif_key)
+            speed = config.PTZ_CONTINUOUS_SPEED
+            self.ptz_queue.press(pan * speed, tilt * speed, zoom * speed)
+
+    def release_camera(self):
+        # 不论当前模式都松开：勾选框可能在按住期间被切换
+        if self.ptz_queue:
+            self.ptz_queue.release()
+
+    def _on_ptz_done(self, command, result, error):
+        """PTZ 命令完成（在队列线程中调用），切回 Tk 线程处理"""
+        self.after(0, self._handle_ptz_result, command, result, error)
+
+    def _handle_ptz_result(self, command, result, error):
+        if error is not None:
+            # 按住连续发送时每条都可能失败，只在状态变化时打印一次，详情见 SOAP 日志
+            if not self._ptz_failed:
+                print(f"PTZ 命令失败 ({command['kind']}): {error}")
+            self._ptz_failed = True
+            self.connection_status.set("PTZ 命令失败")
+            self.status_indicator.config(fg="#ff6666")
+        elif self._ptz_failed:
+            self._ptz_failed = False
+            self.connection_status.set("已连接")
+            self.status_indicator.config(fg="#00d4aa")
+        # 日志窗口打开时顺带刷新，关闭时不做任何格式化
+        self.refresh_soap_log()
 
 if __name__ == "__main__":
     def main():
+        parser = headless.build_parser(argparse.ArgumentParser(description="RTSP 视频播放器"))
+        parser.add_argument('--headless', action='store_true', help="不启动界面，以服务模式运行")
+        args = parser.parse_args()
+        if args.headless:
+            headless.run(args, default_url="rtsp://172.20.4.99/live/VideoChannel1")
+            return
+
         root = tk.Tk()
         root.title("RTSP 视频播放器 - 专业版")
         root.geometry("1200x700")  # 增大默认窗口大小
@@ -575,6 +928,9 @@ if __name__ == "__main__":
         except:
             pass
         
+        if config.METRICS_HTTP_PORT:
+            serve_metrics(config.METRICS_HTTP_PORT)
+
         player_window = PlayerWindow(root)
         player_window.pack(fill=tk.BOTH, expand=True)
         
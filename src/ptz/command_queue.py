@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import deque
+
+from utils import config
+
+
+def _clamp(value, low=-1.0, high=1.0):
+    return max(low, min(high, value))
+
+
+class PTZCommandQueue:
+    """后台 PTZ 命令队列：在独立线程里发送 SOAP 请求，不阻塞 Tk 主线程
+
+    尚未发出的命令会被合并：连续的相对移动/变焦累加成一次平移，
+    新的绝对移动会取代之前所有未发出的命令。
+
+    持续移动由按下/拖动/松开驱动：press() 只记下目标速度，工作线程每 interval 秒
+    最多发一次 ContinuousMove（期间的更新只保留最新一个），速度不变时不重发；
+    release() 后立即发一次 Stop。限速靠条件变量带超时的等待，没有线程在 sleep。
+    每条 ContinuousMove 都带摄像机端 Timeout，按住不动时在超时前重发一次续期，
+    程序异常退出或 Stop 丢失时摄像机也会自己停下。
+    """
+
+    def __init__(self, controller, on_done=None, interval=None, move_timeout=None):
+        self.controller = controller
+        # on_done(command, result, error) 在工作线程中调用，GUI 需自行切回 Tk 线程
+        self.on_done = on_done
+        self.interval = config.PTZ_CONTINUOUS_INTERVAL if interval is None else interval
+        self.move_timeout = config.PTZ_CONTINUOUS_TIMEOUT if move_timeout is None \
+            else move_timeout
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._closed = False
+        self._velocity = None   # 操作者当前要求的速度 (pan, tilt, zoom)，None 表示松开
+        self._moving = None     # 最近一次发给摄像机的速度，None 表示已停止
+        self._moved_at = 0.0    # 最近一次发出 ContinuousMove 的时刻（monotonic）
+        self.sent = 0     # 实际发出的命令数
+        self.merged = 0   # 被合并或取代、因而没有单独发出的命令数
+        self._thread = threading.Thread(target=self._run, name='ptz-commands', daemon=True)
+        self._thread.start()
+
+    def relative_move(self, pan, tilt, zoom):
+        with self._cond:
+            last = self._pending[-1] if self._pending else None
+            if last is not None and last['kind'] == 'relative':
+                last['pan'] = _clamp(last['pan'] + pan)
+                last['tilt'] = _clamp(last['tilt'] + tilt)
+                last['zoom'] = _clamp(last['zoom'] + zoom)
+                self.merged += 1
+            else:
+                self._pending.append({'kind': 'relative', 'pan': pan, 'tilt': tilt, 'zoom': zoom})
+            self._cond.notify()
+
+    def absolute_move(self, pan, tilt, zoom):
+        with self._cond:
+            # 绝对位置会覆盖之前所有未发出命令的效果
+            self.merged += len(self._pending)
+            self._pending.clear()
+            self._pending.append({'kind': 'absolute', 'pan': pan, 'tilt': tilt, 'zoom': zoom})
+            self._cond.notify()
+
+    def press(self, pan, tilt, zoom=0.0):
+        """按下或拖动：设定持续移动的速度（-1..1），可以高频调用"""
+        velocity = (_clamp(pan), _clamp(tilt), _clamp(zoom))
+        if not any(velocity):
+            self.release()  # 摇杆回中等同松开
+            return
+        with self._cond:
+            target = self._velocity
+            if target is not None and max(
+                    abs(a - b) for a, b in zip(velocity, target)) < config.PTZ_VELOCITY_DEADBAND:
+                return  # 手抖级别的变化不值得一条命令
+            if target is not None and target != self._moving:
+                self.merged += 1  # 上一个目标速度还没来得及发出就被取代
+            self._velocity = velocity
+            self._cond.notify()
+
+    def release(self):
+        """松开：摄像机在动就发一次 Stop；还没发出的速度直接作废"""
+        with self._cond:
+            if self._velocity is not None and self._velocity != self._moving:
+                self.merged += 1
+            self._velocity = None
+            self._cond.notify()
+
+    @property
+    def moving(self):
+        with self._cond:
+            return self._moving is not None
+
+    @property
+    def pending(self):
+        with self._cond:
+            return len(self._pending)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            self._velocity = None
+            self._cond.notify()
+
+    def _next_command(self):
+        """在锁内取下一条要发的命令；暂时没有时返回 (None, 最多等待的秒数)"""
+        if self._closed:
+            # 关闭时摄像机还在动，最后补一次 Stop
+            if self._moving is not None:
+                self._moving = None
+                return {'kind': 'stop'}, None
+            return None, None
+        if self._pending:
+            return self._pending.popleft(), None
+        if self._velocity is None:
+            if self._moving is not None:
+                self._moving = None
+                return {'kind': 'stop'}, None
+            return None, None
+        now = time.monotonic()
+        if self._velocity != self._moving:
+            due = self._moved_at + self.interval
+        elif self.move_timeout:
+            # 速度没变，只在摄像机端超时前续期
+            due = self._moved_at + self.move_timeout / 2
+        else:
+            return None, None
+        if now < due:
+            return None, due - now
+        self._moving = self._velocity
+        self._moved_at = now
+        pan, tilt, zoom = self._velocity
+        return {'kind': 'continuous', 'pan': pan, 'tilt': tilt, 'zoom': zoom}, None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                command, wait = self._next_command()
+                while command is None:
+                    if self._closed:
+                        return
+                    self._cond.wait(wait)
+                    command, wait = self._next_command()
+                closing = self._closed
+            result, error = self._execute(command)
+            self.sent += 1
+            if self.on_done:
+                try:
+                    self.on_done(command, result, error)
+                except Exception as e:
+                    print("PTZ 回调异常:", e)
+            if closing:
+                return
+
+    def _execute(self, command):
+        try:
+            if command['kind'] == 'relative':
+                result = self.controller.relative_move(
+                    command['pan'], command['tilt'], command['zoom'])
+            elif command['kind'] == 'continuous':
+                result = self.controller.continuous_move(
+                    command['pan'], command['tilt'], command['zoom'],
+                    timeout=self.move_timeout)
+            elif command['kind'] == 'stop':
+                result = self.controller.stop()
+            else:
+                result = self.controller.absolute_move(
+                    command['pan'], command['tilt'], command['zoom'])
+            return result, None
+        except Exception as e:
+            print("PTZ 命令失败:", e)
+            return None, e
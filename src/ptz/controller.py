@@ -0,0 +1,166 @@
+import datetime
+import threading
+import time
+
+from ptz.soap_log import SoapLog
+from ptz.wsdl_cache import CachedONVIFCamera
+from utils import config
+from utils.metrics import registry as metrics
+
+
+class ONVIFController:
+    def __init__(self, ip, port, username, password):
+        # 最近的 SOAP 报文，查看日志时才序列化
+        self.soap_log = SoapLog(config.SOAP_LOG_SIZE, config.SOAP_LOG_ENABLED)
+        # 连接时只建设备服务；PTZ、媒体、成像服务在首次使用时才创建
+        self.cam = CachedONVIFCamera(ip, port, username, password)
+        self._service_lock = threading.Lock()
+        self._services = {}
+
+        # 配置集、PTZ 配置选项和请求模板在连接后缓存，避免每条命令都先发 GetProfiles
+        self._cache_lock = threading.RLock()
+        self._profile_token = None
+        self._profile_loaded_at = 0.0
+        self._ptz_options = None
+        self._request_templates = {}
+        self.profiles_rtt = 0.0  # 一次 GetProfiles 的往返耗时，即每条命令节省的时间
+
+    def _service(self, name):
+        """按需创建 ONVIF 服务（解析好的 WSDL 由 wsdl_cache 复用）"""
+        with self._service_lock:
+            service = self._services.get(name)
+            if service is None:
+                service = getattr(self.cam, f'create_{name}_service')()
+                # 兼容主流onvif-py，插件加到 zeep client 的 plugins
+                client = getattr(service, 'zeep_client', None) or getattr(service, '_client', None)
+                if client is not None:
+                    client.plugins.append(self.soap_log)
+                self._services[name] = service
+            return service
+
+    @property
+    def ptz(self):
+        return self._service('ptz')
+
+    @property
+    def media(self):
+        return self._service('media')
+
+    @property
+    def imaging(self):
+        return self._service('imaging')
+
+    def warm_up(self):
+        """预先创建 PTZ/媒体服务并缓存配置集，让第一条 PTZ 命令不用等"""
+        self.profile_token()
+
+    def get_profiles(self):
+        """获取摄像机配置集"""
+        return self.media.GetProfiles()
+
+    def _load_profile(self):
+        """获取并缓存配置集 token 和 PTZ 配置选项"""
+        with self._cache_lock:
+            start = time.perf_counter()
+            profile = self.get_profiles()[0]
+            self.profiles_rtt = time.perf_counter() - start
+            self._profile_token = profile.token
+            self._profile_loaded_at = time.time()
+            self._ptz_options = None
+            try:
+                self._ptz_options = self.ptz.GetConfigurationOptions(
+                    {'ConfigurationToken': profile.PTZConfiguration.token})
+            except Exception as e:
+                print("获取 PTZ 配置选项失败:", e)
+            print(f"已缓存 ONVIF 配置集，GetProfiles 耗时 {self.profiles_rtt * 1000:.1f} ms")
+
+    def invalidate_cache(self):
+        """配置集可能已变化（摄像机重启、配置被修改等），下一条命令时重新获取"""
+        with self._cache_lock:
+            self._profile_token = None
+            self._ptz_options = None
+            self._request_templates.clear()
+
+    def profile_token(self):
+        with self._cache_lock:
+            expired = time.time() - self._profile_loaded_at > config.ONVIF_PROFILE_TTL
+            if self._profile_token is None or expired:
+                self._load_profile()
+            return self._profile_token
+
+    @property
+    def ptz_options(self):
+        """缓存的 PTZ 配置选项（GetConfigurationOptions 的结果，获取失败时为 None）"""
+        self.profile_token()
+        return self._ptz_options
+
+    def _request(self, type_name):
+        """取预建的请求对象：create_type 只做一次，之后复用模板只改变化的字段"""
+        with self._cache_lock:
+            token = self.profile_token()
+            req = self._request_templates.get(type_name)
+            if req is None:
+                req = self.ptz.create_type(type_name)
+                self._request_templates[type_name] = req
+            req.ProfileToken = token
+            return req
+
+    def _send(self, name, req):
+        """发送 PTZ 命令，耗时按命令名记到计量的 ptz 流；失败时清空缓存，防止 token 失效后一直出错"""
+        start = time.perf_counter()
+        try:
+            getattr(self.ptz, name)(req)
+        except Exception as e:
+            self.invalidate_cache()
+            self.soap_log.fail(name, e)
+            metrics.incr('ptz', 'errors')
+            raise
+        metrics.observe('ptz', name, time.perf_counter() - start)
+
+    def absolute_move(self, pan, tilt, zoom, speed=0.5):
+        """绝对移动"""
+        req = self._request('AbsoluteMove')
+        req.Position = {
+            'PanTilt': {'x': pan, 'y': tilt},
+            'Zoom': {'x': zoom}
+        }
+        req.Speed = {
+            'PanTilt': {'x': speed, 'y': speed},
+            'Zoom': {'x': speed}
+        }
+        self._send('AbsoluteMove', req)
+    
+    def relative_move(self, pan, tilt, zoom, speed=0.5):
+        """相对移动"""
+        req = self._request('RelativeMove')
+        req.Translation = {
+            'PanTilt': {'x': pan, 'y': tilt},
+            'Zoom': {'x': zoom}
+        }
+        req.Speed = {
+            'PanTilt': {'x': speed, 'y': speed},
+            'Zoom': {'x': speed}
+        }
+        self._send('RelativeMove', req)
+    
+    def continuous_move(self, pan, tilt, zoom, timeout=1):
+        """持续移动：发出速度后立即返回，不阻塞调用线程
+
+        timeout 为摄像机端的 Timeout（秒），到时摄像机自行停止；
+        None 表示一直移动直到收到 Stop。
+        """
+        req = self._request('ContinuousMove')
+        req.Velocity = {
+            'PanTilt': {'x': pan, 'y': tilt},
+            'Zoom': {'x': zoom}
+        }
+        # 模板会被复用，不限时也要显式清掉上一次的 Timeout
+        req.Timeout = datetime.timedelta(seconds=timeout) if timeout else None
+        self._send('ContinuousMove', req)
+
+    def stop(self, pan_tilt=True, zoom=True):
+        """停止持续移动"""
+        req = self._request('Stop')
+        req.PanTilt = pan_tilt
+        req.Zoom = zoom
+        self._send('Stop', req)
@@ -0,0 +1,110 @@
+"""多摄像机 ONVIF 会话池：按设备地址复用已连接的控制器"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ptz.controller import ONVIFController
+from utils import config
+
+
+def session_key(ip, port, username):
+    return (ip, int(port), username)
+
+
+class ONVIFSessionPool:
+    """按 (ip, port, 用户名) 缓存 ONVIFController
+
+    连接在线程池中并发进行，同一设备的并发请求共用一次握手；
+    所有会话共用同一个 zeep Transport（keep-alive 连接池 + 已解析 WSDL），
+    超过 idle_timeout 没有使用的会话会被释放。
+    """
+
+    def __init__(self, max_workers=None, idle_timeout=None):
+        self.idle_timeout = config.ONVIF_SESSION_IDLE_TIMEOUT if idle_timeout is None \
+            else idle_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or config.ONVIF_POOL_WORKERS,
+                                            thread_name_prefix='onvif-connect')
+        self._lock = threading.Lock()
+        self._futures = {}    # key -> Future[ONVIFController]
+        self._last_used = {}  # key -> 最近一次使用时间
+        self.evicted = 0
+
+    def _connect(self, ip, port, username, password, progress=None):
+        start = time.perf_counter()
+        if progress:
+            progress("连接设备...")
+        controller = ONVIFController(ip, port, username, password)
+        if progress:
+            progress("加载配置集...")
+        controller.warm_up()
+        print(f"ONVIF {ip}:{port} 连接耗时 {(time.perf_counter() - start) * 1000:.0f} ms")
+        return controller
+
+    def _forget_failed(self, key, future):
+        # 连接失败的会话不缓存，下次重新连接
+        if future.exception() is not None:
+            with self._lock:
+                if self._futures.get(key) is future:
+                    del self._futures[key]
+                    self._last_used.pop(key, None)
+
+    def submit(self, ip, port, username, password, progress=None):
+        """异步取会话，返回 Future；已连接或正在连接的设备直接复用
+
+        progress(text) 只在真正发起新连接时被调用（在连接线程中）。
+        """
+        self.evict_idle()
+        key = session_key(ip, port, username)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None:
+                future = self._executor.submit(self._connect, ip, port, username, password,
+                                             progress)
+                self._futures[key] = future
+                future.add_done_callback(lambda f: self._forget_failed(key, f))
+            self._last_used[key] = time.time()
+        return future
+
+    def get(self, ip, port, username, password, timeout=None):
+        """同步取会话（会阻塞到连接完成，不要在 Tk 线程中对新设备调用）"""
+        return self.submit(ip, port, username, password).result(timeout)
+
+    def connect_many(self, cameras):
+        """并发连接多台设备：cameras 为 (ip, port, username, password) 列表，返回 {key: Future}"""
+        return {session_key(ip, port, user): self.submit(ip, port, user, pwd)
+                for ip, port, user, pwd in cameras}
+
+    def touch(self, key):
+        """标记会话正在使用，推迟空闲释放"""
+        with self._lock:
+            if key in self._futures:
+                self._last_used[key] = time.time()
+
+    def connected(self):
+        """已连接成功的会话 {key: controller}"""
+        with self._lock:
+            items = list(self._futures.items())
+        return {key: f.result() for key, f in items if f.done() and f.exception() is None}
+
+    def evict_idle(self, keep=()):
+        """释放超过 idle_timeout 未使用的会话（keep 中的会话除外）"""
+        if not self.idle_timeout:
+            return 0
+        deadline = time.time() - self.idle_timeout
+        with self._lock:
+            stale = [key for key, used in self._last_used.items()
+                     if used < deadline and key not in keep and self._futures[key].done()]
+            for key in stale:
+                del self._futures[key]
+                del self._last_used[key]
+            self.evicted += len(stale)
+        return len(stale)
+
+    def close(self):
+        with self._lock:
+            self._futures.clear()
+            self._last_used.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __len__(self):
+        return len(self._futures)
@@ -0,0 +1,103 @@
+"""SOAP 通信日志：有界环形缓冲，只保存原始报文对象，查看或导出时才序列化"""
+import threading
+import time
+from collections import deque
+
+from lxml import etree
+from zeep import Plugin
+
+
+class SoapLog(Plugin):
+    """记录最近 maxlen 次请求/响应的 zeep 插件
+
+    PTZ 命令路径上只做引用保存和计时，不做任何 XML 序列化；
+    enabled 为 False 时插件直接放行，不记录任何内容。
+    """
+
+    def __init__(self, maxlen=200, enabled=True):
+        self.enabled = enabled
+        self._entries = deque(maxlen=maxlen)
+        self._inflight = {}  # 线程 id -> 尚未收到响应的记录
+        self._lock = threading.Lock()
+
+    def egress(self, envelope, http_headers, operation, binding_options):
+        if self.enabled:
+            entry = {
+                'time': time.time(),
+                'operation': getattr(operation, 'name', str(operation)),
+                'sent': envelope,
+                'received': None,
+                'rtt': None,
+                '_start': time.perf_counter(),
+            }
+            with self._lock:
+                self._entries.append(entry)
+                self._inflight[threading.get_ident()] = entry
+        return envelope, http_headers
+
+    def ingress(self, envelope, http_headers, operation):
+        with self._lock:
+            entry = self._inflight.pop(threading.get_ident(), None)
+        if entry is not None:
+            entry['rtt'] = time.perf_counter() - entry['_start']
+            entry['received'] = envelope
+        return envelope, http_headers
+
+    def fail(self, operation, error):
+        """记录失败的调用：连接失败、超时时 zeep 不会调用 ingress，报文日志里本来看不到"""
+        with self._lock:
+            entry = self._inflight.pop(threading.get_ident(), None)
+            if entry is None:
+                if not self.enabled:
+                    return
+                entry = {'time': time.time(), 'operation': operation, 'sent': None,
+                         'received': None, 'rtt': None}
+                self._entries.append(entry)
+            entry['error'] = str(error)
+
+    def entries(self):
+        """按时间顺序返回当前缓冲中的记录（报文仍是未序列化的 lxml 对象）"""
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._inflight.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _pretty(envelope, missing):
+    if envelope is None:
+        return missing
+    try:
+        return etree.tostring(envelope, pretty_print=True, encoding='unicode')
+    except Exception as e:
+        return f"无法序列化: {e}"
+
+
+def format_entry(entry):
+    """把一条记录格式化成可读文本（只在查看/导出时调用）"""
+    stamp = time.strftime('%H:%M:%S', time.localtime(entry['time']))
+    millis = int(entry['time'] * 1000) % 1000
+    rtt = f"{entry['rtt'] * 1000:.1f} ms" if entry['rtt'] is not None else "无响应"
+    text = (f"===== {stamp}.{millis:03d} {entry['operation']}  往返 {rtt} =====\n"
+            f"--- 发送 ---\n{_pretty(entry['sent'], '未捕获到发送内容')}"
+            f"--- 返回 ---\n{_pretty(entry['received'], '未捕获到返回内容')}\n")
+    if entry.get('error'):
+        text += f"--- 错误 ---\n{entry['error']}\n"
+    return text
+
+
+def format_entries(entries):
+    return '\n'.join(format_entry(entry) for entry in entries)
+
+
+def export(log, path):
+    """把当前缓冲中的全部记录导出为文本文件，返回导出条数"""
+    entries = log.entries()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(format_entries(entries))
+    return len(entries)
@@ -0,0 +1,112 @@
+"""ONVIF WSDL 缓存：解析好的 WSDL 在进程内共享，远程 schema 持久缓存到磁盘
+
+zeep 解析后的 Document 内含 lxml 对象，无法可靠地序列化到磁盘，
+因此磁盘上缓存的是 WSDL 引用的远程文档（zeep SqliteCache），
+解析结果则按 WSDL 文件在进程内复用，第二次及以后的连接不再解析。
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from onvif import ONVIFCamera
+from onvif.client import ONVIFService, UsernameDigestTokenDtDiff
+from onvif.definition import SERVICES
+from zeep.cache import SqliteCache
+from zeep.client import Client, Settings
+from zeep.transports import Transport
+from zeep.wsdl import Document
+
+from utils import config
+
+_lock = threading.Lock()
+_documents = {}    # WSDL 文件路径 -> 解析好的 zeep Document
+_transport = None
+
+
+def cache_path():
+    return os.path.join(os.path.expanduser('~'), '.cache', 'media_player', 'zeep.db')
+
+
+def _settings():
+    settings = Settings()
+    settings.strict = False
+    settings.xml_huge_tree = True
+    return settings
+
+
+def _http_session():
+    """所有摄像机共用的 HTTP 会话：keep-alive 连接池，每台设备保留若干长连接"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=config.ONVIF_HTTP_POOL_SIZE,
+                          pool_maxsize=config.ONVIF_HTTP_POOL_SIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def shared_transport():
+    """带持久化 SqliteCache 和连接池的 zeep Transport（进程内共用一个）"""
+    global _transport
+    with _lock:
+        if _transport is None:
+            os.makedirs(os.path.dirname(cache_path()), exist_ok=True)
+            _transport = Transport(cache=SqliteCache(path=cache_path(),
+                                                     timeout=config.ONVIF_WSDL_CACHE_TTL),
+                                   operation_timeout=config.ONVIF_OPERATION_TIMEOUT,
+                                   session=_http_session())
+        return _transport
+
+
+def load_document(wsdl_file):
+    """取解析好的 WSDL，同一文件在进程内只解析一次"""
+    with _lock:
+        document = _documents.get(wsdl_file)
+    if document is not None:
+        return document
+    document = Document(wsdl_file, shared_transport(), settings=_settings())
+    with _lock:
+        return _documents.setdefault(wsdl_file, document)
+
+
+class CachedONVIFCamera(ONVIFCamera):
+    """复用已解析 WSDL 的 ONVIFCamera；连接时只建设备服务，其余服务由调用方按需创建"""
+
+    def __init__(self, host, port, user, passwd, transport=None, **kwargs):
+        super().__init__(host, port, user, passwd,
+                         transport=transport or shared_transport(), **kwargs)
+
+    def update_xaddrs(self):
+        """同 ONVIFCamera.update_xaddrs，但不在连接时创建事件服务和 PullPoint 订阅"""
+        if self.adjust_time:
+            return super().update_xaddrs()
+        self.dt_diff = None
+        self.devicemgmt = self.create_devicemgmt_service()
+        self.xaddrs = {}
+        capabilities = self.devicemgmt.GetCapabilities({'Category': 'All'})
+        for name in capabilities:
+            capability = capabilities[name]
+            try:
+                if name.lower() in SERVICES and capability is not None:
+                    self.xaddrs[SERVICES[name.lower()]['ns']] = capability['XAddr']
+            except Exception as e:
+                print(f"解析 {name} 服务地址失败: {e}")
+
+    def create_onvif_service(self, name, from_template=True, portType=None):
+        name = name.lower()
+        xaddr, wsdl_file, binding_name = self.get_definition(name, portType)
+        wsse = UsernameDigestTokenDtDiff(self.user, self.passwd, dt_diff=self.dt_diff,
+                                         use_digest=self.encrypt)
+        client = Client(wsdl=load_document(wsdl_file), wsse=wsse,
+                        transport=self.transport, settings=_settings())
+        with self.services_lock:
+            service = ONVIFService(xaddr, self.user, self.passwd, wsdl_file, self.encrypt,
+                                   self.daemon, zeep_client=client, no_cache=self.no_cache,
+                                   portType=portType, dt_diff=self.dt_diff,
+                                   binding_name=binding_name, transport=self.transport)
+            self.services[name] = service
+            setattr(self, name, service)
+            if not self.services_template.get(name):
+                self.services_template[name] = service
+        return service
@@ -0,0 +1,200 @@
+"""自适应画质：根据渲染滞后、管道积压和 CPU 占用，分级降低或恢复解码负载，优先保证主画面流畅
+
+级别从 0（原画质）开始，每升一级在前一级的基础上再叠加一项降级：
+    pip_fps        画中画降帧到 ADAPTIVE_PIP_FPS
+    pip_substream  画中画改用子码流（地址栏写 '主码流地址 子码流地址'）
+    main_scale     主画面按 ADAPTIVE_MAIN_SCALE 缩小解码尺寸，合成时再放大
+过载持续 ADAPTIVE_DEGRADE_AFTER 秒降一级；各项指标都回落到恢复阈值以下并持续
+ADAPTIVE_RECOVER_AFTER 秒才升一级。每次调整后冷却 ADAPTIVE_COOLDOWN 秒，
+重连本身造成的抖动不会引发连续调整。
+"""
+import time
+from collections import deque
+
+from utils import config
+from utils.metrics import registry as metrics
+
+STAGES = ('pip_fps', 'pip_substream', 'main_scale')
+STAGE_NAMES = {'pip_fps': '画中画降帧', 'pip_substream': '画中画子码流', 'main_scale': '主画面缩小解码'}
+
+
+def cpu_times():
+    """/proc/stat 中全部 CPU 的 (忙碌, 总计) 时钟数；非 Linux 返回 None"""
+    try:
+        with open('/proc/stat') as f:
+            fields = [int(v) for v in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+    total = sum(fields)
+    return total - idle, total
+
+
+class LoadMonitor:
+    """汇总一个评估周期内的负载指标
+
+    render_lag_ms  渲染定时器平均比预期晚多少（Tk 主循环的繁忙程度）
+    overrun        显示循环耗时超过一帧间隔的比例
+    drops          各路会话每秒丢弃的帧数（取帧跟不上解码，帧在队列中被覆盖）
+    cpu            系统 CPU 占用百分比，无法获取时为 None
+    """
+
+    def __init__(self, frame_interval):
+        self.frame_interval = frame_interval
+        self._loops = 0
+        self._overruns = 0
+        self._dropped = {}
+        self._late = None
+        self._cpu = cpu_times()
+        self._since = time.perf_counter()
+
+    def observe_loop(self, elapsed):
+        self._loops += 1
+        if elapsed > self.frame_interval:
+            self._overruns += 1
+
+    def _drop_rate(self, sessions, period):
+        dropped = 0
+        for session in sessions:
+            if session is None:
+                continue
+            current = session.dropped
+            previous = self._dropped.get(session.name, 0)
+            # 会话重建后计数从 0 开始
+            dropped += current - previous if current >= previous else current
+            self._dropped[session.name] = current
+        return dropped / period
+
+    def _render_lag(self, renderer):
+        if renderer is None:
+            return 0.0
+        late = (renderer.ticks, renderer.late_time)
+        previous, self._late = self._late, late
+        if previous is None or late[0] <= previous[0]:
+            return 0.0
+        return (late[1] - previous[1]) / (late[0] - previous[0]) * 1000
+
+    def _cpu_percent(self):
+        current, previous = cpu_times(), self._cpu
+        self._cpu = current
+        if current is None or previous is None or current[1] <= previous[1]:
+            return None
+        return (current[0] - previous[0]) / (current[1] - previous[1]) * 100
+
+    def sample(self, sessions, renderer=None):
+        """返回本周期的指标并开始下一个周期"""
+        now = time.perf_counter()
+        period = max(now - self._since, 1e-3)
+        sample = {
+            'render_lag_ms': self._render_lag(renderer),
+            'overrun': self._overruns / self._loops if self._loops else 0.0,
+            'drops': self._drop_rate(sessions, period),
+            'cpu': self._cpu_percent(),
+        }
+        self._loops = self._overruns = 0
+        self._since = now
+        return sample
+
+
+def format_sample(sample):
+    cpu = sample['cpu']
+    return (f"渲染滞后 {sample['render_lag_ms']:.0f}ms，循环超时 {sample['overrun']:.0%}，"
+            f"丢帧 {sample['drops']:.1f}/s，CPU {'-' if cpu is None else f'{cpu:.0f}%'}")
+
+
+class QualityController:
+    """分级画质控制器：update() 喂入负载指标，级别变化时返回 (旧级别, 新级别)
+
+    stages 为启用的降级项（按顺序），当前环境用不上的项（如没有配置子码流）应去掉。
+    """
+
+    def __init__(self, stages=None, degrade_after=None, recover_after=None, cooldown=None,
+                 name='display'):
+        stages = config.ADAPTIVE_STAGES if stages is None else stages
+        self.stages = tuple(s for s in stages if s in STAGES)
+        self.degrade_after = config.ADAPTIVE_DEGRADE_AFTER if degrade_after is None \
+            else degrade_after
+        self.recover_after = config.ADAPTIVE_RECOVER_AFTER if recover_after is None \
+            else recover_after
+        self.cooldown = config.ADAPTIVE_COOLDOWN if cooldown is None else cooldown
+        self.name = name
+        self.level = 0
+        self.history = deque(maxlen=100)  # (时刻, 旧级别, 新级别, 原因)
+        self._over_since = None
+        self._calm_since = None
+        self._changed_at = time.time()  # 刚连接时的抖动也按冷却处理
+
+    @property
+    def active(self):
+        return self.stages[:self.level]
+
+    def overloaded(self, sample):
+        cpu = sample['cpu']
+        return (sample['render_lag_ms'] > config.ADAPTIVE_LAG_MS
+                or sample['overrun'] > config.ADAPTIVE_OVERRUN_RATIO
+                or sample['drops'] > config.ADAPTIVE_DROP_RATE
+                or (cpu is not None and cpu > config.ADAPTIVE_CPU_HIGH))
+
+    def calm(self, sample):
+        """各项都明显低于过载阈值（阈值的一半 / CPU 低水位），留出回差"""
+        cpu = sample['cpu']
+        return (sample['render_lag_ms'] < config.ADAPTIVE_LAG_MS / 2
+                and sample['overrun'] < config.ADAPTIVE_OVERRUN_RATIO / 2
+                and sample['drops'] < config.ADAPTIVE_DROP_RATE / 2
+                and (cpu is None or cpu < config.ADAPTIVE_CPU_LOW))
+
+    def update(self, sample, now=None):
+        now = time.time() if now is None else now
+        if self.overloaded(sample):
+            self._calm_since = None
+            self._over_since = self._over_since or now
+        elif self.calm(sample):
+            self._over_since = None
+            self._calm_since = self._calm_since or now
+        else:
+            # 介于两者之间：保持当前级别
+            self._over_since = self._calm_since = None
+        if now - self._changed_at < self.cooldown:
+            return None
+        if self._over_since is not None and now - self._over_since >= self.degrade_after \
+                and self.level < len(self.stages):
+            return self._change(self.level + 1, sample, now)
+        if self._calm_since is not None and now - self._calm_since >= self.recover_after \
+                and self.level > 0:
+            return self._change(self.level - 1, sample, now)
+        return None
+
+    def _change(self, level, sample, now):
+        old, self.level = self.level, level
+        stage = self.stages[max(old, level) - 1]
+        action = '降级' if level > old else '恢复'
+        reason = format_sample(sample)
+        print(f"画质{action}: 级别 {old} -> {level}（{STAGE_NAMES[stage]}），{reason}")
+        metrics.incr(self.name, 'quality_down' if level > old else 'quality_up')
+        self.history.append((now, old, level, reason))
+        self._changed_at = now
+        self._over_since = self._calm_since = None
+        return old, level
+
+    def changed_stage(self, change):
+        """update() 返回值对应的降级项"""
+        old, new = change
+        return self.stages[max(old, new) - 1]
+
+    # 当前级别下的解码参数
+    def pip_fps(self, fps):
+        if 'pip_fps' in self.active and fps:
+            return min(fps, config.ADAPTIVE_PIP_FPS)
+        return fps
+
+    def pip_url(self, main_url, sub_url=None):
+        if 'pip_substream' in self.active and sub_url:
+            return sub_url
+        return main_url
+
+    def main_size(self, width, height):
+        if 'main_scale' not in self.active:
+            return width, height
+        # 解码尺寸取偶数
+        scale = config.ADAPTIVE_MAIN_SCALE
+        return max(int(width * scale) & ~1, 2), max(int(height * scale) & ~1, 2)
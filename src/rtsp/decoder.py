@@ -0,0 +1,207 @@
+"""解码后端：探测本机 ffmpeg 能力，为每路流选择硬件或软件解码"""
+import functools
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+from utils import config
+
+FFmpegCaps = namedtuple('FFmpegCaps', ['version', 'hwaccels', 'decoders'])
+
+_failed_lock = threading.Lock()
+_failed_backends = set()  # 运行中启动失败的后端，本进程内不再选用
+
+
+def _run(args, timeout=10):
+    return subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          timeout=timeout, text=True, errors='replace')
+
+
+@functools.lru_cache(maxsize=None)
+def probe_ffmpeg(ffmpeg='ffmpeg'):
+    """探测 ffmpeg 编译时支持的 hwaccel 和解码器，每个进程只探测一次"""
+    try:
+        version = _run([ffmpeg, '-hide_banner', '-version']).stdout.split('\n', 1)[0]
+        hwaccels = _run([ffmpeg, '-hide_banner', '-hwaccels']).stdout.split()[3:]
+        decoders = set()
+        listing = _run([ffmpeg, '-hide_banner', '-decoders']).stdout
+        for line in listing.split('------', 1)[-1].splitlines():
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].startswith('V'):
+                decoders.add(parts[1])
+    except (OSError, subprocess.SubprocessError) as e:
+        print("探测 ffmpeg 失败:", e)
+        return FFmpegCaps('', frozenset(), frozenset())
+    return FFmpegCaps(version, frozenset(hwaccels), frozenset(decoders))
+
+
+@functools.lru_cache(maxsize=None)
+def hw_device_works(device_type, ffmpeg='ffmpeg'):
+    """ffmpeg 支持某种 hwaccel 不代表本机有对应设备，实际初始化一次设备来确认"""
+    try:
+        result = _run([ffmpeg, '-hide_banner', '-loglevel', 'error',
+                       '-init_hw_device', f'{device_type}=hw',
+                       '-f', 'lavfi', '-i', 'nullsrc=d=0.1', '-f', 'null', '-'])
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return result.returncode == 0
+
+
+class DecoderBackend:
+    """解码后端基类：给出放在 -i 之前的解码参数"""
+    name = ''
+    hwaccel = None   # 需要的 hwaccel 类型
+    decoders = {}    # codec -> 专用解码器名，空表示用 ffmpeg 默认解码器
+
+    def available(self, caps, codec):
+        if self.hwaccel and self.hwaccel not in caps.hwaccels:
+            return False
+        if self.decoders:
+            decoder = self.decoders.get(codec)
+            if decoder is None or decoder not in caps.decoders:
+                return False
+        if self.hwaccel and not hw_device_works(self.hwaccel):
+            return False
+        return True
+
+    def input_args(self, codec, role):
+        args = ['-hwaccel', self.hwaccel]
+        if codec in self.decoders:
+            args += ['-c:v', self.decoders[codec]]
+        return args
+
+
+class CudaBackend(DecoderBackend):
+    name = 'cuda'
+    hwaccel = 'cuda'
+    decoders = {'h264': 'h264_cuvid', 'hevc': 'hevc_cuvid'}
+
+    def input_args(self, codec, role):
+        return ['-hwaccel', 'cuda', '-hwaccel_device', '0', '-c:v', self.decoders[codec]]
+
+
+class QsvBackend(DecoderBackend):
+    name = 'qsv'
+    hwaccel = 'qsv'
+    decoders = {'h264': 'h264_qsv', 'hevc': 'hevc_qsv'}
+
+
+class D3D11Backend(DecoderBackend):
+    name = 'd3d11va'
+    hwaccel = 'd3d11va'
+
+
+class VaapiBackend(DecoderBackend):
+    name = 'vaapi'
+    hwaccel = 'vaapi'
+
+
+class SoftwareBackend(DecoderBackend):
+    """CPU 解码：多线程；画中画跳过环路滤波，画质略降但省不少 CPU"""
+    name = 'software'
+
+    def available(self, caps, codec):
+        return True
+
+    def input_args(self, codec, role):
+        threads = config.PIP_DECODER_THREADS if role == 'pip' else config.DECODER_THREADS
+        args = ['-threads', str(threads)]
+        if role == 'pip':
+            args += ['-skip_loop_filter', 'all']
+        if codec == 'h264':
+            args += ['-flags2', 'fast']
+        return args
+
+
+BACKENDS = {b.name: b for b in (CudaBackend(), QsvBackend(), D3D11Backend(),
+                                 VaapiBackend(), SoftwareBackend())}
+
+
+def _cache_path():
+    return os.path.join(os.path.expanduser('~'), '.cache', 'media_player', 'decoders.json')
+
+
+def load_benchmark(caps=None):
+    """读取上次测速得到的后端排序（ffmpeg 版本变化后作废）"""
+    caps = caps or probe_ffmpeg()
+    try:
+        with open(_cache_path(), encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return []
+    if data.get('version') != caps.version:
+        return []
+    return data.get('ranking', [])
+
+
+def save_benchmark(ranking, caps=None):
+    caps = caps or probe_ffmpeg()
+    path = _cache_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': caps.version, 'ranking': ranking}, f, ensure_ascii=False, indent=2)
+
+
+def mark_failed(backend):
+    """某个后端在实际流上启动失败，本进程内后续会话改用下一个后端"""
+    if backend.name == 'software':
+        return
+    with _failed_lock:
+        if backend.name not in _failed_backends:
+            print(f"解码后端 {backend.name} 启动失败，回退到其他后端")
+        _failed_backends.add(backend.name)
+
+
+def select_backend(codec=None, role='main'):
+    """按配置或测速结果为一路流选择可用的解码后端"""
+    codec = codec or config.STREAM_CODEC
+    caps = probe_ffmpeg()
+    preference = config.DECODER_PREFERENCE
+    if preference == 'auto':
+        preference = load_benchmark(caps) or config.DECODER_AUTO_ORDER
+    for name in preference:
+        backend = BACKENDS.get(name)
+        if backend is None or name in _failed_backends:
+            continue
+        if backend.available(caps, codec):
+            return backend
+    return BACKENDS['software']
+
+
+def make_test_clip(path, width=1920, height=1080, seconds=10, codec='h264'):
+    """用 testsrc 生成本地测试片段"""
+    encoder = {'h264': 'libx264', 'hevc': 'libx265'}[codec]
+    _run(['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+          '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate=25',
+          '-t', str(seconds), '-c:v', encoder, '-pix_fmt', 'yuv420p', path], timeout=300)
+    return path
+
+
+def benchmark_backends(clip=None, codec=None, role='main', save=True):
+    """用本地片段逐个测试可用后端的解码耗时，最快且成功的排在前面"""
+    codec = codec or config.STREAM_CODEC
+    caps = probe_ffmpeg()
+    if clip is None:
+        clip = make_test_clip(os.path.join(tempfile.gettempdir(), f'decoder_bench_{codec}.mp4'),
+                              codec=codec)
+    results = []
+    for backend in BACKENDS.values():
+        if not backend.available(caps, codec):
+            continue
+        cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error'] + backend.input_args(codec, role)
+        cmd += ['-i', clip, '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-y', os.devnull]
+        start = time.perf_counter()
+        try:
+            ok = _run(cmd, timeout=300).returncode == 0
+        except subprocess.SubprocessError:
+            ok = False
+        results.append({'backend': backend.name, 'ok': ok,
+                        'seconds': time.perf_counter() - start})
+    results.sort(key=lambda r: (not r['ok'], r['seconds']))
+    if save:
+        save_benchmark([r['backend'] for r in results if r['ok']], caps)
+    return results
@@ -0,0 +1,128 @@
+import subprocess
+
+# 输入协议白名单
+RTSP_INPUT_ARGS = ['-protocol_whitelist', 'rtsp,udp,rtp,file,http,https,tcp']
+
+
+# 低延迟模式：不缓冲、低延迟解码、只探测很少的数据就开始出帧
+LOW_LATENCY_INPUT_ARGS = ['-fflags', 'nobuffer', '-flags', 'low_delay',
+                          '-probesize', '32768', '-analyzeduration', '0']
+# 帧率直通：按源帧率逐帧输出，不做补帧/丢帧
+PASSTHROUGH_OUTPUT_ARGS = ['-vsync', 'passthrough']
+
+
+def transport_args(url, transport=None):
+    """RTSP 传输方式：'tcp' 可靠，'udp' 延迟更低但可能花屏；None 用 ffmpeg 默认"""
+    if transport and url.startswith('rtsp://'):
+        return ['-rtsp_transport', transport]
+    return []
+
+
+def latency_input_args(url, mode='normal', transport=None):
+    """按延迟模式给出附加的输入参数"""
+    args = transport_args(url, transport)
+    if mode == 'low' and not url.startswith('pipe:'):  # 管道输入见 elementary_input_args
+        args += LOW_LATENCY_INPUT_ARGS
+        if url.startswith(('rtsp://', 'udp://', 'rtp://')):
+            # 不为乱序包等待重排
+            args += ['-max_delay', '0', '-reorder_queue_size', '0']
+    return args
+
+
+def _input(url, decoder_args, input_args):
+    return list(decoder_args) + list(input_args) + ['-i', url]
+
+
+def frame_shape(pix_fmt, width, height):
+    """管道中一帧对应的数组形状（uint8）"""
+    if pix_fmt in ('rgb24', 'bgr24'):
+        return (height, width, 3)
+    if pix_fmt == 'gray':
+        return (height, width)
+    if pix_fmt in ('yuv420p', 'nv12'):
+        # Y 平面后接 1/4 大小的两个色度平面（或交织的 UV 平面）
+        return (height * 3 // 2, width)
+    raise ValueError(f"不支持的像素格式: {pix_fmt}")
+
+
+def _rawvideo_output(fps, pix_fmt='rgb24'):
+    cmd = [
+        '-f', 'rawvideo',  # 输出格式为原始视频流
+        '-pix_fmt', pix_fmt,  # 管道像素格式
+    ]
+    if fps:
+        cmd += ['-r', str(fps)]  # 帧率
+    else:
+        cmd += PASSTHROUGH_OUTPUT_ARGS
+    return cmd + ['-']
+
+
+def record_output_args(url):
+    """录像旁路输出：主输入的视频流不转码复用为 MPEG-TS 推到 url（本地录像旁路监听的端口）
+
+    只复制视频：摄像机常见的 G.711 音频不能直接封装进 TS，转码又会占用 CPU。
+    """
+    return ['-map', '0:v:0', '-c:v', 'copy', '-f', 'mpegts', url]
+
+
+def build_demux_cmd(url, codec='h264', input_args=RTSP_INPUT_ARGS, record_url=None):
+    """预连接：只解复用不解码，视频码流以 Annex B 基本流（codec 为 'h264' 或 'hevc'）输出到管道
+
+    标准错误保留输入流信息（不含横幅和进度），调用方据此识别实际的视频编码。
+    基本流没有时间戳，不能再复用成 TS；录像旁路（record_url）由这里带时间戳的输入直接复制。
+    """
+    cmd = ['ffmpeg', '-hide_banner', '-nostats'] + list(input_args) + [
+        '-i', url, '-map', '0:v:0', '-c:v', 'copy', '-f', codec, '-']
+    if record_url:
+        cmd += record_output_args(record_url)
+    return cmd
+
+
+def elementary_input_args(codec='h264'):
+    """从管道读 Annex B 基本流：少探测，收到关键帧就开始出帧
+
+    不能加 -fflags nobuffer/genpts：基本流没有时间戳，这两项会让 ffmpeg 一直等后续数据才出帧。
+    """
+    return ['-probesize', '32768', '-analyzeduration', '0', '-f', codec]
+
+
+def build_decode_cmd(url, width, height, fps=15,
+                     decoder_args=(), input_args=RTSP_INPUT_ARGS, pix_fmt='rgb24'):
+    """单路解码：输出指定分辨率的原始帧；decoder_args 由解码后端给出"""
+    cmd = ['ffmpeg'] + _input(url, decoder_args, input_args)
+    cmd += ['-s', f'{width}x{height}']  # 输出分辨率
+    return cmd + _rawvideo_output(fps, pix_fmt)
+
+
+def build_overlay_cmd(main_url, pip_url, width, height, pip_width, pip_height,
+                      margin=10, fps=15,
+                      decoder_args=(), input_args=RTSP_INPUT_ARGS, pip_decoder_args=None,
+                      pix_fmt='rgb24'):
+    """单进程画中画：ffmpeg 同时打开两路输入，在滤镜图里完成缩放和叠加
+
+    两路时间戳各自归零后再叠加；画中画断流时保持最后一帧，
+    但画中画迟迟不出首帧时主画面也会等待，这是单进程模式的代价。
+    """
+    x = width - pip_width - margin
+    y = height - pip_height - margin
+    graph = (
+        f'[0:v]setpts=PTS-STARTPTS,scale={width}:{height}[main];'
+        f'[1:v]setpts=PTS-STARTPTS,scale={pip_width}:{pip_height}[pip];'
+        f'[main][pip]overlay={x}:{y}:eof_action=repeat:repeatlast=1[out]'
+    )
+    cmd = ['ffmpeg']
+    cmd += _input(main_url, decoder_args, input_args)
+    if pip_decoder_args is None:
+        pip_decoder_args = decoder_args
+    cmd += _input(pip_url, pip_decoder_args, input_args)
+    cmd += ['-filter_complex', graph, '-map', '[out]']
+    return cmd + _rawvideo_output(fps, pix_fmt)
+
+
+def spawn(cmd, frame_bytes, stdin=None):
+    """启动 ffmpeg；读帧线程持续取走数据，管道缓冲只需容纳一帧
+
+    stdin=subprocess.PIPE 时输入由调用方写入（url 为 'pipe:0'）。
+    """
+    return subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, bufsize=frame_bytes)
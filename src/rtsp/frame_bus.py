@@ -0,0 +1,436 @@
+"""共享内存帧总线：解码、合成和分析各自运行在独立进程中，帧通过共享内存环形缓冲传递
+
+每路流一个 FrameRing（multiprocessing.shared_memory）：头部记录最新帧序号和每个槽位
+当前保存的帧序号，后面是 slots 个帧槽。写方（解码进程）把 ffmpeg 管道直接读进下一个槽位，
+写完才更新槽位序号和最新序号；读方（界面、合成、分析进程）映射同一块内存的只读视图，
+按序号判断是否有新帧，用完后再核对一次序号即可知道槽位在使用期间有没有被覆盖。
+
+    ring = FrameRing.attach(name)          # 任意进程中
+    seq, frame = ring.latest(after=seq)    # frame 为只读视图，没有新帧时为 None
+    ...
+    if not ring.valid(seq): 丢弃本次结果（使用期间被写方追上）
+"""
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from rtsp.decoder import mark_failed
+from rtsp.ffmpeg_cmd import frame_shape, spawn
+from rtsp.frame_reader import FramePool, read_exact
+from rtsp.stream_handler import StreamHandler
+from utils import config
+from utils.compositor import PipCompositor
+from utils.metrics import registry as metrics
+
+MAGIC = 0x46524d42555331  # 'FRMBUS1'
+# 头部字段（uint64 下标）
+_MAGIC, _SLOTS, _NDIM, _LATEST, _UPDATED, _CLOSED = 0, 1, 2, 3, 4, 5
+_SHAPE = 8          # 8..11 帧形状
+_SLOT_SEQ = 16      # 16.. 每个槽位的帧序号（0 表示正在写入/无效）
+POLL_INTERVAL = 0.002
+
+
+def _header_words(slots):
+    # 按 64 字节对齐，帧数据从缓存行边界开始
+    return (_SLOT_SEQ + slots + 7) // 8 * 8
+
+
+class FrameRing:
+    """共享内存环形帧缓冲：一个写方，任意多个读方（可在不同进程）"""
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.name = shm.name
+        self.owner = owner  # 创建方负责 unlink
+        words = np.ndarray((_SLOT_SEQ,), np.uint64, buffer=shm.buf)
+        if int(words[_MAGIC]) != MAGIC:
+            raise ValueError(f"{shm.name} 不是帧总线")
+        self.slots = int(words[_SLOTS])
+        self.shape = tuple(int(v) for v in words[_SHAPE:_SHAPE + int(words[_NDIM])])
+        self.frame_bytes = int(np.prod(self.shape))
+        header = _header_words(self.slots)
+        self._header = np.ndarray((header,), np.uint64, buffer=shm.buf)
+        self._slot_seq = self._header[_SLOT_SEQ:_SLOT_SEQ + self.slots]
+        offset = header * 8
+        self._frames = [np.ndarray(self.shape, np.uint8, buffer=shm.buf,
+                                   offset=offset + i * self.frame_bytes)
+                        for i in range(self.slots)]
+        self._readonly = []
+        for frame in self._frames:
+            view = frame.view()
+            view.flags.writeable = False
+            self._readonly.append(view)
+        self._writing = 0
+
+    @classmethod
+    def create(cls, shape, slots=None, name=None):
+        slots = slots or config.FRAME_BUS_SLOTS
+        shape = tuple(shape)
+        size = _header_words(slots) * 8 + slots * int(np.prod(shape))
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((_header_words(slots),), np.uint64, buffer=shm.buf)
+        header[:] = 0
+        header[_SLOTS] = slots
+        header[_NDIM] = len(shape)
+        header[_SHAPE:_SHAPE + len(shape)] = shape
+        header[_MAGIC] = MAGIC
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    # 写方
+    def begin(self):
+        """返回下一个槽位的可写 memoryview；写完调用 commit()"""
+        seq = int(self._header[_LATEST]) + 1
+        index = seq % self.slots
+        self._slot_seq[index] = 0  # 先作废，读方不会把写了一半的槽位当成有效帧
+        self._writing = seq
+        return memoryview(self._frames[index]).cast('B')
+
+    def begin_array(self):
+        """同 begin()，返回 ndarray 视图"""
+        self.begin()
+        return self._frames[self._writing % self.slots]
+
+    def commit(self):
+        seq = self._writing
+        self._slot_seq[seq % self.slots] = seq
+        self._header[_LATEST] = seq
+        self._header[_UPDATED] = time.time_ns()
+
+    def mark_closed(self, closed=True):
+        self._header[_CLOSED] = int(closed)
+
+    # 读方
+    @property
+    def seq(self):
+        return int(self._header[_LATEST])
+
+    @property
+    def updated_at(self):
+        return int(self._header[_UPDATED]) / 1e9
+
+    @property
+    def closed(self):
+        return bool(self._header[_CLOSED])
+
+    def latest(self, after=0):
+        """比 after 新的最新一帧：(序号, 只读视图)；没有新帧时返回 (after, None)"""
+        seq = int(self._header[_LATEST])
+        if seq <= after:
+            return after, None
+        index = seq % self.slots
+        if int(self._slot_seq[index]) != seq:
+            # 写方已经绕回到这个槽位，下次再取
+            return after, None
+        return seq, self._readonly[index]
+
+    def view(self, seq):
+        """序号为 seq 的帧（仍在环中时），否则 None"""
+        if seq and int(self._slot_seq[seq % self.slots]) == seq:
+            return self._readonly[seq % self.slots]
+        return None
+
+    def valid(self, seq):
+        """seq 号帧的槽位是否仍未被覆盖（用完视图后调用）"""
+        return bool(seq) and int(self._slot_seq[seq % self.slots]) == seq
+
+    def wait(self, after, timeout=None):
+        """轮询等待比 after 新的帧，有新帧返回 True"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while int(self._header[_LATEST]) <= after and not self.closed:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            time.sleep(POLL_INTERVAL)
+        return int(self._header[_LATEST]) > after
+
+    def close(self):
+        self._frames = self._readonly = []
+        self._header = self._slot_seq = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # 还有视图在别处被引用（如界面线程保留的最后一帧），由垃圾回收释放映射
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _watch(proc, ring, stop, stall_timeout):
+    """解码进程内的看门狗：收到停止信号或超时没有新帧时结束 ffmpeg，让读循环返回"""
+    started = time.time()
+    while proc.poll() is None:
+        if stop.wait(0.5):
+            break
+        last = max(ring.updated_at, started)
+        if time.time() - last > stall_timeout:
+            break
+    if proc.poll() is None:
+        proc.terminate()
+
+
+def decode_worker(ring_name, spec, stop, stall_timeout=None):
+    """解码进程：ffmpeg 原始帧直接读进共享内存槽位；会话断开后按退避间隔重连"""
+    stall_timeout = stall_timeout or config.STREAM_STALL_TIMEOUT
+    ring = FrameRing.attach(ring_name)
+    handler = StreamHandler(**spec)  # 只用来生成命令和选择解码后端
+    backoff = 1.0
+    try:
+        while not stop.is_set():
+            proc = spawn(handler.build_cmd(), ring.frame_bytes)
+            threading.Thread(target=_watch, args=(proc, ring, stop, stall_timeout),
+                             daemon=True).start()
+            frames = 0
+            try:
+                while not stop.is_set():
+                    view = ring.begin()
+                    got = read_exact(proc.stdout, view)
+                    view.release()
+                    if got != ring.frame_bytes:
+                        break
+                    ring.commit()
+                    frames += 1
+            except (OSError, ValueError):
+                pass
+            finally:
+                if proc.poll() is None:
+                    proc.terminate()
+                proc.wait()
+            if frames == 0 and handler.backend is not None:
+                mark_failed(handler.backend)
+            delay = backoff if frames == 0 else 0.5
+            backoff = 1.0 if frames else min(backoff * 2, config.RECONNECT_MAX_DELAY)
+            if stop.wait(delay):
+                break
+    finally:
+        ring.mark_closed()
+        ring.close()
+
+
+def composite_worker(out_name, main_name, pip_name, fps, stop, pip_ratio=3, margin=10):
+    """合成进程：取两路最新帧画中画合成到输出环；主画面有新帧就合成，但不超过 fps"""
+    out = FrameRing.attach(out_name)
+    main = FrameRing.attach(main_name)
+    pip = FrameRing.attach(pip_name) if pip_name else None
+    compositor = PipCompositor(pip_ratio, margin)
+    interval = 1.0 / fps
+    main_seq = pip_seq = 0
+    try:
+        while not stop.is_set():
+            start = time.perf_counter()
+            new_main, _ = main.latest(main_seq)
+            new_pip, _ = pip.latest(pip_seq) if pip else (pip_seq, None)
+            if new_main == main_seq and new_pip == pip_seq:
+                time.sleep(POLL_INTERVAL)
+                continue
+            main_seq, pip_seq = new_main, new_pip
+            main_frame = main.view(main_seq)
+            if main_frame is None:
+                continue
+            pip_frame = pip.view(pip_seq) if pip else None
+            compositor.compose(main_frame, pip_frame, out.begin_array())
+            # 合成期间输入槽位被覆盖则丢弃这一帧
+            if main.valid(main_seq) and (pip_frame is None or pip.valid(pip_seq)):
+                out.commit()
+            elapsed = time.perf_counter() - start
+            if elapsed < interval:
+                time.sleep(interval - elapsed)
+    finally:
+        out.mark_closed()
+        for ring in (out, main, pip):
+            if ring:
+                ring.close()
+
+
+class BusPipeline:
+    """多进程画中画流水线：每路一个解码进程 + 一个合成进程，界面线程只取合成结果
+
+    取帧接口与 StreamHandler 相同（take/read/wait/release/stalled/restart），
+    播放循环不需要区分；take() 把合成帧从共享内存复制到本地缓冲池的帧里返回，
+    用完 release() 归还，跨多次循环保留也不会被合成进程覆盖。
+    其他进程可以用 ring_names 中的名字 attach 同一路解码结果（如分析进程）。
+    """
+
+    pix_fmt = 'rgb24'  # 合成结果固定为 RGB
+
+    def __init__(self, main_url, width, height, pip_url=None, fps=15, pip_fps=None, pip_ratio=3,
+                 margin=10, latency_mode=None, record_url=None, input_args=None,
+                 decoder_args=None, slots=None, name='bus'):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.name = name
+        self.slots = slots or config.FRAME_BUS_SLOTS
+        self.pip_ratio = pip_ratio
+        self.margin = margin
+        common = {'fps': fps, 'latency_mode': latency_mode, 'decoder_args': decoder_args}
+        if input_args is not None:
+            common['input_args'] = input_args
+        self.main_spec = dict(common, rtsp_url=main_url, width=width, height=height,
+                              role='main', name=f'{name}-main', record_url=record_url)
+        self.pip_spec = None
+        if pip_url:
+            self.pip_spec = dict(common, rtsp_url=pip_url, width=width // pip_ratio,
+                                 height=height // pip_ratio, fps=pip_fps or fps,
+                                 role='pip', name=f'{name}-pip')
+        self.low_latency = (latency_mode or config.LATENCY_MODE) == 'low'
+        self._ctx = multiprocessing.get_context('spawn')  # 不 fork 带 Tk 和线程的界面进程
+        self._stop = None
+        self._pip_stop = None  # 画中画解码进程单独一个停止事件，可以只重启这一路
+        self._pip_proc = None
+        self.processes = []
+        self.rings = {}
+        self.out = None
+        self.pool = FramePool((height, width, 3))
+        self._seq = 0
+        self.taken = 0
+        self.torn = 0  # 复制期间槽位被合成进程覆盖而丢弃的帧数
+        self.started = 0.0
+        self.restarts = 0
+
+    @property
+    def ring_names(self):
+        return {key: ring.name for key, ring in self.rings.items()}
+
+    def _ring(self, key, shape):
+        ring = FrameRing.create(shape, self.slots,
+                                name=f'fb_{os.getpid()}_{key}_{uuid.uuid4().hex[:8]}')
+        self.rings[key] = ring
+        return ring
+
+    def start_stream(self):
+        if self.processes:
+            return
+        self._stop = self._ctx.Event()
+        self._pip_stop = self._ctx.Event()
+        main = self._ring('main', frame_shape('rgb24', self.width, self.height))
+        pip = None
+        if self.pip_spec:
+            pip = self._ring('pip', frame_shape('rgb24', self.pip_spec['width'],
+                                                self.pip_spec['height']))
+        self.out = self._ring('out', (self.height, self.width, 3))
+        targets = [(decode_worker, (main.name, self.main_spec, self._stop))]
+        targets.append((composite_worker, (self.out.name, main.name, pip.name if pip else None,
+                                           self.fps, self._stop, self.pip_ratio, self.margin)))
+        for target, args in targets:
+            proc = self._ctx.Process(target=target, args=args, daemon=True)
+            proc.start()
+            self.processes.append(proc)
+        if pip:
+            self._start_pip()
+        self._seq = 0
+        self.started = time.time()
+
+    def _start_pip(self):
+        self._pip_proc = self._ctx.Process(
+            target=decode_worker, args=(self.rings['pip'].name, self.pip_spec, self._pip_stop),
+            daemon=True)
+        self._pip_proc.start()
+        self.processes.append(self._pip_proc)
+
+    def restart_pip(self, pip_url=None, pip_fps=None):
+        """换画中画地址或帧率，只重启画中画解码进程；主画面解码和合成进程不受影响"""
+        if not self.processes or self._pip_proc is None:
+            return
+        self._pip_stop.set()
+        self._pip_proc.join(timeout=3)
+        if self._pip_proc.is_alive():
+            self._pip_proc.terminate()
+            self._pip_proc.join(timeout=1)
+        self.processes.remove(self._pip_proc)
+        if pip_url:
+            self.pip_spec['rtsp_url'] = pip_url
+        self.pip_spec['fps'] = pip_fps or self.fps
+        self._pip_stop = self._ctx.Event()
+        self.rings['pip'].mark_closed(False)  # 新进程继续写同一个环，序号接着往下
+        self._start_pip()
+        metrics.incr(self.name, 'pip_restarts')
+
+    def stop_stream(self):
+        if not self.processes:
+            return
+        self._stop.set()
+        self._pip_stop.set()
+        for proc in self.processes:
+            proc.join(timeout=3)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join(timeout=1)
+        print(f"{self.name} 合成 {self.out.seq} 帧，取走 {self.taken} 帧，"
+              f"复制时被覆盖 {self.torn} 帧")
+        for ring in self.rings.values():
+            ring.close()
+        self.processes = []
+        self._pip_proc = None
+        self.rings = {}
+        self.out = None
+
+    def restart(self):
+        self.stop_stream()
+        self.restarts += 1
+        metrics.incr(self.name, 'restarts')
+        self.start_stream()
+
+    @property
+    def alive(self):
+        return bool(self.processes) and all(p.is_alive() for p in self.processes)
+
+    def stalled(self, timeout):
+        """有进程退出，或超过 timeout 秒没有新的合成帧（解码进程自己会重连，这里留足余量）"""
+        if not self.alive:
+            return True
+        last = self.out.updated_at or self.started
+        return time.time() - last > timeout + config.RECONNECT_MAX_DELAY
+
+    @property
+    def dropped(self):
+        """合成了但没被取走的帧数"""
+        return self.out.seq - self.taken if self.out else 0
+
+    def take(self):
+        if self.out is None:
+            return None
+        seq, view = self.out.latest(self._seq)
+        if view is None:
+            return None
+        self._seq = seq
+        frame = self.pool.acquire()
+        np.copyto(frame, view)
+        if not self.out.valid(seq):
+            # 复制期间被写方追上，内容可能新旧混杂；等下一帧
+            self.pool.release(frame)
+            self.torn += 1
+            metrics.incr(self.name, 'torn_frames')
+            return None
+        self.taken += 1
+        metrics.mark(self.name)
+        return frame
+
+    def wait(self, timeout=None):
+        return self.out.wait(self._seq, timeout) if self.out else False
+
+    def read(self, timeout=None):
+        if self.wait(timeout):
+            return self.take()
+        return None
+
+    def release(self, frame):
+        self.pool.release(frame)
+
+    def __enter__(self):
+        self.start_stream()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_stream()
@@ -0,0 +1,200 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from utils.metrics import registry as metrics
+
+
+class FramePool:
+    """可复用的帧缓冲池，避免每帧重新分配内存"""
+
+    def __init__(self, shape, dtype=np.uint8):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._free = []
+        self._lock = threading.Lock()
+        self.allocations = 0      # 实际分配的缓冲数
+        self.allocated_bytes = 0  # 实际分配的总字节数
+
+    def acquire(self):
+        """取一块缓冲；池空时才新分配"""
+        with self._lock:
+            if self._free:
+                return self._free.pop()
+        buf = np.empty(self.shape, self.dtype)
+        with self._lock:
+            self.allocations += 1
+            self.allocated_bytes += buf.nbytes
+        return buf
+
+    def release(self, buf):
+        """归还缓冲；尺寸不符（如会话已重建）的缓冲直接丢弃"""
+        if buf is None or buf.shape != self.shape or buf.dtype != self.dtype:
+            return
+        with self._lock:
+            self._free.append(buf)
+
+
+class FrameQueue:
+    """有界帧队列，满了之后按策略处理新帧
+
+    drop_oldest：丢掉最旧的帧腾出位置（默认，适合实时显示）
+    drop_newest：直接丢掉新帧
+    block：发布方阻塞等待，管道随之被 ffmpeg 写满，形成背压
+    """
+    POLICIES = ('drop_oldest', 'drop_newest', 'block')
+
+    def __init__(self, maxsize=1, policy='drop_oldest'):
+        if policy not in self.POLICIES:
+            raise ValueError(f"未知的队列策略: {policy}")
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self._cond = threading.Condition()
+        self._frames = deque()
+        self._closed = False
+        self.seq = 0          # 已发布的帧序号
+        self.dropped = 0      # 因队列满而被丢弃的帧数
+        self.updated_at = 0.0
+
+    def publish(self, frame):
+        """发布新帧；返回被丢弃的帧（没有则为 None），供调用方回收"""
+        with self._cond:
+            old = None
+            if len(self._frames) >= self.maxsize:
+                if self.policy == 'block':
+                    while len(self._frames) >= self.maxsize and not self._closed:
+                        self._cond.wait()
+                    if self._closed:
+                        return frame
+                elif self.policy == 'drop_newest':
+                    self.dropped += 1
+                    return frame
+                else:
+                    self.dropped += 1
+                    old = self._frames.popleft()
+            self._frames.append(frame)
+            self.seq += 1
+            self.updated_at = time.time()
+            self._cond.notify_all()
+            return old
+
+    def take(self):
+        """取走最旧的一帧，所有权交给调用方；没有帧时返回 None"""
+        with self._cond:
+            if not self._frames:
+                return None
+            frame = self._frames.popleft()
+            self._cond.notify_all()
+            return frame
+
+    def get(self, timeout=None):
+        """阻塞等待下一帧；超时或队列关闭时返回 None"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._frames or self._closed, timeout)
+            if not self._frames:
+                return None
+            frame = self._frames.popleft()
+            self._cond.notify_all()
+            return frame
+
+    def wait(self, timeout=None):
+        """等待队列中有帧（不取走）；有帧返回 True，超时或关闭返回 False"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._frames or self._closed, timeout)
+            return bool(self._frames)
+
+    def close(self):
+        """关闭队列，唤醒所有等待方"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def drain(self):
+        """取出所有剩余帧"""
+        with self._cond:
+            frames = list(self._frames)
+            self._frames.clear()
+            self._cond.notify_all()
+            return frames
+
+
+class LatestFrameSlot(FrameQueue):
+    """最新帧槽位：只保留最新一帧，未被取走的旧帧直接丢弃"""
+
+    def __init__(self):
+        super().__init__(1, 'drop_oldest')
+
+
+def read_exact(stream, view):
+    """用 readinto 填满 view，返回实际读到的字节数（小于长度说明管道已关闭）"""
+    got = 0
+    size = len(view)
+    while got < size:
+        n = stream.readinto(view[got:])
+        if not n:
+            break
+        got += n
+    return got
+
+
+class FrameReader(threading.Thread):
+    """独立读帧线程：把 ffmpeg 管道数据直接读入缓冲池并发布到槽位（或 FrameQueue）"""
+
+    def __init__(self, proc, shape, slot, pool=None, name="reader"):
+        super().__init__(name=name, daemon=True)
+        self.proc = proc
+        self.slot = slot
+        self.pool = pool or FramePool(shape)
+        self.frames = 0
+        self.short_reads = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            self._read_loop()
+        finally:
+            # 管道结束后关闭队列，等待取帧的一方立即返回
+            self.slot.close()
+
+    def _read_loop(self):
+        stdout = self.proc.stdout
+        while not self._stop_event.is_set():
+            buf = self.pool.acquire()
+            view = memoryview(buf).cast('B')
+            start = time.perf_counter()
+            try:
+                got = read_exact(stdout, view)
+            except (OSError, ValueError):
+                break
+            finally:
+                view.release()
+            if got != buf.nbytes:
+                # 管道关闭（ffmpeg 退出）或数据不完整
+                self.short_reads += 1
+                metrics.incr(self.name, 'short_reads')
+                self.pool.release(buf)
+                break
+            # 读一帧的耗时，主要是等待 ffmpeg 解码出帧的时间
+            metrics.observe(self.name, 'read', time.perf_counter() - start)
+            metrics.mark(self.name)
+            metrics.incr(self.name, 'pipe_bytes', got)
+            self.frames += 1
+            dropped = self.slot.publish(buf)
+            if dropped is not None:
+                metrics.incr(self.name, 'dropped')
+            self.pool.release(dropped)
+
+    def stop(self):
+        self._stop_event.set()
+        # 唤醒阻塞在 publish（背压模式）或 get 上的线程
+        self.slot.close()
+
+    @property
+    def alive(self):
+        return self.is_alive() and not self._stop_event.is_set()
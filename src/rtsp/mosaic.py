@@ -0,0 +1,124 @@
+from rtsp.ffmpeg_cmd import RTSP_INPUT_ARGS
+from rtsp.motion import MotionTap, draw_regions
+from rtsp.stream_handler import StreamHandler
+from utils import config
+from utils.mosaic import MosaicCompositor
+
+
+def split_source(source):
+    """source 为 url、'主码流 子码流' 或 (主码流, 子码流) -> (主码流, 子码流或 None)"""
+    if isinstance(source, str):
+        source = source.split()
+        if not source:
+            return '', None
+    if isinstance(source, (tuple, list)):
+        return source[0], (source[-1] if len(source) > 1 else None)
+    return source, None
+
+
+def pick_url(source, tile_width):
+    """source 为 url 或 (主码流, 子码流)；格子不大时用子码流，省去解码大分辨率"""
+    main, sub = split_source(source)
+    if sub and tile_width <= config.MOSAIC_SUBSTREAM_MAX_WIDTH:
+        return sub
+    return main
+
+
+def parse_sources(text):
+    """每行一路：'主码流地址' 或 '主码流地址 子码流地址'，空行忽略"""
+    sources = []
+    for line in text.splitlines():
+        parts = line.split()
+        if parts:
+            sources.append(tuple(parts) if len(parts) > 1 else parts[0])
+    return sources
+
+
+class MosaicSession:
+    """多画面会话：每个格子一个 StreamHandler，按格子尺寸解码，合成到同一块画布
+
+    step() 取各路最新帧（没有新帧的格子沿用上一帧），卡死的格子单独重启。
+    motion 为 True 时每个格子各带一个运动检测旁路，有运动的格子在画面上框出运动区域，
+    on_motion(index, event) 在检测线程中调用。
+    """
+
+    def __init__(self, sources, rows, cols, width, height, fps=None,
+                 input_args=RTSP_INPUT_ARGS, decoder_args=None, motion=False, on_motion=None):
+        self.sources = list(sources)[:rows * cols]
+        self.compositor = MosaicCompositor(rows, cols)
+        self.width = width
+        self.height = height
+        self.fps = fps or config.MOSAIC_FPS
+        self.input_args = input_args
+        self.decoder_args = decoder_args
+        self.handlers = []
+        self.held = []
+        self.frames = 0
+        self.motion = motion
+        self.on_motion = on_motion
+        self.taps = []
+
+    @property
+    def tile_size(self):
+        return self.compositor.tile_size(self.width, self.height)
+
+    def start(self):
+        tile_w, tile_h = self.tile_size
+        for i, source in enumerate(self.sources):
+            # 格子按画中画角色选择解码参数：线程少、跳过环路滤波
+            handler = StreamHandler(pick_url(source, tile_w), tile_w, tile_h, fps=self.fps,
+                                    role='pip', name=f'tile{i}', input_args=self.input_args,
+                                    decoder_args=self.decoder_args)
+            handler.start_stream()
+            self.handlers.append(handler)
+            if self.motion:
+                tap = MotionTap(f'tile{i}', on_event=self._motion_callback(i))
+                tap.start()
+                self.taps.append(tap)
+        self.held = [None] * len(self.handlers)
+
+    def _motion_callback(self, index):
+        if self.on_motion is None:
+            return None
+        return lambda event: self.on_motion(index, event)
+
+    def stop(self):
+        for handler, frame in zip(self.handlers, self.held):
+            handler.release(frame)
+            handler.stop_stream()
+        for tap in self.taps:
+            tap.close()
+        self.handlers = []
+        self.held = []
+        self.taps = []
+
+    def step(self, out):
+        """更新各格子并合成到 out；有任一格子出新帧时返回 True"""
+        fresh = False
+        for i, handler in enumerate(self.handlers):
+            if handler.stalled(config.STREAM_STALL_TIMEOUT):
+                handler.restart()
+                handler.release(self.held[i])
+                self.held[i] = None
+            frame = handler.take()
+            if frame is not None:
+                handler.release(self.held[i])
+                self.held[i] = frame
+                fresh = True
+                if self.taps:
+                    self.taps[i].submit(frame)
+        if fresh:
+            self.compositor.compose(self.held, out)
+            tiles = self.compositor.tiles(out.shape[1], out.shape[0])
+            for tap, rect in zip(self.taps, tiles):
+                if tap.regions and config.MOTION_OVERLAY:
+                    draw_regions(out, tap.regions, rect)
+            self.frames += 1
+        return fresh
+
+    def active_tiles(self):
+        """当前检测到运动的格子序号"""
+        return [i for i, tap in enumerate(self.taps) if tap.active]
+
+    def dropped(self):
+        return sum(handler.dropped for handler in self.handlers)
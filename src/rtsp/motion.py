@@ -0,0 +1,257 @@
+"""运动检测：在小尺寸抽样帧上做滑动平均背景差分，输出运动区域、评分和开始/结束事件
+
+显示线程只调用 MotionTap.submit()：按 MOTION_FPS 抽样，一次 np.take 把整帧按固定下标
+取成 MOTION_SIZE 的小图（约 0.1 ms），放进最新帧槽位就返回；YUV 管道帧只取亮度平面。
+分析在后台线程中进行：
+    灰度    RGB 小图 (N, 3) 与亮度权重做一次矩阵乘，亮度小图 (N,) 直接使用
+    背景    bg += alpha * (gray - bg)，全程写入预分配的缓冲
+    前景    |gray - bg| > 阈值 得到掩码，按 MOTION_GRID 切块求每块的变化比例
+    区域    变化比例超过 MOTION_CELL_RATIO 的块按四邻接合并成矩形（块数很少，逐块即可）
+画面大面积同时变化（自动曝光、切换摄像机）时视为光照突变，直接用当前帧重置背景。
+
+每帧分析的线程 CPU 时间按指数平均统计，超过 MOTION_BUDGET_MS 时按比例加大抽样间隔；
+后台还没处理完上一帧时新帧直接覆盖（计入 skipped），不会积压，也不会反压显示线程。
+"""
+import math
+import threading
+import time
+
+import numpy as np
+
+from rtsp.frame_reader import FramePool, LatestFrameSlot
+from utils import config
+from utils.colorspace import YUV_FORMATS, luma
+from utils.metrics import registry as metrics
+
+LUMA = np.array([0.299, 0.587, 0.114], np.float32)
+
+
+def sample_index(frame_shape, width, height):
+    """整帧按行展开后，小图每个像素对应的下标（取各块中心的像素）"""
+    frame_h, frame_w = frame_shape[:2]
+    rows = ((np.arange(height) + 0.5) * frame_h / height).astype(np.intp)
+    cols = ((np.arange(width) + 0.5) * frame_w / width).astype(np.intp)
+    return (rows[:, None] * frame_w + cols).ravel()
+
+
+def cell_regions(active, ratios):
+    """把相邻的活动块合并成矩形：返回 [(x, y, w, h, 评分)]，坐标为 0..1 的相对值"""
+    rows, cols = active.shape
+    seen = np.zeros_like(active)
+    regions = []
+    for r, c in np.argwhere(active).tolist():
+        if seen[r, c]:
+            continue
+        seen[r, c] = True
+        stack, cells = [(r, c)], []
+        while stack:
+            y, x = stack.pop()
+            cells.append((y, x))
+            for ny, nx in ((y - 1, x), (y + 1, x), (y, x - 1), (y, x + 1)):
+                if 0 <= ny < rows and 0 <= nx < cols and active[ny, nx] and not seen[ny, nx]:
+                    seen[ny, nx] = True
+                    stack.append((ny, nx))
+        ys = [y for y, _ in cells]
+        xs = [x for _, x in cells]
+        score = float(np.mean([ratios[y, x] for y, x in cells]))
+        regions.append((min(xs) / cols, min(ys) / rows, (max(xs) - min(xs) + 1) / cols,
+                        (max(ys) - min(ys) + 1) / rows, score))
+    regions.sort(key=lambda region: region[2] * region[3] * region[4], reverse=True)
+    return regions
+
+
+def draw_regions(out, regions, rect=None, color=(255, 64, 64), thickness=2):
+    """在 out 的 rect=(x, y, w, h) 区域内画出运动区域的边框（切片赋值）"""
+    x0, y0, width, height = rect or (0, 0, out.shape[1], out.shape[0])
+    for rx, ry, rw, rh, _ in regions:
+        left, top = x0 + int(rx * width), y0 + int(ry * height)
+        right = min(x0 + int((rx + rw) * width), x0 + width)
+        bottom = min(y0 + int((ry + rh) * height), y0 + height)
+        t = max(min(thickness, (right - left) // 2, (bottom - top) // 2), 1)
+        out[top:top + t, left:right] = color
+        out[bottom - t:bottom, left:right] = color
+        out[top:bottom, left:left + t] = color
+        out[top:bottom, right - t:right] = color
+
+
+class MotionDetector:
+    """滑动平均背景模型；update() 输入 (N, 3) 的 RGB 小图或 (N,) 的亮度小图，
+    返回 (变化像素比例, 各块变化比例)"""
+
+    def __init__(self, width=None, height=None, grid=None, alpha=None, threshold=None):
+        cols, rows = grid or config.MOTION_GRID
+        width, height = (width, height) if width else config.MOTION_SIZE
+        # 小图尺寸取块数的整数倍，分块求和只需一次 reshape
+        self.cell_w, self.cell_h = max(width // cols, 1), max(height // rows, 1)
+        self.width, self.height = self.cell_w * cols, self.cell_h * rows
+        self.grid = (cols, rows)
+        self.alpha = config.MOTION_ALPHA if alpha is None else alpha
+        self.threshold = config.MOTION_THRESHOLD if threshold is None else threshold
+        shape = (self.height, self.width)
+        self._gray = np.empty(shape, np.float32)
+        self._diff = np.empty(shape, np.float32)
+        self._step = np.empty(shape, np.float32)
+        self._mask = np.empty(shape, bool)
+        self._background = None
+        self.resets = 0
+
+    def reset(self):
+        self._background = None
+
+    def update(self, small):
+        gray = self._gray
+        if small.ndim == 1:
+            gray.reshape(-1)[...] = small
+        else:
+            np.matmul(small, LUMA, out=gray.reshape(-1))
+        cols, rows = self.grid
+        if self._background is None:
+            self._background = gray.copy()
+            return 0.0, np.zeros((rows, cols), np.float32)
+        diff, background = self._diff, self._background
+        np.subtract(gray, background, out=diff)
+        np.multiply(diff, self.alpha, out=self._step)
+        background += self._step
+        np.abs(diff, out=diff)
+        mask = np.greater(diff, self.threshold, out=self._mask)
+        ratios = mask.reshape(rows, self.cell_h, cols, self.cell_w).mean(axis=(1, 3))
+        score = float(ratios.mean())
+        if score > config.MOTION_GLOBAL_RATIO:
+            # 光照突变或换了画面：重新学习背景，不报运动
+            background[...] = gray
+            self.resets += 1
+            return 0.0, np.zeros_like(ratios)
+        return score, ratios
+
+
+class MotionTap(threading.Thread):
+    """一路画面的运动检测旁路：submit() 在显示线程抽样，分析和事件回调在本线程
+
+    on_event(event) 在本线程调用，event 为字典：
+        kind     'start' 或 'end'
+        name     路名
+        time     时间戳
+        score    开始时为当前评分，结束时为本次运动的最高评分
+        regions  [(x, y, w, h, 评分)]，0..1 的相对坐标（结束事件为空）
+        duration 结束事件中本次运动持续的秒数
+    """
+
+    def __init__(self, name='main', on_event=None, fps=None, budget_ms=None):
+        super().__init__(name=f'motion-{name}', daemon=True)
+        self.stream_name = name
+        self.listeners = [on_event] if on_event else []
+        self.fps = fps or config.MOTION_FPS
+        self.budget = (config.MOTION_BUDGET_MS if budget_ms is None else budget_ms) / 1000
+        self.detector = MotionDetector()
+        self.pool = FramePool((self.detector.width * self.detector.height, 3))
+        self.slot = LatestFrameSlot()
+        self._index = None
+        self._index_shape = None
+        self._next_at = 0.0
+        self._stride = 1  # 每隔几个抽样周期分析一次，超预算时加大
+        self._hits = 0
+        self._last_motion = 0.0
+        self._started_at = 0.0
+        self._peak = 0.0
+        self._stop_event = threading.Event()
+        self.active = False
+        self.score = 0.0
+        self.regions = []
+        self.analyzed = 0
+        self.skipped = 0
+        self.events = 0
+        self.cost = 0.0  # 每帧分析耗时（线程 CPU 秒）的指数平均
+
+    def submit(self, frame, pix_fmt='rgb24'):
+        """显示线程调用：没到抽样时刻直接返回；否则抽成小图交给后台，不等待分析"""
+        now = time.monotonic()
+        if now < self._next_at or frame is None:
+            return
+        self._next_at = now + self._stride / self.fps
+        if pix_fmt in YUV_FORMATS:
+            frame = luma(frame)
+        if frame.shape != self._index_shape:
+            self._index = sample_index(frame.shape, self.detector.width, self.detector.height)
+            self._index_shape = frame.shape
+            # 亮度帧抽成 (N,)，RGB 帧抽成 (N, 3)
+            shape = (self.detector.width * self.detector.height,) + frame.shape[2:]
+            if self.pool.shape != shape:
+                self.pool = FramePool(shape)
+        small = self.pool.acquire()
+        np.take(frame.reshape(-1, *frame.shape[2:]), self._index, axis=0, out=small, mode='clip')
+        old = self.slot.publish(small)
+        if old is not None:
+            self.skipped += 1  # 上一帧还没分析就被新帧取代
+            self.pool.release(old)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            small = self.slot.get(timeout=0.5)
+            if small is None:
+                # 画面卡住或断流时没有新样本，也要按时发出结束事件，否则运动录像停不下来
+                self._expire(time.time())
+                continue
+            start = time.thread_time()
+            try:
+                score, ratios = self.detector.update(small)
+            finally:
+                self.pool.release(small)
+            self._evaluate(score, ratios)
+            cost = time.thread_time() - start
+            self.cost = cost if not self.analyzed else self.cost * 0.9 + cost * 0.1
+            self.analyzed += 1
+            self._stride = max(1, math.ceil(self.cost / self.budget)) if self.budget else 1
+            metrics.observe(self.stream_name, 'motion', cost)
+
+    def _evaluate(self, score, ratios):
+        active = ratios > config.MOTION_CELL_RATIO
+        moving = int(active.sum()) >= config.MOTION_MIN_CELLS
+        now = time.time()
+        self.score = score
+        self.regions = cell_regions(active, ratios) if moving else []
+        if moving:
+            self._hits += 1
+            self._last_motion = now
+            self._peak = max(self._peak, score)
+            if not self.active and self._hits >= config.MOTION_START_FRAMES:
+                self.active = True
+                self._started_at = now
+                self._emit({'kind': 'start', 'time': now, 'score': score,
+                            'regions': self.regions})
+        else:
+            self._hits = 0
+            self._expire(now)
+
+    def _expire(self, now):
+        """最后一次检测到运动已超过 MOTION_HOLD 秒时结束本次运动"""
+        if self.active and now - self._last_motion >= config.MOTION_HOLD:
+            self.active = False
+            self.regions = []
+            self._emit({'kind': 'end', 'time': now, 'score': self._peak, 'regions': [],
+                        'duration': self._last_motion - self._started_at})
+            self._peak = 0.0
+
+    def _emit(self, event):
+        event['name'] = self.stream_name
+        self.events += 1
+        if event['kind'] == 'start':
+            metrics.incr(self.stream_name, 'motion_events')
+            print(f"{self.stream_name} 检测到运动：评分 {event['score']:.3f}，"
+                  f"{len(event['regions'])} 个区域")
+        else:
+            print(f"{self.stream_name} 运动结束：持续 {event['duration']:.1f}s，"
+                  f"最高评分 {event['score']:.3f}")
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print("运动事件回调异常:", e)
+
+    def stats(self):
+        return {'analyzed': self.analyzed, 'skipped': self.skipped, 'events': self.events,
+                'stride': self._stride, 'cost_ms': self.cost * 1000,
+                'background_resets': self.detector.resets}
+
+    def close(self):
+        self._stop_event.set()
+        self.slot.close()
@@ -0,0 +1,132 @@
+"""MPEG-TS 包解析：只看包头和节目表（PAT/PMT），用于找视频关键帧的起始包
+
+PES 只读包头里的 PTS；关键帧由复用器在起始包自适应域里置位的 random_access_indicator 标识
+（ffmpeg 的 mpegts 复用器会为视频关键帧置位）。包头字段按批用 NumPy 一次算出。
+"""
+import numpy as np
+
+PACKET_SIZE = 188
+SYNC_BYTE = 0x47
+PAT_PID = 0
+# MPEG-1/2、MPEG-4 Part 2、H.264、HEVC 视频
+VIDEO_STREAM_TYPES = (0x01, 0x02, 0x10, 0x1b, 0x24)
+
+
+def as_packets(data):
+    """bytes/bytearray（长度为 188 的整数倍）-> (N, 188) uint8 视图"""
+    return np.frombuffer(data, np.uint8).reshape(-1, PACKET_SIZE)
+
+
+def packet_pids(packets):
+    return ((packets[:, 1].astype(np.uint16) & 0x1f) << 8) | packets[:, 2]
+
+
+def payload_unit_start(packets):
+    return (packets[:, 1] & 0x40) != 0
+
+
+def random_access(packets):
+    """自适应域存在、长度非零且 random_access_indicator 置位"""
+    has_adaptation = (packets[:, 3] & 0x20) != 0
+    return has_adaptation & (packets[:, 4] > 0) & ((packets[:, 5] & 0x40) != 0)
+
+
+def pes_pts(packet):
+    """PES 起始包中的 PTS（秒）；没有 PTS 时返回 None"""
+    offset = 4
+    if packet[3] & 0x20:
+        offset += 1 + packet[4]
+    pes = bytes(packet[offset:offset + 14])
+    if len(pes) < 14 or pes[:3] != b'\x00\x00\x01' or not pes[7] & 0x80:
+        return None
+    b = pes[9:14]
+    pts = (((b[0] >> 1) & 0x07) << 30) | (b[1] << 22) | ((b[2] >> 1) << 15) | \
+        (b[3] << 7) | (b[4] >> 1)
+    return pts / 90000.0
+
+
+def _section(packet):
+    """单包承载的 PSI 段（pointer_field 之后）"""
+    offset = 4
+    if packet[3] & 0x20:
+        offset += 1 + packet[4]
+    if offset >= PACKET_SIZE:
+        return None
+    offset += 1 + packet[offset]  # pointer_field
+    section = bytes(packet[offset:])
+    if len(section) < 3:
+        return None
+    length = ((section[1] & 0x0f) << 8) | section[2]
+    return section[:3 + length]
+
+
+def parse_pat(packet):
+    """返回 PAT 中第一个节目的 PMT PID；不是有效 PAT 时返回 None"""
+    section = _section(packet)
+    if not section or section[0] != 0x00:
+        return None
+    # 8 字节段头之后是 4 字节一项的节目表，末尾 4 字节为 CRC
+    for i in range(8, len(section) - 4, 4):
+        program = (section[i] << 8) | section[i + 1]
+        if program != 0:  # 0 号节目指向网络信息表
+            return ((section[i + 2] & 0x1f) << 8) | section[i + 3]
+    return None
+
+
+def parse_pmt(packet):
+    """返回 PMT 中第一个视频流的 PID；没有视频流时返回 None"""
+    section = _section(packet)
+    if not section or section[0] != 0x02 or len(section) < 12:
+        return None
+    i = 12 + (((section[10] & 0x0f) << 8) | section[11])
+    end = len(section) - 4
+    while i + 5 <= end:
+        stream_type = section[i]
+        pid = ((section[i + 1] & 0x1f) << 8) | section[i + 2]
+        if stream_type in VIDEO_STREAM_TYPES:
+            return pid
+        i += 5 + (((section[i + 3] & 0x0f) << 8) | section[i + 4])
+    return None
+
+
+class TSScanner:
+    """跟踪节目表并找出每批包中视频关键帧的起始位置
+
+    同时保留最近的 PAT/PMT 包，新文件开头先写入它们，单个文件即可独立播放。
+    """
+
+    def __init__(self):
+        self.pmt_pid = None
+        self.video_pid = None
+        self.pat = None
+        self.pmt = None
+
+    @property
+    def ready(self):
+        return self.video_pid is not None and self.pat is not None and self.pmt is not None
+
+    def headers(self):
+        return (self.pat or b'') + (self.pmt or b'')
+
+    def scan(self, packets):
+        """返回本批包中视频关键帧起始包的下标数组"""
+        pids = packet_pids(packets)
+        pat_index = np.flatnonzero(pids == PAT_PID)
+        if pat_index.size:
+            packet = packets[pat_index[-1]]
+            pmt_pid = parse_pat(packet)
+            if pmt_pid is not None:
+                self.pat = packet.tobytes()
+                self.pmt_pid = pmt_pid
+        if self.pmt_pid is not None:
+            pmt_index = np.flatnonzero(pids == self.pmt_pid)
+            if pmt_index.size:
+                packet = packets[pmt_index[-1]]
+                video_pid = parse_pmt(packet)
+                if video_pid is not None:
+                    self.pmt = packet.tobytes()
+                    self.video_pid = video_pid
+        if self.video_pid is None:
+            return pat_index[:0]
+        return np.flatnonzero((pids == self.video_pid) & payload_unit_start(packets)
+                              & random_access(packets))
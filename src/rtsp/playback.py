@@ -0,0 +1,241 @@
+"""录像回放：关键帧索引、跨段定位、按关键帧取帧和缩略图缓存
+
+每个录像文件建一份关键帧索引（NumPy 结构化数组，pts 为相对文件开头的秒数，
+offset 为字节偏移，未知时为 -1），缓存为 .index/<文件名>.npy，之后用 mmap 打开，
+加载几乎不花时间。最后一行是结束标记：pts 为时长，offset 为文件大小。
+
+TS 录像直接在 Python 里扫描包头建索引；其他封装用 ffmpeg 只解复用（-c copy -f framecrc）
+读出每个包的时间戳和关键帧标志，不解码。
+"""
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from rtsp.frame_reader import read_exact
+from rtsp.mpegts import PACKET_SIZE, TSScanner, as_packets, packet_pids, pes_pts, \
+    payload_unit_start
+from utils import config
+
+INDEX_DTYPE = np.dtype([('pts', '<f8'), ('offset', '<i8')])
+INDEX_DIR = '.index'
+SCAN_PACKETS = 8192  # TS 扫描每批约 1.5MB
+_STAMP = re.compile(r'_(\d{8}_\d{6})(?:_\d+)?\.\w+$')
+
+
+def index_path(path):
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, INDEX_DIR, name + '.npy')
+
+
+def _scan_ts(path):
+    """扫描 TS 文件的视频关键帧：[(pts, 字节偏移), ...] 和最后一帧的结束时间"""
+    scanner = TSScanner()
+    entries = []
+    last_pts = prev_pts = None
+    offset = 0
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(PACKET_SIZE * SCAN_PACKETS)
+            usable = len(data) // PACKET_SIZE * PACKET_SIZE
+            if not usable:
+                break
+            packets = as_packets(data[:usable])
+            for i in scanner.scan(packets):
+                pts = pes_pts(packets[i])
+                if pts is not None:
+                    entries.append((pts, offset + int(i) * PACKET_SIZE))
+            if scanner.video_pid is not None:
+                starts = np.flatnonzero((packet_pids(packets) == scanner.video_pid)
+                                        & payload_unit_start(packets))
+                for i in starts[-2:]:
+                    pts = pes_pts(packets[i])
+                    if pts is not None:
+                        prev_pts, last_pts = last_pts, pts
+            offset += usable
+    if last_pts is not None and prev_pts is not None:
+        # 最后一帧按前一帧间隔计算时长
+        last_pts += max(last_pts - prev_pts, 0.0)
+    return entries, last_pts
+
+
+def _scan_ffmpeg(path):
+    """用 ffmpeg 只解复用视频包，返回 [(pts, -1), ...] 和最后一个包的结束时间"""
+    result = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', path,
+         '-map', '0:v:0', '-c', 'copy', '-f', 'framecrc', '-'],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=300)
+    time_base = 1.0
+    entries = []
+    end = None
+    for line in result.stdout.splitlines():
+        if line.startswith('#tb 0:'):
+            num, den = line.split(':', 1)[1].strip().split('/')
+            time_base = int(num) / int(den)
+            continue
+        if line.startswith('#'):
+            continue
+        fields = [f.strip() for f in line.split(',')]
+        if len(fields) < 6 or fields[0] != '0':
+            continue
+        pts = int(fields[2]) * time_base
+        end = max(end or pts, pts + int(fields[3]) * time_base)
+        # framecrc 只给非关键包加 F= 标志
+        if not any(f.startswith('F=') for f in fields[6:]):
+            entries.append((pts, -1))
+    return entries, end
+
+
+def build_index(path):
+    """扫描文件建立关键帧索引（不读缓存）"""
+    if path.lower().endswith('.ts'):
+        entries, end = _scan_ts(path)
+    else:
+        entries, end = _scan_ffmpeg(path)
+    if not entries:
+        return np.zeros(1, INDEX_DTYPE)
+    index = np.array(entries + [(end if end is not None else entries[-1][0],
+                                 os.path.getsize(path))], INDEX_DTYPE)
+    # PTS 改为相对第一个关键帧，与 ffmpeg -ss 的计时起点一致
+    index['pts'] -= index['pts'][0]
+    return index
+
+
+def load_index(path):
+    """读取关键帧索引：缓存比文件新时直接 mmap，否则重建并写入缓存"""
+    cache = index_path(path)
+    try:
+        if os.path.getmtime(cache) >= os.path.getmtime(path):
+            return np.load(cache, mmap_mode='r')
+    except (OSError, ValueError):
+        pass
+    index = build_index(path)
+    try:
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        tmp = cache + '.tmp.npy'
+        np.save(tmp, index)
+        os.replace(tmp, cache)
+    except OSError as e:
+        print("写关键帧索引失败:", e)
+    return index
+
+
+def keyframe_at(index, t):
+    """t 秒处（含）之前最近的关键帧下标"""
+    keys = index['pts'][:-1]
+    return max(0, int(np.searchsorted(keys, t, side='right')) - 1)
+
+
+def segment_start(path):
+    """从录像文件名（name_YYYYmmdd_HHMMSS.ts）解析开始时间；不符合时返回 None"""
+    match = _STAMP.search(os.path.basename(path))
+    if not match:
+        return None
+    return time.mktime(time.strptime(match.group(1), '%Y%m%d_%H%M%S'))
+
+
+class RecordingCatalog:
+    """一个目录（或单个文件）下的录像段，按时间首尾相接成一条时间轴"""
+
+    EXTENSIONS = ('.ts', '.mp4', '.mkv', '.flv', '.mov')
+
+    def __init__(self, source, prefix=None):
+        if os.path.isdir(source):
+            names = sorted(n for n in os.listdir(source)
+                           if n.lower().endswith(self.EXTENSIONS)
+                           and (prefix is None or n.startswith(prefix + '_')))
+            self.paths = [os.path.join(source, n) for n in names]
+        else:
+            self.paths = [source]
+        self.indexes = [load_index(p) for p in self.paths]
+        durations = [float(ix['pts'][-1]) for ix in self.indexes]
+        self.starts = np.concatenate(([0.0], np.cumsum(durations)))
+        self.duration = float(self.starts[-1])
+
+    def __len__(self):
+        return len(self.paths)
+
+    def locate(self, t):
+        """时间轴位置 -> (段号, 段内秒数)"""
+        t = min(max(t, 0.0), self.duration)
+        seg = min(int(np.searchsorted(self.starts, t, side='right')) - 1, len(self.paths) - 1)
+        return seg, t - self.starts[seg]
+
+    def seek(self, t):
+        """时间轴位置 -> (文件, 段内关键帧秒数, 该关键帧在时间轴上的位置)"""
+        seg, offset = self.locate(t)
+        index = self.indexes[seg]
+        key_pts = float(index['pts'][keyframe_at(index, offset)])
+        return self.paths[seg], key_pts, float(self.starts[seg] + key_pts)
+
+    def keyframe_times(self):
+        """所有关键帧在时间轴上的位置"""
+        return np.concatenate([start + ix['pts'][:-1]
+                               for start, ix in zip(self.starts, self.indexes)])
+
+    def wall_time(self, t):
+        """时间轴位置对应的录制时刻（文件名带时间时），否则返回 None"""
+        seg, offset = self.locate(t)
+        start = segment_start(self.paths[seg])
+        return None if start is None else start + offset
+
+
+def grab_frame(path, pts, width, height):
+    """从 pts（应为关键帧）处解出一帧，按 width x height 输出 RGB；失败返回 None
+
+    -ss 放在 -i 之前由解复用器直接跳到关键帧，只解这一帧。
+    """
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-ss', f'{pts:.3f}', '-i', path,
+           '-frames:v', '1', '-s', f'{width}x{height}',
+           '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-']
+    frame = np.empty((height, width, 3), np.uint8)
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        view = memoryview(frame).cast('B')
+        got = read_exact(proc.stdout, view)
+        view.release()
+    finally:
+        proc.stdout.close()
+        proc.wait()
+    return frame if got == frame.nbytes else None
+
+
+def playback_input_args(pts):
+    """回放会话的输入参数：从关键帧开始按原速读取"""
+    return ['-ss', f'{pts:.3f}', '-re']
+
+
+class ThumbnailCache:
+    """时间轴缩略图：按 (文件, 关键帧时间, 尺寸) 缓存，超过上限时淘汰最久未用的"""
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize or config.PLAYBACK_THUMBNAIL_CACHE
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, pts, width, height):
+        key = (path, round(pts, 3), width, height)
+        with self._lock:
+            frame = self._items.get(key)
+            if frame is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return frame
+        self.misses += 1
+        frame = grab_frame(path, pts, width, height)
+        if frame is not None:
+            with self._lock:
+                self._items[key] = frame
+                while len(self._items) > self.maxsize:
+                    self._items.popitem(last=False)
+        return frame
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
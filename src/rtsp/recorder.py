@@ -0,0 +1,227 @@
+"""录像旁路：接收解码会话以 -c copy 复制出的 MPEG-TS 码流，按时间分段写盘
+
+拉流的 ffmpeg 进程除了输出原始帧，还把视频码流原样复用为 TS 推到本地端口（见
+ffmpeg_cmd.record_output_args），不再单独连接摄像机，也不重新解码或编码。
+旁路线程一直接收并丢弃数据，只保留当前 GOP；开始录像时先写入节目表和当前 GOP，
+之后每段在到时后的第一个关键帧处切分，单个文件可以独立播放。
+"""
+import os
+import socket
+import threading
+import time
+
+from rtsp.mpegts import PACKET_SIZE, SYNC_BYTE, TSScanner, as_packets
+from rtsp.playback import index_path
+from utils import config
+from utils.metrics import registry as metrics
+
+CHUNK_PACKETS = 348             # 每次接收约 64KB
+GOP_LIMIT = 32 * 1024 * 1024    # 关键帧间隔异常长时，GOP 缓存的上限
+
+
+class RecordingTap(threading.Thread):
+    """录像旁路：监听本地端口，ffmpeg 每次（重）连接算一个会话"""
+
+    def __init__(self, directory=None, name='main', segment_seconds=None, retention_mb=None):
+        super().__init__(name=f'record-{name}', daemon=True)
+        self.directory = directory or config.RECORD_DIR
+        self.prefix = name
+        self.segment_seconds = segment_seconds or config.RECORD_SEGMENT_SECONDS
+        self.retention_bytes = (retention_mb or config.RECORD_RETENTION_MB) * 1024 * 1024
+        self.server = socket.socket()
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(4)
+        self.url = f'tcp://127.0.0.1:{self.server.getsockname()[1]}'
+        self._lock = threading.Lock()
+        self._conn = None
+        self._scanner = None
+        self._gop = []
+        self._gop_bytes = 0
+        self._file = None
+        self._segment_started = 0.0
+        self._wanted = False
+        self._closed = False
+        self.path = None            # 当前录像文件
+        self.bytes_received = 0
+        self.bytes_written = 0
+        self.segments = 0
+
+    @property
+    def recording(self):
+        return self._wanted
+
+    def start_recording(self):
+        """开始录像：已经收到过关键帧时立即从当前 GOP 开始写，否则等下一个关键帧"""
+        with self._lock:
+            if self._wanted:
+                return
+            self._wanted = True
+            if self._gop and self._scanner and self._scanner.ready:
+                self._open_segment(preroll=True)
+
+    def stop_recording(self):
+        with self._lock:
+            self._wanted = False
+            self._close_segment()
+
+    def run(self):
+        while not self._closed:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            self._conn = conn
+            try:
+                self._session(conn)
+            except OSError as e:
+                if not self._closed:
+                    print("录像旁路连接中断:", e)
+            finally:
+                conn.close()
+                self._conn = None
+                # 会话结束（ffmpeg 重启）时结束当前段，新会话从第一个关键帧开新段
+                with self._lock:
+                    self._close_segment()
+                    self._gop = []
+                    self._gop_bytes = 0
+
+    def _session(self, conn):
+        self._scanner = TSScanner()
+        buf = bytearray(PACKET_SIZE * CHUNK_PACKETS)
+        view = memoryview(buf)
+        pending = 0  # buf 开头尚未凑满一个包的字节数
+        while not self._closed:
+            n = conn.recv_into(view[pending:])
+            if not n:
+                return
+            self.bytes_received += n
+            size = pending + n
+            start = 0
+            if buf[0] != SYNC_BYTE:
+                # 本地 TCP 不会丢字节，只在意外错位时重新对齐
+                start = buf.find(bytes([SYNC_BYTE]), 0, size)
+                if start < 0:
+                    pending = 0
+                    continue
+            usable = (size - start) // PACKET_SIZE * PACKET_SIZE
+            if usable:
+                self._feed(bytes(view[start:start + usable]))
+            pending = size - start - usable
+            buf[:pending] = buf[start + usable:size]
+
+    def _feed(self, data):
+        keys = self._scanner.scan(as_packets(data))
+        bounds = [0] + [int(k) for k in keys if k > 0] + [len(data) // PACKET_SIZE]
+        first_is_key = len(keys) > 0 and keys[0] == 0
+        with self._lock:
+            for i, (a, b) in enumerate(zip(bounds, bounds[1:])):
+                self._piece(data[a * PACKET_SIZE:b * PACKET_SIZE], i > 0 or first_is_key)
+
+    def _piece(self, piece, key):
+        """处理一段连续的包；key 表示这段以视频关键帧开头"""
+        if key:
+            self._gop = [piece]
+            self._gop_bytes = len(piece)
+            if self._file is not None and \
+                    time.time() - self._segment_started >= self.segment_seconds:
+                self._close_segment()
+            if self._wanted and self._file is None and self._scanner.ready:
+                self._open_segment(preroll=False)
+        elif self._gop and self._gop_bytes < GOP_LIMIT:
+            self._gop.append(piece)
+            self._gop_bytes += len(piece)
+        if self._file is not None:
+            self._write(piece)
+
+    def _open_segment(self, preroll):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory,
+                            f"{self.prefix}_{time.strftime('%Y%m%d_%H%M%S')}")
+        path = base + '.ts'
+        suffix = 1
+        while os.path.exists(path):
+            path = f'{base}_{suffix}.ts'
+            suffix += 1
+        try:
+            self._file = open(path, 'wb')
+        except OSError as e:
+            print("无法创建录像文件:", e)
+            self._wanted = False
+            return
+        self.path = path
+        self._segment_started = time.time()
+        self.segments += 1
+        metrics.incr(self.prefix, 'record_segments')
+        self._write(self._scanner.headers())
+        if preroll:
+            for piece in self._gop:
+                self._write(piece)
+
+    def _write(self, data):
+        try:
+            self._file.write(data)
+        except OSError as e:
+            print("写录像失败，停止录像:", e)
+            self._wanted = False
+            self._close_segment()
+            return
+        self.bytes_written += len(data)
+        metrics.incr(self.prefix, 'record_bytes', len(data))
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        try:
+            self._file.close()
+        except OSError as e:
+            print("关闭录像文件失败:", e)
+        self._file = None
+        self.enforce_retention()
+
+    def enforce_retention(self):
+        """目录内本路录像总大小超过上限时从最旧的段开始删除（不删正在写的段）"""
+        try:
+            names = sorted(n for n in os.listdir(self.directory)
+                           if n.startswith(self.prefix + '_') and n.endswith('.ts'))
+        except OSError:
+            return
+        files = []
+        for n in names:
+            path = os.path.join(self.directory, n)
+            try:
+                files.append((path, os.path.getsize(path)))
+            except OSError:
+                pass
+        total = sum(size for _, size in files)
+        for path, size in files:
+            if total <= self.retention_bytes:
+                break
+            if self._file is not None and path == self.path:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                print("删除旧录像失败:", e)
+                continue
+            try:
+                os.remove(index_path(path))  # 回放用的关键帧索引
+            except OSError:
+                pass
+
+    def close(self):
+        self._closed = True
+        self.stop_recording()
+        try:
+            # Linux 上只 close 不会唤醒阻塞在 accept 的线程
+            self.server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.server.close()
+        conn = self._conn
+        if conn is not None:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.join(timeout=2)
@@ -0,0 +1,403 @@
+"""预连接会话池：收藏的流和最近用过的流保持连接，只解复用不解码，切换时立即提升为解码会话
+
+预连接会话用 ffmpeg -c copy 把视频码流以 Annex B 基本流输出到管道，几乎不占 CPU。
+Python 侧按参数集（H.264 SPS / HEVC VPS，关键帧前都会带上）切分 GOP，始终保留最近一个 GOP。
+提升时新建的解码 ffmpeg 从标准输入读取：先收到缓存的 GOP，立即从关键帧开始出帧，
+之后接着收到实时码流，不再经过 RTSP 握手和等待关键帧。
+
+每个地址只连接摄像机一次，正在显示的解码会话也经由预连接会话取流：断线后预连接会话按
+指数退避重连，解码会话保持不变，画面停在最后一帧直到码流恢复。
+
+不用 MPEG-TS 转发：基本流切 GOP 只需找起始码，也不依赖解码端的 TS 解复用器。
+基本流没有封装信息，编码以预连接 ffmpeg 打印的输入流信息为准：与预设不同就按实际编码
+重连，不是 H.264/HEVC 时 StandbyPool.open() 改为直接连接。
+
+录像旁路也由预连接 ffmpeg 提供：它同时把带时间戳的视频复用为 TS 推到本会话监听的端口，
+本会话是主画面时把整包转发给 RecordingTap，否则丢弃。切换主画面只改转发目标，不用重连。
+"""
+import re
+import socket
+import subprocess
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from rtsp.ffmpeg_cmd import RTSP_INPUT_ARGS, build_demux_cmd, elementary_input_args, \
+    latency_input_args
+from rtsp.mpegts import PACKET_SIZE
+from rtsp.stream_handler import StreamHandler
+from utils import config
+from utils.metrics import registry as metrics
+
+CHUNK_SIZE = 65536
+RECORD_CHUNK = PACKET_SIZE * 348  # 转发录像旁路时每次接收约 64KB 的整包
+GOP_LIMIT = 32 * 1024 * 1024  # 关键帧间隔异常长时，GOP 缓存的上限
+CODECS = ('h264', 'hevc')  # 能切分 GOP、以基本流转发的编码
+
+# ffmpeg 输入流信息：  Stream #0:0[0x1](und): Video: hevc (Main) ...
+_VIDEO_STREAM = re.compile(rb'Stream #\d+:\d+\S*: Video: (\w+)')
+
+
+def gop_starts(data, codec='h264'):
+    """data 中每个 GOP 的起始位置（参数集 NAL 的起始码处），只认 NAL 头字节也在 data 内的"""
+    arr = np.frombuffer(data, np.uint8)
+    if arr.size < 4:
+        return []
+    starts = np.flatnonzero((arr[:-3] == 0) & (arr[1:-2] == 0) & (arr[2:-1] == 1))
+    header = arr[starts + 3]
+    if codec == 'hevc':
+        starts = starts[((header >> 1) & 0x3f) == 32]  # VPS
+    else:
+        starts = starts[(header & 0x1f) == 7]  # SPS
+    # 四字节起始码 00 00 00 01 从前面的零字节算起
+    starts = starts - ((starts > 0) & (arr[np.maximum(starts - 1, 0)] == 0))
+    return starts.tolist()
+
+
+class StandbySession(threading.Thread):
+    """一路预连接：ffmpeg 只解复用，保留最近一个 GOP，并把码流转发给已接入的解码会话"""
+
+    def __init__(self, url, codec=None, input_args=RTSP_INPUT_ARGS, transport=None,
+                 latency_mode=None, record=None):
+        super().__init__(name=f'standby-{url}', daemon=True)
+        self.url = url
+        self.codec = codec or config.STREAM_CODEC
+        self.base_args = list(input_args)
+        self.transport = transport or config.RTSP_TRANSPORT
+        # 解码端从管道读，低延迟的输入参数只能加在连接摄像机的这一端
+        self.latency_mode = latency_mode or config.LATENCY_MODE
+        self.proc = None
+        self._lock = threading.Lock()
+        self._gop = []
+        self._gop_bytes = 0
+        self._sinks = []
+        self._stop_event = threading.Event()
+        self._restart = False
+        self.probed = threading.Event()  # 已从 ffmpeg 输出确认视频编码
+        self.supported = True  # 编码不是 H.264/HEVC 时为 False，不再重连
+        self.reconnects = 0
+        self.bytes_received = 0
+        self.updated_at = 0.0
+        # 录像旁路：ffmpeg 推 TS 到 _record_server，转发给 record_target（RecordingTap.url）
+        self._record_server = None
+        self._record_lock = threading.Lock()
+        self._record_sink = None
+        self.record_target = None
+        if config.RECORD_TAP if record is None else record:
+            self._record_server = socket.socket()
+            self._record_server.bind(('127.0.0.1', 0))
+            self._record_server.listen(1)
+            threading.Thread(target=self._record_loop, name=f'standby-record-{url}',
+                             daemon=True).start()
+
+    @property
+    def input_args(self):
+        return self.base_args + latency_input_args(self.url, self.latency_mode, self.transport)
+
+    @property
+    def can_record(self):
+        return self._record_server is not None
+
+    @property
+    def ready(self):
+        """已缓存一个完整起始的 GOP，接入后能立即出帧"""
+        return bool(self._gop)
+
+    @property
+    def attached(self):
+        return bool(self._sinks)
+
+    def attach(self, sink):
+        """接入解码 ffmpeg 的标准输入：先写入缓存的 GOP，之后转发实时码流"""
+        with self._lock:
+            try:
+                for piece in self._gop:
+                    sink.write(piece)
+                sink.flush()
+            except (OSError, ValueError):
+                return
+            self._sinks.append(sink)
+
+    def detach(self, sink):
+        with self._lock:
+            if sink in self._sinks:
+                self._sinks.remove(sink)
+
+    def set_latency_mode(self, mode):
+        """延迟模式变化时用新的输入参数立即重连"""
+        if mode != self.latency_mode:
+            self.latency_mode = mode
+            self.restart()
+
+    def restart(self):
+        """结束当前 ffmpeg，按当前参数立即重连（不计入断线重连）"""
+        self._restart = True
+        proc = self.proc
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+
+    def run(self):
+        backoff = 1.0
+        while not self._stop_event.is_set():
+            record_url = None
+            if self._record_server is not None:
+                record_url = 'tcp://127.0.0.1:%d' % self._record_server.getsockname()[1]
+            self.proc = subprocess.Popen(build_demux_cmd(self.url, self.codec, self.input_args,
+                                                         record_url),
+                                         stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                         stderr=subprocess.PIPE)
+            probe = threading.Thread(target=self._probe, args=(self.proc,), daemon=True)
+            probe.start()
+            try:
+                received = self._pump(self.proc.stdout)
+            except (OSError, ValueError):
+                received = 0
+            finally:
+                if self.proc.poll() is None:
+                    self.proc.terminate()
+                self.proc.wait()
+            # 编码不符时 ffmpeg 打印完流信息就退出，等识别结果出来再决定是否立即重连
+            probe.join(timeout=1)
+            with self._lock:
+                # 断线前的 GOP 已经过时，重连后从新的关键帧开始
+                self._gop = []
+                self._gop_bytes = 0
+            if self._stop_event.is_set() or not self.supported:
+                break
+            if self._restart:
+                self._restart = False
+                continue
+            # 连上过就从 1 秒重新开始退避
+            delay = 1.0 if received else backoff
+            backoff = 1.0 if received else min(backoff * 2, config.RECONNECT_MAX_DELAY)
+            self.reconnects += 1
+            metrics.incr('standby', 'reconnects')
+            print(f"预连接断开，{delay:.0f}s 后重连: {self.url}")
+            self._stop_event.wait(delay)
+
+    def _probe(self, proc):
+        """读完 ffmpeg 的标准错误，从输入流信息中确认视频编码；与当前不同时按实际编码重连"""
+        for line in proc.stderr:
+            if self.probed.is_set():
+                continue
+            match = _VIDEO_STREAM.search(line)
+            if match is None:
+                continue
+            codec = match.group(1).decode()
+            if codec not in CODECS:
+                print(f"预连接不支持 {codec} 编码: {self.url}")
+                self.supported = False
+                self.probed.set()
+                self.close()
+            elif codec != self.codec:
+                print(f"预连接识别到 {codec} 编码，重连: {self.url}")
+                self.codec = codec
+                self.restart()
+            else:
+                self.probed.set()
+
+    def _pump(self, stdout):
+        tail = b''  # 末尾可能是被截断的起始码，留到下一批再判断
+        received = 0
+        while not self._stop_event.is_set():
+            data = stdout.read1(CHUNK_SIZE)
+            if not data:
+                break
+            received += len(data)
+            self.bytes_received += len(data)
+            self.updated_at = time.time()
+            buf = tail + data
+            limit = len(buf) - 3
+            cuts = gop_starts(buf, self.codec)
+            bounds = [0] + [c for c in cuts if c > 0] + [limit]
+            first_is_key = bool(cuts) and cuts[0] == 0
+            for i, (a, b) in enumerate(zip(bounds, bounds[1:])):
+                if b > a:
+                    self._piece(buf[a:b], i > 0 or first_is_key)
+            tail = buf[max(limit, 0):]
+        return received
+
+    def _piece(self, piece, key):
+        """处理一段连续的码流；key 表示这段以 GOP 开头"""
+        with self._lock:
+            if key:
+                self._gop = [piece]
+                self._gop_bytes = len(piece)
+            elif not self._gop:
+                return  # 第一个关键帧之前的数据没法解码
+            elif self._gop_bytes < GOP_LIMIT:
+                self._gop.append(piece)
+                self._gop_bytes += len(piece)
+            sinks = list(self._sinks)
+        # 在锁外写：解码端暂时读得慢也不会挡住 attach/detach
+        for sink in sinks:
+            try:
+                sink.write(piece)
+                sink.flush()
+            except (OSError, ValueError):
+                self.detach(sink)
+
+    def record_to(self, url):
+        """把录像旁路的 TS 转发给 url（RecordingTap.url）；None 停止转发"""
+        with self._record_lock:
+            if url == self.record_target:
+                return
+            if self._record_sink is not None:
+                # 断开后录像旁路结束当前段，再接受下一路的连接
+                self._record_sink.close()
+                self._record_sink = None
+            self.record_target = None
+            if url is None or self._record_server is None:
+                return
+            host, port = url[len('tcp://'):].rsplit(':', 1)
+            try:
+                self._record_sink = socket.create_connection((host, int(port)), timeout=2)
+            except OSError as e:
+                print("无法连接录像旁路:", e)
+                return
+            self.record_target = url
+
+    def _record_loop(self):
+        """接受 ffmpeg 的 TS 连接（每次重连一个），只按整包转发，录像旁路不会错位"""
+        while not self._stop_event.is_set():
+            try:
+                conn, _ = self._record_server.accept()
+            except OSError:
+                return
+            buf = bytearray(RECORD_CHUNK)
+            view = memoryview(buf)
+            pending = 0
+            try:
+                while True:
+                    n = conn.recv_into(view[pending:])
+                    if not n:
+                        break
+                    size = pending + n
+                    usable = size // PACKET_SIZE * PACKET_SIZE
+                    if usable:
+                        self._forward_record(view[:usable])
+                    pending = size - usable
+                    buf[:pending] = buf[usable:size]
+            except OSError:
+                pass
+            finally:
+                conn.close()
+
+    def _forward_record(self, data):
+        with self._record_lock:
+            sink = self._record_sink
+            if sink is None:
+                return
+            try:
+                sink.sendall(data)
+            except OSError as e:
+                print("录像旁路转发中断:", e)
+                sink.close()
+                self._record_sink = None
+                self.record_target = None
+
+    def close(self):
+        self._stop_event.set()
+        self.record_to(None)
+        if self._record_server is not None:
+            self._record_server.close()
+        proc = self.proc
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+
+
+class StandbyPool:
+    """预连接池：收藏的流常驻，其余按最近使用保留 size 路；open() 经预连接会话打开解码会话"""
+
+    def __init__(self, size=None, favourites=None, codec=None, input_args=RTSP_INPUT_ARGS,
+                 record=None):
+        self.size = config.STANDBY_POOL_SIZE if size is None else size
+        self.record = config.RECORD_TAP if record is None else record  # 预连接带录像旁路
+        self.favourites = list(config.STANDBY_FAVOURITES if favourites is None else favourites)
+        self.codec = codec or config.STREAM_CODEC
+        self.input_args = input_args  # 连接摄像机（预连接 ffmpeg）的输入参数
+        self._sessions = OrderedDict()  # 地址 -> StandbySession，最近使用的在末尾
+        self._lock = threading.Lock()
+        self.switches = deque(maxlen=100)  # (地址, 是否已就绪, 出首帧秒数)
+        for url in self.favourites:
+            self.warm(url)
+
+    def __contains__(self, url):
+        return url in self._sessions
+
+    def warm(self, url, latency_mode=None):
+        """确保 url 有一路预连接，并记为最近使用；延迟模式不同时按新模式重连"""
+        latency_mode = latency_mode or config.LATENCY_MODE
+        with self._lock:
+            session = self._sessions.get(url)
+            if session is None:
+                session = StandbySession(url, self.codec, self.input_args,
+                                         latency_mode=latency_mode, record=self.record)
+                session.start()
+                self._sessions[url] = session
+            else:
+                session.set_latency_mode(latency_mode)
+            self._sessions.move_to_end(url)
+            self._evict(keep=url)
+        return session
+
+    def _evict(self, keep=None):
+        """非收藏、未在显示的预连接超过 size 路时，从最久未用的开始关闭"""
+        spare = [url for url, s in self._sessions.items()
+                 if url not in self.favourites and url != keep and not s.attached]
+        for url in spare[:max(len(spare) - self.size, 0)]:
+            self._sessions.pop(url).close()
+
+    def open(self, url, width, height, record_url=None, **kwargs):
+        """打开并启动 url 的解码会话（参数同 StreamHandler），首帧耗时在后台记录
+
+        解码端读的基本流没有时间戳，record_url 交给预连接转发（见 StandbySession.record_to）。
+        预连接在 STANDBY_PROBE_TIMEOUT 内没能确认编码、编码不支持，或需要录像但预连接
+        没带录像旁路时，直接连接 url。
+        """
+        start = time.perf_counter()
+        session = self.warm(url, kwargs.get('latency_mode'))
+        if not session.probed.wait(config.STANDBY_PROBE_TIMEOUT) or not session.supported \
+                or (record_url and not session.can_record):
+            print(f"预连接不可用，直接连接: {url}")
+            metrics.incr('standby', 'fallbacks')
+            handler = StreamHandler(url, width, height, input_args=self.input_args,
+                                    record_url=record_url, **kwargs)
+            handler.start_stream()
+            return handler
+        if record_url:
+            # 录像旁路同一时间只接一路：先断开之前转发给它的预连接
+            for other in list(self._sessions.values()):
+                if other is not session and other.record_target == record_url:
+                    other.record_to(None)
+            session.record_to(record_url)
+        ready = session.ready
+        handler = StreamHandler('pipe:0', width, height, input_args=elementary_input_args(
+            session.codec), feed=session, **kwargs)
+        handler.start_stream()
+        threading.Thread(target=self._measure, args=(handler, url, ready, start),
+                         daemon=True).start()
+        return handler
+
+    def _measure(self, handler, url, ready, start):
+        deadline = start + config.STANDBY_SWITCH_TIMEOUT
+        while time.perf_counter() < deadline:
+            queue = handler.queue
+            if queue is None:
+                return
+            if queue.seq:
+                cost = time.perf_counter() - start
+                self.switches.append((url, ready, cost))
+                metrics.observe('standby', 'switch_warm' if ready else 'switch_cold', cost)
+                print(f"切换到 {url}: {'预连接' if ready else '冷启动'}，"
+                      f"{cost * 1000:.0f} ms 出首帧")
+                return
+            time.sleep(0.005)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
@@ -1,15 +1,218 @@
+import asyncio
+import subprocess
+import time
+
+import numpy as np
+
+from rtsp.decoder import mark_failed, select_backend
+from rtsp.ffmpeg_cmd import (RTSP_INPUT_ARGS, build_decode_cmd, build_overlay_cmd,
+                             frame_shape, latency_input_args, record_output_args, spawn)
+from rtsp.frame_reader import FramePool, FrameQueue, FrameReader
+from utils import config
+from utils.colorspace import YUV_FORMATS, negotiate_pix_fmt
+from utils.metrics import registry as metrics
+
+
 class StreamHandler:
-    def __init__(self, rtsp_url):
+    """拉流引擎：一个 ffmpeg 解码会话 + 独立读帧线程 + 有界帧队列
+
+    取帧方式：
+        read()/take() 取一帧（所有权交给调用方，用完调用 release 归还）
+        for frame in handler.frames(): ...        生成器，帧在下一次迭代时自动归还
+        async for frame in handler: ...           异步迭代，语义同上
+    需要长期保留某帧时请自行 copy。
+
+    pix_fmt 可以是具体格式，也可以是消费方能接受的格式列表，由 negotiate_pix_fmt
+    按 PIPE_PIX_FMTS 的顺序选定；选定的格式见 self.pix_fmt。
+    """
+
+    def __init__(self, rtsp_url, width=640, height=360, pix_fmt='rgb24', fps=15,
+                 role='main', queue_size=1, policy='drop_oldest', name=None,
+                 overlay_url=None, overlay_ratio=3, overlay_margin=10,
+                 decoder_args=None, input_args=RTSP_INPUT_ARGS, latency_mode=None,
+                 transport=None, record_url=None, feed=None):
         self.rtsp_url = rtsp_url
-        self.capture = None
+        self.pix_fmt = negotiate_pix_fmt(pix_fmt)
+        if self.pix_fmt in YUV_FORMATS:
+            # 4:2:0 两行两列共用一个色度样本，输出尺寸取偶数帧长才是 宽*高*1.5
+            width, height = width & ~1, height & ~1
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.role = role
+        self.queue_size = queue_size
+        self.policy = policy
+        self.name = name or role
+        self.overlay_url = overlay_url  # 设置后由 ffmpeg 在滤镜图中叠加画中画
+        self.overlay_ratio = overlay_ratio
+        self.overlay_margin = overlay_margin
+        self.decoder_args = decoder_args  # None 表示自动选择解码后端
+        self.input_args = input_args
+        # 'low' 时不缓冲、少探测，并按源帧率直通输出（忽略 fps）；None 取配置
+        self.latency_mode = latency_mode or config.LATENCY_MODE
+        self.transport = transport or config.RTSP_TRANSPORT
+        self.record_url = record_url  # 设置后同一会话把压缩码流复制一份给录像旁路
+        # 预连接会话（standby.StandbySession）：设置后 ffmpeg 从标准输入读它转发的码流
+        self.feed = feed
+        self.shape = frame_shape(self.pix_fmt, width, height)
+        self.frame_bytes = int(np.prod(self.shape))  # 管道中每帧的字节数
+        self.pool = FramePool(self.shape)
+        self.queue = None
+        self.proc = None
+        self.reader = None
+        self.backend = None
+        self.started = 0.0
+        self.restarts = 0
+
+    def build_cmd(self):
+        """本会话的 ffmpeg 命令（同时按需选择解码后端）"""
+        codec = config.STREAM_CODEC
+        if self.decoder_args is not None:
+            decoder_args = pip_decoder_args = self.decoder_args
+        else:
+            self.backend = select_backend(codec, self.role)
+            decoder_args = self.backend.input_args(codec, self.role)
+            pip_decoder_args = select_backend(codec, 'pip').input_args(codec, 'pip')
+        input_args = list(self.input_args) + latency_input_args(
+            self.rtsp_url, self.latency_mode, self.transport)
+        fps = None if self.low_latency else self.fps
+        if self.overlay_url:
+            pip_w = self.width // self.overlay_ratio
+            pip_h = self.height // self.overlay_ratio
+            cmd = build_overlay_cmd(self.rtsp_url, self.overlay_url, self.width, self.height,
+                                    pip_w, pip_h, margin=self.overlay_margin, fps=fps,
+                                    decoder_args=decoder_args, input_args=input_args,
+                                    pip_decoder_args=pip_decoder_args, pix_fmt=self.pix_fmt)
+        else:
+            cmd = build_decode_cmd(self.rtsp_url, self.width, self.height, fps=fps,
+                                   decoder_args=decoder_args, input_args=input_args,
+                                   pix_fmt=self.pix_fmt)
+        if self.record_url:
+            cmd += record_output_args(self.record_url)
+        return cmd
+
+    @property
+    def low_latency(self):
+        return self.latency_mode == 'low'
 
     def start_stream(self):
-        import cv2
-        self.capture = cv2.VideoCapture(self.rtsp_url)
-        if not self.capture.isOpened():
-            raise Exception("Could not open RTSP stream")
+        if self.reader is not None:
+            return
+        self.queue = FrameQueue(self.queue_size, self.policy)
+        self.proc = spawn(self.build_cmd(), self.frame_bytes,
+                          stdin=subprocess.PIPE if self.feed else None)
+        self.reader = FrameReader(self.proc, self.shape, self.queue, pool=self.pool,
+                                  name=self.name)
+        self.reader.start()
+        if self.feed:
+            # 读帧线程先启动，写入缓存 GOP 时 ffmpeg 的输出不会堵住
+            self.feed.attach(self.proc.stdin)
+        self.started = time.time()
 
     def stop_stream(self):
-        if self.capture is not None:
-            self.capture.release()
-            self.capture = None
\ No newline at end of file
+        if self.reader is None:
+            return
+        self.reader.stop()
+        try:
+            self.proc.terminate()
+            self.proc.wait(timeout=2)
+        except Exception:
+            self.proc.kill()
+        if self.feed:
+            # ffmpeg 退出后再摘下，转发线程不会阻塞在写满的管道上
+            self.feed.detach(self.proc.stdin)
+            try:
+                self.proc.stdin.close()
+            except OSError:
+                pass
+        for frame in self.queue.drain():
+            self.pool.release(frame)
+        print(f"{self.name} 丢帧数: {self.queue.dropped}, "
+              f"缓冲分配: {self.pool.allocations} 次 / {self.pool.allocated_bytes} 字节, "
+              f"管道 {self.pix_fmt} {self.frame_bytes / 1024:.0f} KB/帧 × {self.reader.frames} 帧")
+        self.reader = None
+        self.proc = None
+
+    def restart(self):
+        """重建 ffmpeg 会话；一帧都没出就退出的，多半是硬件解码不可用，换下一个后端"""
+        if self.reader is not None and self.queue.seq == 0 and not self.reader.alive \
+                and self.backend is not None:
+            mark_failed(self.backend)
+        self.stop_stream()
+        self.restarts += 1
+        metrics.incr(self.name, 'restarts')
+        self.start_stream()
+
+    @property
+    def alive(self):
+        return self.reader is not None and self.reader.alive
+
+    def stalled(self, timeout):
+        """读帧线程已退出，或超过 timeout 秒没有新帧"""
+        if not self.alive:
+            return True
+        last = self.queue.updated_at or self.started
+        return time.time() - last > timeout
+
+    @property
+    def dropped(self):
+        return self.queue.dropped if self.queue else 0
+
+    def take(self):
+        """非阻塞取帧，没有新帧时返回 None"""
+        return self.queue.take() if self.queue else None
+
+    def wait(self, timeout=None):
+        """等待新帧到达（不取走），有帧时返回 True"""
+        return self.queue.wait(timeout) if self.queue else False
+
+    def read(self, timeout=None):
+        """阻塞取帧；超时或流结束时返回 None"""
+        return self.queue.get(timeout) if self.queue else None
+
+    def release(self, frame):
+        """归还用完的帧缓冲"""
+        self.pool.release(frame)
+
+    def frames(self, timeout=None):
+        """逐帧生成；流结束（或超时）时停止"""
+        frame = None
+        try:
+            while self.queue is not None:
+                frame = self.read(timeout)
+                if frame is None:
+                    return
+                yield frame
+                self.release(frame)
+                frame = None
+        finally:
+            self.release(frame)
+
+    def __iter__(self):
+        return self.frames()
+
+    async def aframes(self, timeout=None):
+        """异步逐帧生成，阻塞等待放在线程池里，不占用事件循环"""
+        loop = asyncio.get_running_loop()
+        frame = None
+        try:
+            while self.queue is not None:
+                frame = await loop.run_in_executor(None, self.read, timeout)
+                if frame is None:
+                    return
+                yield frame
+                self.release(frame)
+                frame = None
+        finally:
+            self.release(frame)
+
+    def __aiter__(self):
+        return self.aframes()
+
+    def __enter__(self):
+        self.start_stream()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_stream()
+
@@ -0,0 +1,359 @@
+"""无界面服务模式：一路解码，供多个消费方使用（定时快照、MJPEG 预览、转推）
+
+不创建 Tk、不做 ImageTk 转换；每帧最多编码一次 JPEG，由所有预览连接和快照共享。
+
+用法（在 src 目录下）：
+    python -m service.headless rtsp://... --http-port 8080 --snapshot snap.jpg --restream rtsp://127.0.0.1:8554/cam1
+    python -m service.headless rtsp://... --record recordings
+    python -m service.headless rtsp://... --motion --record recordings   # 只在有运动时录像
+"""
+import argparse
+import io
+import json
+import os
+import signal
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image
+
+from rtsp.ffmpeg_cmd import RTSP_INPUT_ARGS
+from rtsp.motion import MotionTap
+from rtsp.recorder import RecordingTap
+from rtsp.stream_handler import StreamHandler
+from utils import config
+
+BOUNDARY = 'mediaplayerframe'
+
+
+class FrameHub:
+    """最新帧中转：解码线程写入，消费方按帧序号等待新帧
+
+    JPEG 按需编码并按帧序号缓存，同一帧不论多少个连接只编码一次。
+    """
+
+    def __init__(self, release, quality=None):
+        self.release = release
+        self.quality = quality or config.HEADLESS_JPEG_QUALITY
+        self._cond = threading.Condition()
+        self._frame = None
+        self._jpeg = None
+        self._jpeg_seq = -1
+        self.seq = 0
+        self.encoded = 0
+        self.closed = False
+
+    def publish(self, frame):
+        with self._cond:
+            old, self._frame = self._frame, frame
+            self.seq += 1
+            self._cond.notify_all()
+        self.release(old)
+
+    def wait(self, after_seq, timeout=None):
+        """等待序号大于 after_seq 的新帧，返回当前序号（超时或关闭时可能不变）"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > after_seq or self.closed, timeout)
+            return self.seq
+
+    def jpeg(self):
+        """当前帧的 JPEG（bytes），没有帧时返回 None"""
+        with self._cond:
+            if self._frame is None:
+                return None
+            if self._jpeg_seq != self.seq:
+                h, w = self._frame.shape[:2]
+                buf = io.BytesIO()
+                Image.frombuffer('RGB', (w, h), self._frame, 'raw', 'RGB', 0, 1).save(
+                    buf, 'JPEG', quality=self.quality)
+                self._jpeg = buf.getvalue()
+                self._jpeg_seq = self.seq
+                self.encoded += 1
+            return self._jpeg
+
+    def copy_into(self, out):
+        """把当前帧复制到 out，返回帧序号（没有帧时返回 0）"""
+        with self._cond:
+            if self._frame is None:
+                return 0
+            np.copyto(out, self._frame)
+            return self.seq
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            frame, self._frame = self._frame, None
+            self._cond.notify_all()
+        self.release(frame)
+
+
+def write_atomic(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class SnapshotWriter(threading.Thread):
+    """每隔 interval 秒把最新帧写成 JPEG 文件（先写临时文件再改名，读取方不会读到半张图）"""
+
+    def __init__(self, hub, path, interval):
+        super().__init__(name='snapshot', daemon=True)
+        self.hub = hub
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            data = self.hub.jpeg()
+            if data:
+                try:
+                    write_atomic(self.path, data)
+                except OSError as e:
+                    print("写快照失败:", e)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class _PreviewHandler(BaseHTTPRequestHandler):
+    hub = None
+
+    def do_GET(self):
+        if self.path.startswith('/snapshot.jpg'):
+            self._send_snapshot()
+        elif self.path in ('/', '/stream.mjpg'):
+            self._send_stream()
+        else:
+            self.send_error(404)
+
+    def _send_snapshot(self):
+        data = self.hub.jpeg()
+        if data is None:
+            self.send_error(503, "no frame yet")
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        seq = 0
+        try:
+            while not self.hub.closed:
+                new_seq = self.hub.wait(seq, timeout=5)
+                if new_seq == seq:
+                    continue
+                seq = new_seq
+                data = self.hub.jpeg()
+                if data is None:
+                    continue
+                self.wfile.write(f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n'
+                                 f'Content-Length: {len(data)}\r\n\r\n'.encode('ascii'))
+                self.wfile.write(data)
+                self.wfile.write(b'\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_preview(hub, port, host='0.0.0.0'):
+    """MJPEG 预览：/stream.mjpg 连续画面，/snapshot.jpg 单张"""
+    handler = type('PreviewHandler', (_PreviewHandler,), {'hub': hub})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='preview-http', daemon=True).start()
+    print(f"MJPEG 预览: http://{host}:{server.server_port}/stream.mjpg")
+    return server
+
+
+class Restreamer(threading.Thread):
+    """把解码后的帧重新编码推出去（如推到 RTSP 服务器），编码跟不上时丢帧而不阻塞解码"""
+
+    def __init__(self, hub, url, width, height, fps, fmt=None):
+        super().__init__(name='restream', daemon=True)
+        self.hub = hub
+        self.url = url
+        self.fps = fps
+        self.buffer = np.empty((height, width, 3), np.uint8)
+        if fmt is None:
+            # 网络地址需要显式指定封装；文件由 ffmpeg 按扩展名判断
+            if url.startswith('rtsp://'):
+                fmt = 'rtsp'
+            elif url.startswith(('udp://', 'tcp://', 'srt://')):
+                fmt = 'mpegts'
+        cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+               '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}',
+               '-r', str(fps), '-i', '-',
+               '-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'zerolatency',
+               '-g', str(fps * 2), '-pix_fmt', 'yuv420p']
+        if fmt:
+            cmd += ['-f', fmt]
+        cmd.append(url)
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.frames = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        seq = 0
+        try:
+            while not self._stop_event.is_set() and not self.hub.closed:
+                new_seq = self.hub.wait(seq, timeout=1)
+                if new_seq == seq:
+                    continue
+                # 复制出来再写管道，编码器阻塞时不占用中转锁
+                seq = self.hub.copy_into(self.buffer)
+                self.proc.stdin.write(memoryview(self.buffer).cast('B'))
+                self.frames += 1
+        except (BrokenPipeError, OSError, ValueError) as e:
+            print("转推中断:", e)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=2)
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=2)
+        except Exception:
+            self.proc.kill()
+
+
+class HeadlessService:
+    """一路解码 + 若干消费方"""
+
+    def __init__(self, url, width, height, fps=None, snapshot=None, snapshot_interval=None,
+                 http_port=None, restream=None, input_args=RTSP_INPUT_ARGS, record=None,
+                 motion=False):
+        self.fps = fps or config.DISPLAY_FPS
+        # 录像直接复制解码会话的压缩码流，不另开连接
+        self.recorder = RecordingTap(record, name='headless') if record else None
+        self.handler = StreamHandler(url, width, height, fps=self.fps, name='headless',
+                                     input_args=input_args,
+                                     record_url=self.recorder.url if self.recorder else None)
+        self.hub = FrameHub(self.handler.release)
+        self.snapshot = snapshot
+        self.snapshot_interval = snapshot_interval or config.SNAPSHOT_INTERVAL
+        self.http_port = http_port
+        self.restream = restream
+        self.consumers = []
+        self.server = None
+        self._stop_event = threading.Event()
+        # 开启运动检测时录像由运动事件触发，否则一直录
+        self.motion = MotionTap('headless', on_event=self._on_motion) if motion else None
+
+    def _on_motion(self, event):
+        """运动事件：输出一行 JSON，有录像目录时开始/停止录像"""
+        print(json.dumps({'event': 'motion_' + event['kind'], 'time': event['time'],
+                          'score': round(event['score'], 4),
+                          'regions': [[round(v, 3) for v in r] for r in event['regions']]}),
+              flush=True)
+        if self.recorder:
+            if event['kind'] == 'start':
+                self.recorder.start_recording()
+            else:
+                self.recorder.stop_recording()
+
+    def start(self):
+        if self.motion:
+            self.motion.start()
+        if self.recorder:
+            self.recorder.start()
+            if not self.motion:
+                self.recorder.start_recording()
+        self.handler.start_stream()
+        if self.snapshot:
+            self.consumers.append(SnapshotWriter(self.hub, self.snapshot, self.snapshot_interval))
+        if self.restream:
+            self.consumers.append(Restreamer(self.hub, self.restream, self.handler.width,
+                                             self.handler.height, self.fps))
+        for consumer in self.consumers:
+            consumer.start()
+        if self.http_port is not None:
+            self.server = serve_preview(self.hub, self.http_port)
+
+    def run(self):
+        """解码循环：把新帧交给中转；卡死时重启会话，连续失败时逐次加长重连间隔"""
+        backoff = 1.0
+        while not self._stop_event.is_set():
+            frame = self.handler.read(timeout=1.0)
+            if frame is not None:
+                if self.motion:
+                    self.motion.submit(frame)
+                self.hub.publish(frame)
+                backoff = 1.0
+            elif self.handler.stalled(config.STREAM_STALL_TIMEOUT):
+                print(f"流中断，{backoff:.0f} 秒后重新连接")
+                if self._stop_event.wait(backoff):
+                    break
+                backoff = min(backoff * 2, config.RECONNECT_MAX_DELAY)
+                self.handler.restart()
+
+    def request_stop(self):
+        self._stop_event.set()
+
+    def stop(self):
+        self._stop_event.set()
+        for consumer in self.consumers:
+            consumer.stop()
+        if self.server:
+            self.server.shutdown()
+        self.hub.close()
+        self.handler.stop_stream()
+        if self.motion:
+            self.motion.close()
+        if self.recorder:
+            self.recorder.close()
+        print(f"JPEG 编码 {self.hub.encoded} 次 / 解码 {self.hub.seq} 帧")
+
+
+def build_parser(parser=None):
+    parser = parser or argparse.ArgumentParser(description="无界面拉流服务")
+    parser.add_argument('url', nargs='?', default=None, help="流地址，默认使用界面中的主码流地址")
+    parser.add_argument('--size', default='1280x720', help="解码输出尺寸")
+    parser.add_argument('--fps', type=int, default=config.DISPLAY_FPS)
+    parser.add_argument('--snapshot', help="定时快照文件路径（JPEG）")
+    parser.add_argument('--snapshot-interval', type=float, default=config.SNAPSHOT_INTERVAL)
+    parser.add_argument('--http-port', type=int, help="开启 MJPEG 预览的端口")
+    parser.add_argument('--restream', help="转推地址，如 rtsp://127.0.0.1:8554/cam1")
+    parser.add_argument('--record', metavar='DIR', help="录像目录（按 RECORD_SEGMENT_SECONDS 分段）")
+    parser.add_argument('--motion', action='store_true',
+                        help="运动检测：事件以 JSON 行输出；与 --record 同用时只在有运动时录像")
+    return parser
+
+
+def run(args, default_url=None):
+    url = args.url or default_url
+    if not url:
+        raise SystemExit("请指定流地址")
+    width, height = map(int, args.size.split('x'))
+    service = HeadlessService(url, width, height, fps=args.fps, snapshot=args.snapshot,
+                              snapshot_interval=args.snapshot_interval,
+                              http_port=args.http_port, restream=args.restream,
+                              record=args.record, motion=args.motion)
+    service.start()
+    signal.signal(signal.SIGTERM, lambda *_: service.request_stop())
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+
+
+def main():
+    run(build_parser().parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""管道像素格式协商与 YUV -> RGB 转换
+
+rgb24 每像素 3 字节，yuv420p/nv12 只要 1.5 字节：管道里的数据量减半，ffmpeg 也省去
+swscale 的色彩转换。只看亮度（运动检测）或只缩放的消费方可以直接用 YUV；
+显示时由 YUVConverter 在合成这一步按显示尺寸转换一次，写入输出缓冲。
+
+YUVConverter 与 FrameScaler 接口相同（scale(frame, out)），转换用 BT.601 有限范围，
+与 ffmpeg 默认输出的 rgb24 一致：
+    源尺寸与显示尺寸相同时直接用 Y/U/V 平面；不同时按最近邻预先算好下标，一次 take 取样
+    色度项在 1/4 分辨率上用 int32 算好，转成 int16 后借 uint32 乘 0x10001 横向复制一倍，
+    与亮度相加时按行对广播，全程写入预分配的缓冲，不产生临时数组
+"""
+import time
+
+import numpy as np
+
+from utils import config
+from utils.metrics import registry as metrics
+from utils.scaler import FrameScaler
+
+YUV_FORMATS = ('yuv420p', 'nv12')
+RGB_FORMATS = ('rgb24',)
+# 显示合成能接受的格式：YUV 在合成时转换
+DISPLAY_FORMATS = YUV_FORMATS + RGB_FORMATS
+
+BYTES_PER_PIXEL = {'rgb24': 3, 'bgr24': 3, 'gray': 1, 'yuv420p': 1.5, 'nv12': 1.5}
+
+
+def negotiate_pix_fmt(accepted, preferred=None):
+    """按 PIPE_PIX_FMTS 的优先顺序，选出消费方能接受的第一个管道格式"""
+    if isinstance(accepted, str):
+        return accepted
+    accepted = list(accepted)
+    for pix_fmt in preferred or config.PIPE_PIX_FMTS:
+        if pix_fmt in accepted:
+            return pix_fmt
+    return accepted[0]
+
+
+def frame_size(frame, pix_fmt='rgb24'):
+    """管道帧数组对应的画面 (宽, 高)"""
+    if pix_fmt in YUV_FORMATS:
+        return frame.shape[1], frame.shape[0] * 2 // 3
+    return frame.shape[1], frame.shape[0]
+
+
+def luma(frame):
+    """YUV 帧的亮度平面（视图，不复制）"""
+    return frame[:frame.shape[0] * 2 // 3]
+
+
+def chroma_planes(frame, pix_fmt):
+    """YUV 帧的 U、V 平面，形状均为 (高/2, 宽/2)；nv12 返回交织平面上的跨步视图"""
+    width, height = frame_size(frame, pix_fmt)
+    if pix_fmt == 'nv12':
+        uv = frame[height:].reshape(height // 2, width // 2, 2)
+        return uv[..., 0], uv[..., 1]
+    flat = frame[height:].reshape(-1)
+    quarter = (height // 2) * (width // 2)
+    return (flat[:quarter].reshape(height // 2, width // 2),
+            flat[quarter:].reshape(height // 2, width // 2))
+
+
+class YUVConverter:
+    """YUV 帧按最近邻缩放到显示尺寸并转成 RGB；name 不为空时把每帧耗时记到计量的 convert 阶段"""
+
+    def __init__(self, pix_fmt, src_size, dst_size, name=None):
+        if pix_fmt not in YUV_FORMATS:
+            raise ValueError(f"不支持的 YUV 格式: {pix_fmt}")
+        self.pix_fmt = pix_fmt
+        self.src_size = tuple(src_size)
+        self.dst_size = tuple(dst_size)
+        self.name = name
+        src_w, src_h = self.src_size
+        dst_w, dst_h = self.dst_size
+        # 内部平面取偶数尺寸，两行两列共用一个色度样本
+        w, h = dst_w + (dst_w & 1), dst_h + (dst_h & 1)
+        self._direct = (w, h) == self.src_size
+        if not self._direct:
+            rows = np.minimum(((np.arange(h) + 0.5) * src_h / dst_h).astype(np.intp), src_h - 1)
+            cols = np.minimum(((np.arange(w) + 0.5) * src_w / dst_w).astype(np.intp), src_w - 1)
+            self._y_index = rows[:, None] * src_w + cols
+            # 色度样本取每个 2x2 块左上像素对应的源色度
+            c_rows, c_cols = rows[::2] // 2, cols[::2] // 2
+            self._c_index = c_rows[:, None] * (src_w // 2) + c_cols
+            if pix_fmt == 'nv12':
+                # 交织的 UV 平面中 U 在偶数位、V 在奇数位
+                self._u_index, self._v_index = self._c_index * 2, self._c_index * 2 + 1
+            self._y = np.empty((h, w), np.uint8)
+            self._u = np.empty((h // 2, w // 2), np.uint8)
+            self._v = np.empty((h // 2, w // 2), np.uint8)
+        self._luma16 = np.empty((h, w), np.uint16)
+        self._luma = self._luma16.view(np.int16)
+        self._sum = np.empty((h, w), np.int16)
+        self._cu = np.empty((h // 2, w // 2), np.int32)
+        self._cv = np.empty((h // 2, w // 2), np.int32)
+        self._term = np.empty((h // 2, w // 2), np.int32)
+        self._tmp = np.empty((h // 2, w // 2), np.int32)
+        self._term16 = np.empty((h // 2, w // 2), np.int16)
+        self._wide = np.empty((h // 2, w // 2), np.uint32)
+        self._size = (w, h)
+        self.frames = 0
+        self.cost = 0.0  # 累计转换耗时（秒）
+
+    def _planes(self, frame):
+        if self._direct:
+            return (luma(frame),) + chroma_planes(frame, self.pix_fmt)
+        src_w, src_h = self.src_size
+        np.take(frame[:src_h].reshape(-1), self._y_index, out=self._y, mode='clip')
+        chroma = frame[src_h:].reshape(-1)
+        if self.pix_fmt == 'nv12':
+            np.take(chroma, self._u_index, out=self._u, mode='clip')
+            np.take(chroma, self._v_index, out=self._v, mode='clip')
+        else:
+            quarter = (src_h // 2) * (src_w // 2)
+            np.take(chroma[:quarter], self._c_index, out=self._u, mode='clip')
+            np.take(chroma[quarter:], self._c_index, out=self._v, mode='clip')
+        return self._y, self._u, self._v
+
+    def _add_chroma(self, term, channel, out):
+        """sum = 亮度项 + 横向复制一倍的色度项，>> 5 并截到 0..255 后写入 out 的一个通道"""
+        w, h = self._size
+        np.copyto(self._term16, term, casting='unsafe')
+        self._wide[...] = self._term16.view(np.uint16)
+        np.multiply(self._wide, 0x10001, out=self._wide)
+        doubled = self._wide.view(np.int16).reshape(h // 2, 1, w)
+        total = self._sum.reshape(h // 2, 2, w)
+        np.add(self._luma.reshape(h // 2, 2, w), doubled, out=total)
+        np.right_shift(self._sum, 5, out=self._sum)
+        np.clip(self._sum, 0, 255, out=self._sum)
+        dst_w, dst_h = self.dst_size
+        out[..., channel] = self._sum[:dst_h, :dst_w]
+
+    def scale(self, frame, out=None):
+        """转换一帧并写入 out（形状 (高, 宽, 3)）；不给 out 时新分配"""
+        start = time.perf_counter()
+        dst_w, dst_h = self.dst_size
+        if out is None:
+            out = np.empty((dst_h, dst_w, 3), np.uint8)
+        y, u, v = self._planes(frame)
+        # 亮度项 (Y - 16) * 1.164，放大 32 倍：Y * 149 >> 2 在 uint16 内不溢出，再减去偏移，
+        # 顺带加上最后 >> 5 的舍入量 16
+        np.multiply(y, 149, out=self._luma16, dtype=np.uint16)
+        np.right_shift(self._luma16, 2, out=self._luma16)
+        np.subtract(self._luma, 596 - 16, out=self._luma)
+        np.subtract(u, 128, out=self._cu, dtype=np.int32)
+        np.subtract(v, 128, out=self._cv, dtype=np.int32)
+        # 色度系数放大 256 倍，>> 3 后与亮度项同为 32 倍
+        np.multiply(self._cv, 409, out=self._term)
+        np.right_shift(self._term, 3, out=self._term)
+        self._add_chroma(self._term, 0, out)
+        np.multiply(self._cu, -100, out=self._term)
+        np.multiply(self._cv, -208, out=self._tmp)
+        np.add(self._term, self._tmp, out=self._term)
+        np.right_shift(self._term, 3, out=self._term)
+        self._add_chroma(self._term, 1, out)
+        np.multiply(self._cu, 516, out=self._term)
+        np.right_shift(self._term, 3, out=self._term)
+        self._add_chroma(self._term, 2, out)
+        cost = time.perf_counter() - start
+        self.frames += 1
+        self.cost += cost
+        if self.name:
+            metrics.observe(self.name, 'convert', cost)
+        return out
+
+
+def reuse_converter(converter, pix_fmt, src_size, dst_size, name=None):
+    """按像素格式取缩放/转换器：RGB 用 FrameScaler，YUV 用 YUVConverter；参数不变时复用"""
+    if converter is not None and converter.src_size == tuple(src_size) \
+            and converter.dst_size == tuple(dst_size) \
+            and getattr(converter, 'pix_fmt', 'rgb24') == pix_fmt:
+        return converter
+    if pix_fmt in YUV_FORMATS:
+        return YUVConverter(pix_fmt, src_size, dst_size, name=name)
+    return FrameScaler(src_size, dst_size)
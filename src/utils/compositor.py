@@ -0,0 +1,33 @@
+from utils.colorspace import frame_size, reuse_converter
+
+
+class PipCompositor:
+    """画中画合成：主画面缩放到输出缓冲，画中画缩放后直接写入右下角
+
+    两路可以是 YUV 管道帧，缩放时按输出尺寸一并转成 RGB，不单独转换整帧。
+    """
+
+    def __init__(self, pip_ratio=3, margin=10):
+        self.pip_ratio = pip_ratio
+        self.margin = margin
+        self._main_scaler = None
+        self._pip_scaler = None
+
+    def pip_size(self, width, height):
+        return width // self.pip_ratio, height // self.pip_ratio
+
+    def compose(self, main_frame, pip_frame, out, main_fmt='rgb24', pip_fmt='rgb24'):
+        """把两路帧合成到 out（形状为 (h, w, 3)），pip_frame 可为 None"""
+        h, w = out.shape[:2]
+        self._main_scaler = reuse_converter(self._main_scaler, main_fmt,
+                                            frame_size(main_frame, main_fmt), (w, h), name='main')
+        self._main_scaler.scale(main_frame, out=out)
+        if pip_frame is not None:
+            pip_w, pip_h = self.pip_size(w, h)
+            self._pip_scaler = reuse_converter(self._pip_scaler, pip_fmt,
+                                               frame_size(pip_frame, pip_fmt), (pip_w, pip_h),
+                                               name='pip')
+            x_offset = w - pip_w - self.margin
+            y_offset = h - pip_h - self.margin
+            self._pip_scaler.scale(pip_frame, out=out[y_offset:y_offset+pip_h, x_offset:x_offset+pip_w])
+        return out
@@ -1 +1,150 @@
-# This file is intentionally left blank.
\ No newline at end of file
+# 播放器配置
+
+# 合成/显示帧率
+DISPLAY_FPS = 15
+
+# 单路流超过该秒数没有新帧则只重启该路
+STREAM_STALL_TIMEOUT = 5.0
+
+# 延迟模式：'normal' 按 DISPLAY_FPS 输出、缓冲充足；'low' 不缓冲、少探测、按源帧率直通，画面跟手但更易受网络抖动影响
+LATENCY_MODE = 'normal'
+# 低延迟模式下渲染器取帧的频率（只是轮询，没有新帧时几乎不占 CPU）
+LOW_LATENCY_POLL_FPS = 60
+
+# RTSP 传输方式：'tcp' 可靠、'udp' 延迟更低但丢包时花屏；None 由 ffmpeg 决定
+RTSP_TRANSPORT = None
+
+# 窗口尺寸停止变化超过该秒数后才考虑按新尺寸重连
+RESIZE_DEBOUNCE = 1.5
+
+# 解码尺寸与显示尺寸之比（或其倒数）达到该值才重连，否则在进程内缩放
+RESIZE_RESTART_RATIO = 1.5
+
+# 画中画合成方式：'python' 两个 ffmpeg 进程 + NumPy 合成；'ffmpeg' 单进程 filter_complex 叠加；
+# 'process' 解码和合成放到独立进程，经共享内存帧总线传给界面（多核时不受 GIL 限制）
+COMPOSITE_MODE = 'python'
+# 帧总线每路的环形缓冲槽位数
+FRAME_BUS_SLOTS = 4
+
+# 自适应画质：过载时按顺序逐级降级（画中画降帧 -> 画中画子码流 -> 主画面缩小解码），空闲后逐级恢复
+ADAPTIVE_QUALITY = True
+ADAPTIVE_STAGES = ['pip_fps', 'pip_substream', 'main_scale']
+# 评估周期；过载持续多久降一级、空闲持续多久升一级、每次调整后的冷却时间（秒）
+ADAPTIVE_INTERVAL = 1.0
+ADAPTIVE_DEGRADE_AFTER = 3.0
+ADAPTIVE_RECOVER_AFTER = 15.0
+ADAPTIVE_COOLDOWN = 5.0
+# 过载阈值：渲染定时器平均滞后（ms）、显示循环超时占比、每秒丢帧数、系统 CPU 占用（%）；
+# 恢复要求前三项低于阈值的一半、CPU 低于 ADAPTIVE_CPU_LOW
+ADAPTIVE_LAG_MS = 30
+ADAPTIVE_OVERRUN_RATIO = 0.2
+ADAPTIVE_DROP_RATE = 3.0
+ADAPTIVE_CPU_HIGH = 90
+ADAPTIVE_CPU_LOW = 60
+# 降级下限：画中画帧率、主画面解码尺寸比例
+ADAPTIVE_PIP_FPS = 5
+ADAPTIVE_MAIN_SCALE = 0.5
+
+# 多画面：默认网格、合成帧率；格子宽度不超过该值时优先使用子码流
+MOSAIC_GRID = '2x2'
+MOSAIC_FPS = 10
+MOSAIC_SUBSTREAM_MAX_WIDTH = 704
+
+# 摄像机码流编码格式：'h264' 或 'hevc'
+STREAM_CODEC = 'h264'
+
+# 解码后端优先级；'auto' 表示优先使用测速结果（python -m benchmarks.decoder_bench）
+DECODER_PREFERENCE = 'auto'
+DECODER_AUTO_ORDER = ['cuda', 'qsv', 'd3d11va', 'vaapi', 'software']
+
+# 管道像素格式优先顺序：会话从消费方能接受的格式里按此顺序选一个。
+# yuv420p/nv12 每像素 1.5 字节（rgb24 为 3），显示时在合成这一步按显示尺寸转成 RGB。
+# 实测（benchmarks/pixfmt_bench）NumPy 转换比 ffmpeg swscale 省下的更贵，默认仍用 rgb24；
+# 管道带宽或 ffmpeg 进程是瓶颈时把 'yuv420p' 放到前面
+PIPE_PIX_FMTS = ['rgb24', 'yuv420p', 'nv12']
+
+# CPU 解码线程数，0 表示由 ffmpeg 自动决定；画中画少占几个核
+DECODER_THREADS = 0
+PIP_DECODER_THREADS = 2
+
+# ONVIF 配置集缓存有效期（秒），过期后下一条 PTZ 命令前重新获取
+ONVIF_PROFILE_TTL = 300
+
+# 按住持续移动：ContinuousMove 最短发送间隔（秒）、摄像机端超时（秒，按住不动时在一半处续期）、
+# 速度变化小于多少不重发、界面按钮按住时的速度（-1..1）
+PTZ_CONTINUOUS_INTERVAL = 0.2
+PTZ_CONTINUOUS_TIMEOUT = 5
+PTZ_VELOCITY_DEADBAND = 0.05
+PTZ_CONTINUOUS_SPEED = 0.5
+
+# 远程 WSDL/schema 磁盘缓存有效期（秒）
+ONVIF_WSDL_CACHE_TTL = 30 * 24 * 3600
+
+# SOAP 通信日志：是否记录、最多保留多少次请求
+SOAP_LOG_ENABLED = True
+SOAP_LOG_SIZE = 200
+
+# 多摄像机会话池：并发连接线程数、空闲多久（秒）后释放会话
+ONVIF_POOL_WORKERS = 8
+ONVIF_SESSION_IDLE_TIMEOUT = 600
+# 共享 HTTP 连接池大小（每个主机的 keep-alive 连接数）和单次 SOAP 请求超时（秒）
+ONVIF_HTTP_POOL_SIZE = 32
+ONVIF_OPERATION_TIMEOUT = 10
+
+# 流水线计量：是否记录、每个阶段保留的样本数；HTTP 端口为 0 表示不开本地接口
+METRICS_ENABLED = True
+METRICS_WINDOW = 512
+METRICS_HTTP_PORT = 0
+# 是否默认在画面上叠加统计信息
+METRICS_OVERLAY = False
+
+# 无界面服务模式：MJPEG/快照的 JPEG 质量、默认快照间隔（秒）
+HEADLESS_JPEG_QUALITY = 80
+SNAPSHOT_INTERVAL = 5.0
+# 连续重连失败时的最大重连间隔（秒）
+RECONNECT_MAX_DELAY = 30
+
+# 预连接池：最近用过的流额外保留几路只解复用不解码的连接（0 表示只保留正在显示的），
+# 收藏的流常驻；切换到已预连接的流时从缓存的 GOP 立即出帧
+STANDBY_ENABLED = True
+STANDBY_POOL_SIZE = 2
+STANDBY_FAVOURITES = []
+# 切换耗时统计：超过该秒数仍未出首帧则不计入
+STANDBY_SWITCH_TIMEOUT = 15
+# 打开会话时等待预连接确认视频编码的秒数，超时或编码不支持时直接连接
+STANDBY_PROBE_TIMEOUT = 10
+
+# 录像：主画面会话同时把压缩码流（不转码）复制给录像旁路，开始/停止录像不重连
+RECORD_TAP = True
+RECORD_DIR = 'recordings'
+# 每段录像时长（秒，在关键帧处切分）；目录内录像总大小上限（MB），超出时删除最旧的段
+RECORD_SEGMENT_SECONDS = 300
+RECORD_RETENTION_MB = 4096
+
+# 运动检测：按 MOTION_FPS 把画面抽样成 MOTION_SIZE 的小图，在后台线程做背景差分；
+# 每帧分析的 CPU 预算（毫秒），超出时自动降低分析频率。默认关闭
+MOTION_DETECTION = False
+# 开启检测时是否在画面上框出运动区域（关闭时只发事件，如只用于运动录像）
+MOTION_OVERLAY = True
+MOTION_SIZE = (160, 90)
+MOTION_FPS = 5
+MOTION_BUDGET_MS = 5
+# 背景学习率、灰度差阈值；画面按 MOTION_GRID（列, 行）切块，块内变化像素比例超过
+# MOTION_CELL_RATIO 算活动块，至少 MOTION_MIN_CELLS 块活动算有运动
+MOTION_ALPHA = 0.05
+MOTION_THRESHOLD = 25
+MOTION_GRID = (16, 9)
+MOTION_CELL_RATIO = 0.2
+MOTION_MIN_CELLS = 2
+# 整幅画面超过该比例同时变化时视为光照突变，重置背景
+MOTION_GLOBAL_RATIO = 0.6
+# 连续几次分析有运动才报开始；无运动持续多少秒报结束
+MOTION_START_FRAMES = 2
+MOTION_HOLD = 3.0
+# 有运动时自动录像（需开启 RECORD_TAP），运动结束后停止
+MOTION_RECORD = False
+
+# 录像回放：时间轴缩略图个数、缩略图宽度、缩略图缓存上限（张）
+PLAYBACK_THUMBNAILS = 10
+PLAYBACK_THUMBNAIL_WIDTH = 160
+PLAYBACK_THUMBNAIL_CACHE = 256
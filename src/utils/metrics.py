@@ -0,0 +1,208 @@
+"""流水线各阶段的轻量计量：滚动耗时直方图、计数器和帧率，按流分组
+
+热路径上只做 perf_counter 和 deque.append；分位数等统计在导出或显示时才计算。
+"""
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from utils import config
+
+
+class RollingHistogram:
+    """保留最近 maxlen 个样本（秒）的滚动直方图"""
+
+    def __init__(self, maxlen):
+        self._samples = deque(maxlen=maxlen)
+        self.count = 0  # 累计样本数（不受窗口限制）
+        self.total = 0.0  # 累计耗时（秒），与 count 一起给出 Prometheus summary 的 _sum
+
+    def observe(self, seconds):
+        self._samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def summary(self):
+        samples = np.fromiter(list(self._samples), dtype=np.float64)
+        if not samples.size:
+            return {'count': self.count, 'sum': self.total, 'avg_ms': 0.0, 'p50_ms': 0.0,
+                    'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+        p50, p95, p99 = np.percentile(samples, (50, 95, 99)) * 1000
+        return {'count': self.count, 'sum': self.total, 'avg_ms': samples.mean() * 1000,
+                'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99, 'max_ms': samples.max() * 1000}
+
+
+class RateMeter:
+    """事件速率（如帧率），按最近 window 秒内的事件数计算"""
+
+    def __init__(self, window=5.0, maxlen=1024):
+        self.window = window
+        self._times = deque(maxlen=maxlen)
+
+    def mark(self):
+        self._times.append(time.perf_counter())
+
+    def rate(self):
+        times = list(self._times)
+        if len(times) < 2:
+            return 0.0
+        now = time.perf_counter()
+        recent = [t for t in times if now - t <= self.window]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / max(recent[-1] - recent[0], 1e-6)
+
+
+class MetricsRegistry:
+    """按 (流名, 阶段/计数名) 管理直方图、计数器和速率"""
+
+    def __init__(self, window=None, enabled=None):
+        self.window = window or config.METRICS_WINDOW
+        self.enabled = config.METRICS_ENABLED if enabled is None else enabled
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._meters = {}
+
+    def histogram(self, stream, stage):
+        key = (stream, stage)
+        hist = self._histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(key, RollingHistogram(self.window))
+        return hist
+
+    def meter(self, stream, name='fps'):
+        key = (stream, name)
+        meter = self._meters.get(key)
+        if meter is None:
+            with self._lock:
+                meter = self._meters.setdefault(key, RateMeter())
+        return meter
+
+    def observe(self, stream, stage, seconds):
+        if self.enabled:
+            self.histogram(stream, stage).observe(seconds)
+
+    def mark(self, stream, name='fps'):
+        if self.enabled:
+            self.meter(stream, name).mark()
+
+    def incr(self, stream, name, value=1):
+        with self._lock:
+            key = (stream, name)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, stream, stage):
+        """with registry.timer('main', 'composite'): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stream, stage, time.perf_counter() - start)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._meters.clear()
+
+    def snapshot(self):
+        """{流名: {'fps': .., 'stages': {阶段: 统计}, 'counters': {名: 值}}}"""
+        with self._lock:
+            histograms = list(self._histograms.items())
+            counters = list(self._counters.items())
+            meters = list(self._meters.items())
+        result = {}
+
+        def stream_entry(name):
+            return result.setdefault(name, {'rates': {}, 'stages': {}, 'counters': {}})
+
+        for (stream, name), meter in meters:
+            stream_entry(stream)['rates'][name] = meter.rate()
+        for (stream, stage), hist in histograms:
+            stream_entry(stream)['stages'][stage] = hist.summary()
+        for (stream, name), value in counters:
+            stream_entry(stream)['counters'][name] = value
+        return result
+
+    def to_json(self):
+        return json.dumps({'time': time.time(), 'streams': self.snapshot()},
+                          ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Prometheus 文本格式"""
+        lines = []
+        snapshot = self.snapshot()
+        lines.append('# TYPE media_player_rate gauge')
+        for stream, data in snapshot.items():
+            for name, value in data['rates'].items():
+                lines.append(f'media_player_rate{{stream="{stream}",name="{name}"}} {value:.3f}')
+        lines.append('# TYPE media_player_stage_seconds summary')
+        for stream, data in snapshot.items():
+            for stage, s in data['stages'].items():
+                labels = f'stream="{stream}",stage="{stage}"'
+                for q, key in (('0.5', 'p50_ms'), ('0.95', 'p95_ms'), ('0.99', 'p99_ms')):
+                    lines.append(f'media_player_stage_seconds{{{labels},quantile="{q}"}} '
+                                 f'{s[key] / 1000:.6f}')
+                lines.append(f'media_player_stage_seconds_sum{{{labels}}} {s["sum"]:.6f}')
+                lines.append(f'media_player_stage_seconds_count{{{labels}}} {s["count"]}')
+        lines.append('# TYPE media_player_events_total counter')
+        for stream, data in snapshot.items():
+            for name, value in data['counters'].items():
+                lines.append(f'media_player_events_total{{stream="{stream}",name="{name}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        """按扩展名导出：.json 为 JSON，其他为 Prometheus 文本"""
+        text = self.to_json() if path.endswith('.json') else self.to_prometheus()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def format_overlay(self):
+        """画面叠加用的简短文本"""
+        lines = []
+        for stream, data in sorted(self.snapshot().items()):
+            parts = [f"{name} {value:.1f}" for name, value in data['rates'].items()]
+            parts += [f"{stage} {s['p50_ms']:.1f}/{s['p95_ms']:.1f}ms"
+                      for stage, s in data['stages'].items()]
+            parts += [f"{name}={value}" for name, value in data['counters'].items() if value]
+            lines.append(f"[{stream}] " + "  ".join(parts))
+        return '\n'.join(lines) or "暂无数据"
+
+
+registry = MetricsRegistry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith('/metrics.json'):
+            body, content_type = registry.to_json(), 'application/json; charset=utf-8'
+        elif self.path.startswith('/metrics'):
+            body, content_type = registry.to_prometheus(), 'text/plain; version=0.0.4'
+        else:
+            self.send_error(404)
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port, host='127.0.0.1'):
+    """在本地启动 /metrics（Prometheus）和 /metrics.json 接口，返回 server"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    print(f"计量接口: http://{host}:{server.server_port}/metrics")
+    return server
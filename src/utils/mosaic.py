@@ -0,0 +1,89 @@
+from utils.scaler import reuse_scaler
+
+
+def parse_grid(text):
+    """'3x3' -> (3, 3)"""
+    rows, cols = text.lower().split('x')
+    return int(rows), int(cols)
+
+
+def grid_layout(rows, cols, width, height, gap=2):
+    """把 width x height 的画布切成 rows x cols 个格子，返回 [(x, y, w, h), ...]
+
+    格子宽高取偶数，方便 ffmpeg 按格子尺寸直接输出；多余的像素留在右侧和底部。
+    """
+    tile_w = ((width - gap * (cols - 1)) // cols) & ~1
+    tile_h = ((height - gap * (rows - 1)) // rows) & ~1
+    if tile_w <= 0 or tile_h <= 0:
+        raise ValueError(f"画布 {width}x{height} 放不下 {rows}x{cols} 的网格")
+    return [(c * (tile_w + gap), r * (tile_h + gap), tile_w, tile_h)
+            for r in range(rows) for c in range(cols)]
+
+
+def gap_rects(rows, cols, width, height, tile_w, tile_h, gap):
+    """格子之间的缝隙以及右侧、底部余边，返回 [(x, y, w, h), ...]"""
+    rects = []
+    for c in range(cols):
+        x = c * (tile_w + gap) + tile_w
+        end = (c + 1) * (tile_w + gap) if c < cols - 1 else width
+        if end > x:
+            rects.append((x, 0, end - x, height))
+    for r in range(rows):
+        y = r * (tile_h + gap) + tile_h
+        end = (r + 1) * (tile_h + gap) if r < rows - 1 else height
+        if end > y:
+            rects.append((0, y, width, end - y))
+    return rects
+
+
+class MosaicCompositor:
+    """多画面合成：每路帧按块写入同一个输出缓冲
+
+    各路按格子尺寸解码时，写入就是一次切片赋值；尺寸不符的帧才走最近邻缩放。
+    缝隙每帧只填几条细边，不整幅清空画布。
+    """
+
+    def __init__(self, rows, cols, gap=2, background=16):
+        self.rows = rows
+        self.cols = cols
+        self.gap = gap
+        self.background = background
+        self._size = None
+        self._tiles = []
+        self._gaps = []
+        self._scalers = []
+
+    @property
+    def count(self):
+        return self.rows * self.cols
+
+    def tiles(self, width, height):
+        """当前画布尺寸下各格子的位置，尺寸不变时复用"""
+        if self._size != (width, height):
+            self._tiles = grid_layout(self.rows, self.cols, width, height, self.gap)
+            _, _, tile_w, tile_h = self._tiles[0]
+            self._gaps = gap_rects(self.rows, self.cols, width, height, tile_w, tile_h, self.gap)
+            self._scalers = [None] * len(self._tiles)
+            self._size = (width, height)
+        return self._tiles
+
+    def tile_size(self, width, height):
+        _, _, w, h = self.tiles(width, height)[0]
+        return w, h
+
+    def compose(self, frames, out):
+        """把 frames（按行优先排列，缺帧为 None）写入 out，返回 out"""
+        h, w = out.shape[:2]
+        tiles = self.tiles(w, h)
+        for x, y, gap_w, gap_h in self._gaps:
+            out[y:y + gap_h, x:x + gap_w] = self.background
+        for i, (x, y, tile_w, tile_h) in enumerate(tiles):
+            region = out[y:y + tile_h, x:x + tile_w]
+            frame = frames[i] if i < len(frames) else None
+            if frame is None:
+                region[...] = self.background
+                continue
+            src_h, src_w = frame.shape[:2]
+            self._scalers[i] = reuse_scaler(self._scalers[i], (src_w, src_h), (tile_w, tile_h))
+            self._scalers[i].scale(frame, out=region)
+        return out
@@ -0,0 +1,34 @@
+import numpy as np
+
+
+class FrameScaler:
+    """最近邻缩放：预先计算像素索引表，每帧只做一次向量化 take"""
+
+    def __init__(self, src_size, dst_size):
+        src_w, src_h = src_size
+        dst_w, dst_h = dst_size
+        self.src_size = (src_w, src_h)
+        self.dst_size = (dst_w, dst_h)
+        # 取目标像素中心对应的源像素
+        rows = ((np.arange(dst_h) + 0.5) * src_h / dst_h).astype(np.intp)
+        cols = ((np.arange(dst_w) + 0.5) * src_w / dst_w).astype(np.intp)
+        self._index = rows[:, None] * src_w + cols[None, :]
+
+    def scale(self, frame, out=None):
+        """缩放一帧；给定 out 时直接写入 out，不产生新数组"""
+        src_w, src_h = self.src_size
+        if self.src_size == self.dst_size:
+            if out is None:
+                return frame
+            out[...] = frame
+            return out
+        flat = frame.reshape((src_h * src_w,) + frame.shape[2:])
+        # mode='clip' 避免 numpy 为 out 额外分配缓冲
+        return np.take(flat, self._index, axis=0, out=out, mode='clip')
+
+
+def reuse_scaler(scaler, src_size, dst_size):
+    """尺寸不变时复用已有缩放器，否则重建索引表"""
+    if scaler is None or scaler.src_size != src_size or scaler.dst_size != dst_size:
+        scaler = FrameScaler(src_size, dst_size)
+    return scaler
@@ -0,0 +1,10 @@
+"""测试从仓库根目录运行（python -m pytest），模块按 src 下的包路径导入"""
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="需要 ffmpeg")
@@ -0,0 +1,94 @@
+import time
+
+from rtsp.adaptive import LoadMonitor, QualityController
+from utils import config
+
+CALM = {'render_lag_ms': 0.0, 'overrun': 0.0, 'drops': 0.0, 'cpu': None}
+OVER = dict(CALM, drops=config.ADAPTIVE_DROP_RATE * 2)
+BETWEEN = dict(CALM, render_lag_ms=config.ADAPTIVE_LAG_MS * 0.75)
+
+
+def controller(**kwargs):
+    options = dict(stages=('pip_fps', 'pip_substream', 'main_scale'), degrade_after=2,
+                   recover_after=10, cooldown=5)
+    options.update(kwargs)
+    return QualityController(**options)
+
+
+def feed(quality, sample, start, seconds, step=1.0):
+    """从 start 起每 step 秒喂一次 sample，返回发生的级别变化"""
+    changes = []
+    t = start
+    while t <= start + seconds:
+        change = quality.update(sample, now=t)
+        if change:
+            changes.append((t, change))
+        t += step
+    return changes
+
+
+def test_steps_down_one_stage_at_a_time_after_sustained_overload():
+    quality = controller()
+    start = time.time() + 10  # 避开创建时的冷却
+    changes = feed(quality, OVER, start, 20)
+    # 过载 2 秒后降级，之后每次都要等冷却和新的 2 秒过载
+    assert [c for _, c in changes] == [(0, 1), (1, 2), (2, 3)]
+    assert changes[1][0] - changes[0][0] >= 5
+    assert quality.active == ('pip_fps', 'pip_substream', 'main_scale')
+    assert quality.changed_stage((1, 2)) == 'pip_substream'
+
+
+def test_recovers_only_after_a_longer_calm_period():
+    quality = controller()
+    start = time.time() + 10
+    feed(quality, OVER, start, 2)
+    assert quality.level == 1
+    assert feed(quality, CALM, start + 3, 8) == []
+    changes = feed(quality, CALM, start + 12, 10)
+    assert [c for _, c in changes] == [(1, 0)]
+
+
+def test_in_between_load_holds_the_level():
+    quality = controller()
+    start = time.time() + 10
+    feed(quality, OVER, start, 2)
+    assert feed(quality, BETWEEN, start + 3, 30) == []
+    assert quality.level == 1
+
+
+def test_brief_spikes_do_not_degrade():
+    quality = controller()
+    start = time.time() + 10
+    for i in range(10):
+        quality.update(OVER if i % 2 else CALM, now=start + i)
+    assert quality.level == 0
+
+
+def test_decode_parameters_follow_the_level():
+    quality = controller(stages=('pip_fps', 'main_scale'))
+    assert quality.pip_fps(25) == 25
+    assert quality.main_size(1280, 720) == (1280, 720)
+    quality.level = 2
+    assert quality.pip_fps(25) == min(25, config.ADAPTIVE_PIP_FPS)
+    assert quality.pip_url('main', 'sub') == 'main'  # 没启用子码流这一级
+    width, height = quality.main_size(1281, 721)
+    assert width % 2 == 0 and height % 2 == 0 and width < 1281
+
+
+class FakeSession:
+    def __init__(self, name):
+        self.name = name
+        self.dropped = 0
+
+
+def test_load_monitor_drop_rate_survives_session_rebuild():
+    monitor = LoadMonitor(0.04)
+    session = FakeSession('main')
+    monitor.sample([session])
+    session.dropped = 10
+    assert monitor.sample([session])['drops'] > 0
+    session.dropped = 3  # 会话重建，计数从 0 开始
+    assert monitor.sample([session])['drops'] > 0
+    monitor.observe_loop(0.01)
+    monitor.observe_loop(0.05)
+    assert monitor.sample([None])['overrun'] == 0.5
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from utils.colorspace import (YUVConverter, chroma_planes, frame_size, luma, negotiate_pix_fmt,
+                              reuse_converter)
+from utils.scaler import FrameScaler
+
+
+def test_negotiate_follows_preference_order():
+    accepted = ['rgb24', 'yuv420p', 'nv12']
+    assert negotiate_pix_fmt(accepted, ['yuv420p', 'nv12', 'rgb24']) == 'yuv420p'
+    assert negotiate_pix_fmt(accepted, ['nv12', 'rgb24']) == 'nv12'
+    assert negotiate_pix_fmt(['rgb24'], ['yuv420p', 'nv12']) == 'rgb24'  # 没有交集取消费方首选
+    assert negotiate_pix_fmt('nv12', ['rgb24']) == 'nv12'  # 指定的具体格式不协商
+
+
+def planes_to_yuv420p(y, u, v):
+    return np.concatenate([y.ravel(), u.ravel(), v.ravel()]).reshape(-1, y.shape[1])
+
+
+def planes_to_nv12(y, u, v):
+    uv = np.stack([u, v], axis=-1).reshape(u.shape[0], -1)
+    return np.concatenate([y, uv])
+
+
+def reference_rgb(y, u, v):
+    """BT.601 有限范围的浮点参考转换，色度按 2x2 复制"""
+    u = np.repeat(np.repeat(u, 2, 0), 2, 1).astype(np.float64) - 128
+    v = np.repeat(np.repeat(v, 2, 0), 2, 1).astype(np.float64) - 128
+    yy = (y.astype(np.float64) - 16) * 1.164
+    rgb = np.stack([yy + 1.596 * v, yy - 0.392 * u - 0.813 * v, yy + 2.017 * u], axis=-1)
+    return np.clip(np.rint(rgb), 0, 255).astype(np.uint8)
+
+
+def block_image(width, height, block=8, seed=0):
+    """block x block 的色块图：最近邻缩放的取样位置落在块内任何地方结果都一样"""
+    rng = np.random.default_rng(seed)
+    y = rng.integers(16, 236, (height // block, width // block), dtype=np.uint8)
+    u = rng.integers(16, 241, (height // block, width // block), dtype=np.uint8)
+    v = rng.integers(16, 241, (height // block, width // block), dtype=np.uint8)
+    up = np.ones((block, block), np.uint8)
+    half = np.ones((block // 2, block // 2), np.uint8)
+    return np.kron(y, up), np.kron(u, half), np.kron(v, half)
+
+
+def test_plane_helpers():
+    y, u, v = block_image(64, 32)
+    frame = planes_to_yuv420p(y, u, v)
+    assert frame_size(frame, 'yuv420p') == (64, 32)
+    assert np.array_equal(luma(frame), y)
+    assert all(np.array_equal(a, b) for a, b in zip(chroma_planes(frame, 'yuv420p'), (u, v)))
+    nv12 = planes_to_nv12(y, u, v)
+    assert all(np.array_equal(a, b) for a, b in zip(chroma_planes(nv12, 'nv12'), (u, v)))
+
+
+@pytest.mark.parametrize('pix_fmt', ['yuv420p', 'nv12'])
+def test_direct_conversion_matches_reference(pix_fmt):
+    rng = np.random.default_rng(1)
+    y = rng.integers(16, 236, (72, 128), dtype=np.uint8)
+    u = rng.integers(16, 241, (36, 64), dtype=np.uint8)
+    v = rng.integers(16, 241, (36, 64), dtype=np.uint8)
+    frame = (planes_to_yuv420p if pix_fmt == 'yuv420p' else planes_to_nv12)(y, u, v)
+    converter = YUVConverter(pix_fmt, (128, 72), (128, 72))
+    out = converter.scale(frame)
+    diff = np.abs(out.astype(int) - reference_rgb(y, u, v).astype(int))
+    assert diff.max() <= 3
+    assert diff.mean() < 1
+    assert converter.frames == 1
+
+
+@pytest.mark.parametrize('pix_fmt', ['yuv420p', 'nv12'])
+def test_scaled_conversion_matches_reference(pix_fmt):
+    y, u, v = block_image(128, 64)
+    frame = (planes_to_yuv420p if pix_fmt == 'yuv420p' else planes_to_nv12)(y, u, v)
+    out = np.zeros((32, 64, 3), np.uint8)
+    YUVConverter(pix_fmt, (128, 64), (64, 32)).scale(frame, out=out)
+    expected = reference_rgb(y, u, v)[1::2, 1::2]
+    assert np.abs(out.astype(int) - expected.astype(int)).max() <= 3
+
+
+def test_odd_display_size_fills_the_whole_output():
+    # 内部平面按偶数尺寸计算，写出时裁掉多出的一行一列
+    frame = np.full((96, 128), 128, np.uint8)  # 中灰：Y = U = V = 128
+    out = np.zeros((33, 65, 3), np.uint8)
+    YUVConverter('yuv420p', (128, 64), (65, 33)).scale(frame, out=out)
+    assert out.min() >= 128 and out.max() <= 132
+
+
+def test_reuse_converter_picks_by_format_and_size():
+    converter = reuse_converter(None, 'yuv420p', (64, 32), (32, 16))
+    assert isinstance(converter, YUVConverter)
+    assert reuse_converter(converter, 'yuv420p', (64, 32), (32, 16)) is converter
+    assert reuse_converter(converter, 'nv12', (64, 32), (32, 16)) is not converter
+    assert isinstance(reuse_converter(converter, 'rgb24', (64, 32), (32, 16)), FrameScaler)
+    with pytest.raises(ValueError):
+        YUVConverter('rgb24', (64, 32), (32, 16))
@@ -0,0 +1,135 @@
+import threading
+import time
+
+from ptz.command_queue import PTZCommandQueue
+
+
+class FakeController:
+    """记录收到的命令；gate 未打开时命令阻塞，模拟摄像机正忙"""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self._lock = threading.Lock()
+
+    def _record(self, *call):
+        self.gate.wait(5)
+        with self._lock:
+            self.calls.append((time.monotonic(),) + call)
+
+    def relative_move(self, pan, tilt, zoom):
+        self._record('relative', pan, tilt, zoom)
+
+    def absolute_move(self, pan, tilt, zoom):
+        self._record('absolute', pan, tilt, zoom)
+
+    def continuous_move(self, pan, tilt, zoom, timeout=None):
+        self._record('continuous', pan, tilt, zoom)
+
+    def stop(self):
+        self._record('stop')
+
+    def kinds(self):
+        with self._lock:
+            return [call[1] for call in self.calls]
+
+
+def wait_until(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def make_queue(**kwargs):
+    controller = FakeController()
+    options = dict(interval=0.05, move_timeout=10)
+    options.update(kwargs)
+    return controller, PTZCommandQueue(controller, **options)
+
+
+def test_relative_moves_coalesce_while_the_camera_is_busy():
+    controller, queue = make_queue()
+    controller.gate.clear()
+    queue.relative_move(0.1, 0, 0)
+    assert wait_until(lambda: queue.pending == 0)  # 第一条已在发送中
+    for _ in range(5):
+        queue.relative_move(0.3, -0.1, 0)
+    controller.gate.set()
+    assert wait_until(lambda: len(controller.calls) == 2)
+    queue.close()
+    _, kind, pan, tilt, _ = controller.calls[1]
+    assert kind == 'relative'
+    assert pan == 1.0  # 累加后截到 -1..1
+    assert abs(tilt + 0.5) < 1e-9
+    assert queue.merged == 4
+
+
+def test_absolute_move_supersedes_pending_commands():
+    controller, queue = make_queue()
+    controller.gate.clear()
+    queue.relative_move(0.1, 0, 0)
+    assert wait_until(lambda: queue.pending == 0)
+    queue.relative_move(0.1, 0, 0)
+    queue.absolute_move(0.5, 0.5, 0)
+    controller.gate.set()
+    assert wait_until(lambda: len(controller.calls) == 2)
+    queue.close()
+    assert controller.kinds() == ['relative', 'absolute']
+
+
+def test_press_is_rate_limited_and_release_sends_one_stop():
+    controller, queue = make_queue(interval=0.1)
+    start = time.monotonic()
+    while time.monotonic() - start < 0.5:
+        queue.press(0.5 + (time.monotonic() - start), 0.2)
+        time.sleep(0.005)
+    queue.release()
+    assert wait_until(lambda: 'stop' in controller.kinds())
+    time.sleep(0.15)
+    queue.close()
+    kinds = controller.kinds()
+    moves = kinds.count('continuous')
+    assert 3 <= moves <= 7  # 约每 0.1 秒一条，远少于调用次数
+    assert kinds[-1] == 'stop' and kinds.count('stop') == 1
+    times = [call[0] for call in controller.calls if call[1] == 'continuous']
+    assert min(b - a for a, b in zip(times, times[1:])) >= 0.09
+    assert not queue.moving
+
+
+def test_small_changes_and_centered_stick():
+    controller, queue = make_queue()
+    queue.press(0.5, 0)
+    assert wait_until(lambda: controller.kinds() == ['continuous'])
+    queue.press(0.51, 0)  # 死区内，不重发
+    time.sleep(0.1)
+    assert controller.kinds() == ['continuous']
+    queue.press(0, 0)  # 回中等同松开
+    assert wait_until(lambda: controller.kinds() == ['continuous', 'stop'])
+    queue.close()
+
+
+def test_hold_renews_before_camera_timeout():
+    controller, queue = make_queue(move_timeout=0.2)
+    queue.press(0.5, 0)
+    time.sleep(0.35)
+    queue.close()
+    assert wait_until(lambda: 'stop' in controller.kinds())
+    # 速度不变，每 move_timeout/2 续期一次；关闭时还在动，补一次 Stop
+    assert controller.kinds().count('continuous') >= 3
+    assert controller.kinds()[-1] == 'stop'
+
+
+def test_release_before_send_sends_nothing():
+    controller, queue = make_queue(interval=0.2)
+    queue.press(0.5, 0)
+    assert wait_until(lambda: len(controller.calls) == 1)
+    queue.press(-0.5, 0)  # 还在限速间隔内
+    queue.release()
+    time.sleep(0.3)
+    queue.close()
+    assert controller.kinds() == ['continuous', 'stop']
+    assert queue.merged == 1
@@ -0,0 +1,38 @@
+import time
+
+from conftest import requires_ffmpeg
+from rtsp.frame_bus import BusPipeline
+
+LAVFI = 'testsrc2=size=320x180:rate=25'
+LAVFI_ARGS = ['-re', '-f', 'lavfi']
+
+
+def wait_until(predicate, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@requires_ffmpeg
+def test_restart_pip_keeps_main_decode_and_compositing():
+    bus = BusPipeline(LAVFI, 320, 180, pip_url=LAVFI, fps=15, input_args=LAVFI_ARGS, name='t')
+    bus.start_stream()
+    try:
+        pip = bus.rings['pip']
+        assert wait_until(lambda: pip.seq > 10 and bus.out.seq > 10, 30)
+        others = [p for p in bus.processes if p is not bus._pip_proc]
+        before = pip.seq
+
+        bus.restart_pip(pip_fps=5)
+        assert bus.pip_spec['fps'] == 5
+        assert all(p.is_alive() for p in others) and bus.alive
+        assert not pip.closed
+        # 新的画中画进程接着原来的序号写同一个环，合成进程照常出帧
+        assert wait_until(lambda: pip.seq > before + 5, 30)
+        out_seq = bus.out.seq
+        assert wait_until(lambda: bus.out.seq > out_seq + 10, 10)
+    finally:
+        bus.stop_stream()
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from rtsp.frame_reader import FramePool, FrameQueue, LatestFrameSlot
+
+
+def test_drop_oldest_returns_the_evicted_frame():
+    queue = FrameQueue(2, 'drop_oldest')
+    assert queue.publish('a') is None
+    assert queue.publish('b') is None
+    assert queue.publish('c') == 'a'
+    assert queue.dropped == 1
+    assert queue.drain() == ['b', 'c']
+
+
+def test_drop_newest_keeps_queued_frames():
+    queue = FrameQueue(1, 'drop_newest')
+    queue.publish('a')
+    assert queue.publish('b') == 'b'
+    assert queue.dropped == 1
+    assert queue.take() == 'a'
+    assert queue.take() is None
+
+
+def test_block_waits_for_a_consumer():
+    queue = FrameQueue(1, 'block')
+    queue.publish('a')
+    published = threading.Event()
+
+    def producer():
+        queue.publish('b')
+        published.set()
+
+    threading.Thread(target=producer, daemon=True).start()
+    assert not published.wait(0.1)
+    assert queue.take() == 'a'
+    assert published.wait(1)
+    assert queue.take() == 'b'
+    assert queue.dropped == 0
+
+
+def test_block_returns_the_frame_when_closed():
+    queue = FrameQueue(1, 'block')
+    queue.publish('a')
+    result = []
+    thread = threading.Thread(target=lambda: result.append(queue.publish('b')), daemon=True)
+    thread.start()
+    time.sleep(0.05)
+    queue.close()
+    thread.join(1)
+    assert result == ['b']
+
+
+def test_get_times_out_and_wakes_on_close():
+    queue = FrameQueue()
+    assert queue.get(timeout=0.01) is None
+    threading.Timer(0.05, queue.close).start()
+    assert queue.get(timeout=2) is None
+    assert queue.closed
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        FrameQueue(1, 'drop_all')
+
+
+def test_latest_slot_keeps_only_the_newest():
+    slot = LatestFrameSlot()
+    slot.publish(1)
+    assert slot.publish(2) == 1
+    assert slot.take() == 2
+
+
+def test_pool_reuses_buffers_and_ignores_foreign_shapes():
+    pool = FramePool((4, 4, 3))
+    buf = pool.acquire()
+    pool.release(buf)
+    pool.release(FramePool((2, 2, 3)).acquire())
+    assert pool.acquire() is buf
+    pool.acquire()
+    assert pool.allocations == 2
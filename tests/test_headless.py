@@ -0,0 +1,123 @@
+import io
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from service.headless import FrameHub, SnapshotWriter, serve_preview, write_atomic
+
+
+def make_hub():
+    released = []
+    return FrameHub(released.append), released
+
+
+def frame(value, size=(48, 64)):
+    return np.full(size + (3,), value, np.uint8)
+
+
+def test_jpeg_is_none_before_the_first_frame():
+    hub, _ = make_hub()
+    assert hub.jpeg() is None
+    assert hub.encoded == 0
+
+
+def test_jpeg_encodes_once_per_frame():
+    hub, _ = make_hub()
+    hub.publish(frame(200))
+    first = hub.jpeg()
+    assert first[:2] == b'\xff\xd8'
+    assert hub.jpeg() is first
+    assert hub.encoded == 1
+
+    hub.publish(frame(20))
+    second = hub.jpeg()
+    assert second is not first
+    assert hub.encoded == 2
+    pixel = np.asarray(Image.open(io.BytesIO(second)))[10, 10]
+    assert abs(int(pixel[0]) - 20) < 8
+
+
+def test_concurrent_readers_share_one_encode():
+    hub, _ = make_hub()
+    hub.publish(frame(128, (360, 640)))
+    results = []
+    readers = [threading.Thread(target=lambda: results.append(hub.jpeg())) for _ in range(8)]
+    for t in readers:
+        t.start()
+    for t in readers:
+        t.join()
+    assert hub.encoded == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_publish_and_close_release_replaced_frames():
+    hub, released = make_hub()
+    a, b = frame(1), frame(2)
+    hub.publish(a)
+    assert released == [None]
+    hub.publish(b)
+    assert released[-1] is a
+    hub.close()
+    assert released[-1] is b
+    assert hub.closed and hub.jpeg() is None
+
+
+def test_wait_wakes_on_publish():
+    hub, _ = make_hub()
+    threading.Timer(0.05, hub.publish, (frame(0),)).start()
+    start = time.perf_counter()
+    assert hub.wait(0, timeout=2) == 1
+    assert time.perf_counter() - start < 1
+
+
+def test_write_atomic_replaces_without_leaving_temp_files(tmp_path):
+    path = str(tmp_path / 'snap.jpg')
+    write_atomic(path, b'old')
+    with open(path, 'rb') as reader:
+        write_atomic(path, b'new')
+        # 已打开的读取方仍看到完整的旧文件
+        assert reader.read() == b'old'
+    with open(path, 'rb') as f:
+        assert f.read() == b'new'
+    assert os.listdir(tmp_path) == ['snap.jpg']
+
+
+def test_snapshot_writer_writes_the_current_jpeg(tmp_path):
+    hub, _ = make_hub()
+    hub.publish(frame(90))
+    path = str(tmp_path / 'snap.jpg')
+    writer = SnapshotWriter(hub, path, 0.02)
+    writer.start()
+    try:
+        deadline = time.time() + 2
+        while not os.path.exists(path) and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        writer.stop()
+        writer.join(1)
+    with open(path, 'rb') as f:
+        assert f.read() == hub.jpeg()
+    assert hub.encoded == 1
+
+
+def test_preview_snapshot_endpoint():
+    hub, _ = make_hub()
+    server = serve_preview(hub, 0, host='127.0.0.1')
+    url = f'http://127.0.0.1:{server.server_port}/snapshot.jpg'
+    try:
+        with pytest.raises(urllib.error.HTTPError) as exc:
+            urllib.request.urlopen(url, timeout=2)
+        assert exc.value.code == 503
+        hub.publish(frame(60))
+        with urllib.request.urlopen(url, timeout=2) as resp:
+            assert resp.headers['Content-Type'] == 'image/jpeg'
+            assert resp.read() == hub.jpeg()
+    finally:
+        server.shutdown()
+        server.server_close()
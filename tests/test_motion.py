@@ -0,0 +1,45 @@
+import threading
+import time
+
+import numpy as np
+
+from rtsp.motion import MotionTap
+from utils import config
+
+
+def box_frame(x):
+    frame = np.full((180, 320, 3), 40, np.uint8)
+    if x is not None:
+        frame[60:120, x:x + 60] = 230
+    return frame
+
+
+def feed(tap, positions, fps):
+    for x in positions:
+        tap.submit(box_frame(x))
+        time.sleep(1.5 / fps)
+
+
+def test_motion_ends_when_the_stream_stalls(monkeypatch):
+    monkeypatch.setattr(config, 'MOTION_HOLD', 0.3)
+    events = []
+    ended = threading.Event()
+
+    def on_event(event):
+        events.append(event)
+        if event['kind'] == 'end':
+            ended.set()
+
+    tap = MotionTap('test', on_event=on_event, fps=20, budget_ms=0)
+    tap.start()
+    try:
+        feed(tap, [None] * 3, tap.fps)
+        feed(tap, range(20, 240, 20), tap.fps)
+        assert tap.active
+        # 之后不再有任何帧，结束事件靠后台线程的定时检查发出
+        assert ended.wait(3)
+    finally:
+        tap.close()
+        tap.join(2)
+    assert [e['kind'] for e in events] == ['start', 'end']
+    assert not tap.active and tap.regions == []
@@ -0,0 +1,98 @@
+import os
+import socket
+import time
+
+from rtsp.mpegts import PACKET_SIZE, TSScanner, as_packets, pes_pts
+from rtsp.recorder import RecordingTap
+
+PMT_PID = 0x1000
+VIDEO_PID = 0x100
+
+
+def packet(pid, payload=b'', start=False, key=False):
+    """188 字节的 TS 包；key 时带置位 random_access_indicator 的自适应域"""
+    header = bytes([0x47, (0x40 if start else 0) | pid >> 8, pid & 0xff,
+                    0x30 if key else 0x10])
+    if key:
+        header += bytes([1, 0x40])
+    data = header + payload
+    return data + b'\xff' * (PACKET_SIZE - len(data))
+
+
+def pat():
+    section = bytes([0x00, 0xb0, 13, 0, 1, 0xc1, 0, 0, 0, 1, 0xe0 | PMT_PID >> 8,
+                     PMT_PID & 0xff]) + b'\0' * 4
+    return packet(0, b'\0' + section, start=True)
+
+
+def pmt():
+    section = bytes([0x02, 0xb0, 18, 0, 1, 0xc1, 0, 0, 0xe0 | VIDEO_PID >> 8, VIDEO_PID & 0xff,
+                     0xf0, 0, 0x1b, 0xe0 | VIDEO_PID >> 8, VIDEO_PID & 0xff, 0xf0, 0]) + b'\0' * 4
+    return packet(PMT_PID, b'\0' + section, start=True)
+
+
+def pes(pts):
+    """带 PTS 的 PES 头"""
+    ticks = int(pts * 90000)
+    return bytes([0, 0, 1, 0xe0, 0, 0, 0x80, 0x80, 5,
+                  0x21 | (ticks >> 29) & 0x0e, ticks >> 22 & 0xff, 0x01 | (ticks >> 14) & 0xfe,
+                  ticks >> 7 & 0xff, 0x01 | (ticks << 1) & 0xfe])
+
+
+def gop(pts, frames=3):
+    """一个 GOP：关键帧起始包 + 若干续包和非关键帧"""
+    data = packet(VIDEO_PID, pes(pts), start=True, key=True) + packet(VIDEO_PID)
+    for i in range(1, frames):
+        data += packet(VIDEO_PID, pes(pts + i * 0.04), start=True) + packet(VIDEO_PID)
+    return data
+
+
+def test_scanner_needs_tables_before_reporting_keyframes():
+    scanner = TSScanner()
+    assert scanner.scan(as_packets(gop(0))).size == 0
+    assert not scanner.ready
+    keys = scanner.scan(as_packets(pat() + pmt() + gop(0) + gop(1)))
+    assert scanner.ready
+    assert scanner.video_pid == VIDEO_PID
+    assert keys.tolist() == [2, 8]
+    assert scanner.headers() == pat() + pmt()
+
+
+def test_pes_pts_round_trip():
+    assert abs(pes_pts(as_packets(gop(12.5))[0]) - 12.5) < 1e-4
+    assert pes_pts(as_packets(packet(VIDEO_PID))[0]) is None
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_recorder_cuts_segments_at_keyframes(tmp_path):
+    tap = RecordingTap(directory=str(tmp_path), name='t', segment_seconds=0.2)
+    tap.start()
+    tap.start_recording()
+    host, port = tap.url[len('tcp://'):].rsplit(':', 1)
+    with socket.create_connection((host, int(port))) as conn:
+        # 关键帧之前的包不写入；第一个关键帧开新段并先写节目表
+        conn.sendall(pat() + pmt() + packet(VIDEO_PID) + gop(0) + gop(1))
+        assert wait_until(lambda: tap.segments == 1)
+        time.sleep(0.3)
+        # 到时后在下一个关键帧处切分；数据不按包边界到达也不会错位
+        conn.sendall(gop(2)[:300])
+        time.sleep(0.05)
+        conn.sendall(gop(2)[300:] + gop(3))
+        assert wait_until(lambda: tap.segments == 2)
+        time.sleep(0.1)
+    tap.stop_recording()
+    files = sorted(os.listdir(tmp_path))
+    assert len(files) == 2
+    first, second = (open(tmp_path / name, 'rb').read() for name in files)
+    assert first == pat() + pmt() + gop(0) + gop(1)
+    assert second == pat() + pmt() + gop(2) + gop(3)
+    assert all(as_packets(data)[:, 0].tolist() == [0x47] * (len(data) // PACKET_SIZE)
+               for data in (first, second))
@@ -0,0 +1,46 @@
+import threading
+
+from lxml import etree
+
+from ptz.soap_log import SoapLog, format_entries
+
+
+class Operation:
+    name = 'ContinuousMove'
+
+
+def test_failed_call_marks_its_in_flight_entry():
+    log = SoapLog(maxlen=10)
+    log.egress(etree.Element('request'), {}, Operation(), {})
+    log.fail('ContinuousMove', ConnectionError("timed out"))
+    entries = log.entries()
+    assert len(entries) == 1
+    assert entries[0]['error'] == "timed out"
+    assert entries[0]['received'] is None
+    assert "timed out" in format_entries(entries)
+
+
+def test_failure_before_sending_is_still_logged():
+    log = SoapLog(maxlen=10)
+    log.fail('Stop', OSError("refused"))
+    (entry,) = log.entries()
+    assert entry['operation'] == 'Stop' and entry['error'] == "refused"
+
+
+def test_failure_on_another_thread_does_not_touch_this_entry():
+    log = SoapLog(maxlen=10)
+    log.egress(etree.Element('request'), {}, Operation(), {})
+    t = threading.Thread(target=log.fail, args=('Stop', OSError("refused")))
+    t.start()
+    t.join()
+    first, second = log.entries()
+    assert 'error' not in first
+    assert second['operation'] == 'Stop'
+    log.ingress(etree.Element('response'), {}, Operation())
+    assert first['received'] is not None
+
+
+def test_disabled_log_records_nothing():
+    log = SoapLog(maxlen=10, enabled=False)
+    log.fail('Stop', OSError("refused"))
+    assert len(log) == 0
@@ -0,0 +1,58 @@
+import os
+import time
+
+from conftest import requires_ffmpeg
+from rtsp.decoder import make_test_clip
+from rtsp.recorder import RecordingTap
+from rtsp.standby import StandbyPool, gop_starts
+
+LOOP_ARGS = ['-re', '-stream_loop', '-1']
+
+
+def wait_until(predicate, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+H264_GOP = (b'\x00\x00\x00\x01\x67\x42\x00' b'\x00\x00\x00\x01\x68\xce'
+            b'\x00\x00\x01\x65\x88\x84' b'\x00\x00\x01\x41\x9a\x00')
+HEVC_GOP = (b'\x00\x00\x00\x01\x40\x01\x0c' b'\x00\x00\x00\x01\x42\x01\x01'
+            b'\x00\x00\x01\x26\x01\xaf' b'\x00\x00\x01\x02\x01\xd0')
+
+
+def test_gop_starts_at_parameter_sets():
+    data = b'\x41\x9a' + H264_GOP + H264_GOP
+    assert gop_starts(data) == [2, 2 + len(H264_GOP)]
+    # HEVC 以 VPS 开头；H.264 的 SPS 规则不适用
+    assert gop_starts(HEVC_GOP * 2, 'hevc') == [0, len(HEVC_GOP)]
+    assert gop_starts(HEVC_GOP) == []
+
+
+def test_gop_starts_ignores_truncated_start_codes():
+    # 起始码在末尾、NAL 头字节还没收到：留给下一批判断
+    assert gop_starts(b'\x41\x00\x00\x01') == []
+    assert gop_starts(b'\x00\x00') == []
+    assert gop_starts(b'\x00\x00\x01\x67\x42') == [0]
+
+
+@requires_ffmpeg
+def test_recording_through_standby_writes_a_segment(tmp_path):
+    clip = make_test_clip(str(tmp_path / 'clip.mp4'), 320, 180, seconds=2)
+    tap = RecordingTap(directory=str(tmp_path / 'rec'), name='t')
+    tap.start()
+    pool = StandbyPool(size=1, input_args=LOOP_ARGS, record=True)
+    handler = pool.open(clip, 160, 90, record_url=tap.url)
+    try:
+        tap.start_recording()
+        assert wait_until(lambda: tap.bytes_written > 50000, 15)
+        assert handler.read(timeout=5) is not None
+    finally:
+        handler.stop_stream()
+        tap.stop_recording()
+        pool.close()
+    assert tap.segments >= 1
+    assert os.path.getsize(tap.path) > 50000